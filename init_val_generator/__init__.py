@@ -1,12 +1,22 @@
+import threading
 import numpy as np
 import numpy.typing as npt
 
-from .init_val_generator import InitValGenerator
+from .init_val_generator import Estimates, InitValGenerator
+from .sequential import SequentialEstimator
+from .dask_estimation import DaskEstimator
+from .workspace import Workspace
+from .results import ResultTable
 
 
 def guess(
-    data: npt.NDArray[np.float64], width: int, height: int, n: int | None = 1
-) -> list[list[float]]:
+    data: npt.NDArray[np.float64],
+    width: int,
+    height: int,
+    n: int | None = 1,
+    time_budget: float | None = None,
+    cancel_event: threading.Event | None = None,
+) -> Estimates:
     """
     Estimates Gaussian components.
 
@@ -20,11 +30,17 @@ def guess(
         Height of the data array.
     n
         Number of components. If None, the optimal number is estimated.
+    time_budget
+        Time budget in seconds. When it is used up, the best result found so far is returned. If None, the time is not limited.
+    cancel_event
+        Event that cancels the estimation in the same way as a used up time budget when set from another thread.
 
     Returns
     -------
-    list[list[float]]
-        List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+    Estimates
+        List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Its truncated attribute tells if the estimation was cut short.
     """
     guesser = InitValGenerator()
-    return guesser.estimate(data, width, height, n)
+    return guesser.estimate(
+        data, width, height, n, time_budget=time_budget, cancel_event=cancel_event
+    )
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import numpy.typing as npt
+
+from .method_of_moments import get_parameters_from_moment_sums
+
+DEFAULT_REPLICATE_NUM = 200
+
+
+def bootstrap_standard_errors(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.integer],
+    n: int,
+    replicate_num: int = DEFAULT_REPLICATE_NUM,
+    chunk_size: int | None = None,
+    random_seed: int | None = None,
+    n_jobs: int | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Estimate the standard errors of the method of moments parameters of every cluster by a Poisson bootstrap.
+
+    Each replicate weights the data points of a cluster by independent Poisson(1) counts, which approximates resampling them with replacement. The weights of a batch of replicates are drawn as one matrix, and the moment sums of all replicates in the batch are a single matrix product of the weights with the moment basis 1, x, y, x^2, y^2 and xy of the data points. The clusters are bootstrapped in parallel, each with its own random stream, so the result does not depend on the number of threads.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    data_cluster_index
+        Cluster indices for each data point. Data points with negative indices are ignored.
+    n
+        Number of clusters.
+    replicate_num
+        Number of bootstrap replicates.
+    chunk_size
+        Number of weight matrix elements processed at once. A batch of replicates holds about chunk_size weights. If None, all replicates of a cluster are processed at once.
+    random_seed
+        Seed for the Poisson weights.
+    n_jobs
+        Number of threads bootstrapping the clusters. If None, the default of ThreadPoolExecutor is used.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 6) with the standard errors of amplitude, center x, center y, FWHM x, FWHM y, and position angle of each cluster. The position angle is compared modulo 180 degrees. Clusters with fewer than 2 finite replicates of a parameter get NaN.
+    """
+
+    labels = np.asarray(data_cluster_index, dtype=np.intp)
+    is_included = labels >= 0
+    labels = labels[is_included]
+    order = np.argsort(labels, kind="stable")
+    basis = _get_moment_basis(
+        data[is_included][order],
+        data_x[is_included][order],
+        data_y[is_included][order],
+    )
+    bounds = np.searchsorted(labels[order], np.arange(n + 1))
+    seeds = np.random.SeedSequence(random_seed).spawn(n)
+
+    def bootstrap(i: int) -> npt.NDArray[np.float64]:
+        return _bootstrap_cluster(
+            basis[bounds[i] : bounds[i + 1]],
+            replicate_num,
+            chunk_size,
+            np.random.default_rng(seeds[i]),
+        )
+
+    standard_errors = np.full((n, 6), np.nan)
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for i, cluster_errors in enumerate(executor.map(bootstrap, range(n))):
+            standard_errors[i] = cluster_errors
+    return standard_errors
+
+
+def _get_moment_basis(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+) -> npt.NDArray[np.float64]:
+    # data weighted 1, x, y, x^2, y^2 and xy of each data point, whose sum is the moment sums
+    x = np.asarray(data_x, dtype=np.float64)
+    y = np.asarray(data_y, dtype=np.float64)
+    basis = np.empty((len(data), 6))
+    basis[:, 0] = data
+    basis[:, 1] = x * data
+    basis[:, 2] = y * data
+    basis[:, 3] = basis[:, 1] * x
+    basis[:, 4] = basis[:, 2] * y
+    basis[:, 5] = basis[:, 1] * y
+    return basis
+
+
+def _bootstrap_cluster(
+    basis: npt.NDArray[np.float64],
+    replicate_num: int,
+    chunk_size: int | None,
+    rng: np.random.Generator,
+) -> npt.NDArray[np.float64]:
+    if len(basis) == 0:
+        return np.full(6, np.nan)
+
+    estimate = get_parameters_from_moment_sums(basis.sum(axis=0))
+    batch_size = (
+        replicate_num if chunk_size is None else max(chunk_size // len(basis), 1)
+    )
+
+    # deviations from the estimate of all data points, which keeps the sums well conditioned
+    count = np.zeros(6)
+    deviation_sum = np.zeros(6)
+    sq_deviation_sum = np.zeros(6)
+    for start in range(0, replicate_num, batch_size):
+        num = min(batch_size, replicate_num - start)
+        weights = rng.poisson(1.0, (num, len(basis))).astype(np.float64)
+        deviations = get_parameters_from_moment_sums(weights @ basis) - estimate
+        deviations[:, 5] = (deviations[:, 5] + 90) % 180 - 90
+        is_finite = np.isfinite(deviations)
+        deviations[~is_finite] = 0
+        count += is_finite.sum(axis=0)
+        deviation_sum += deviations.sum(axis=0)
+        sq_deviation_sum += np.square(deviations).sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (sq_deviation_sum - np.square(deviation_sum) / count) / (count - 1)
+    standard_errors: npt.NDArray[np.float64] = np.where(
+        count > 1, np.sqrt(np.maximum(variance, 0)), np.nan
+    )
+    return standard_errors
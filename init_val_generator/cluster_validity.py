@@ -0,0 +1,525 @@
+from enum import StrEnum
+import math
+import numpy as np
+import numpy.typing as npt
+
+from .clustering import get_silhouette_score
+from .method_of_moments import grouped_moment_sums
+from .memory import iterate_chunks
+from .deadline import Deadline
+from .workspace import Workspace, get_buffer
+
+
+class ClusteringCriterion(StrEnum):
+    SILHOUETTE = "silhouette"
+    CALINSKI_HARABASZ = "calinski-harabasz"
+    DAVIES_BOULDIN = "davies-bouldin"
+    BIC = "bic"
+
+
+HIGHER_IS_BETTER = {
+    ClusteringCriterion.SILHOUETTE: True,
+    ClusteringCriterion.CALINSKI_HARABASZ: True,
+    ClusteringCriterion.DAVIES_BOULDIN: False,
+    ClusteringCriterion.BIC: False,
+}
+
+# without a threshold, the best Calinski-Harabasz or Davies-Bouldin clustering is compared with a single cluster by BIC
+DEFAULT_THRESHOLDS: dict[ClusteringCriterion, float | None] = {
+    ClusteringCriterion.SILHOUETTE: 0.6,
+    ClusteringCriterion.CALINSKI_HARABASZ: None,
+    ClusteringCriterion.DAVIES_BOULDIN: None,
+    ClusteringCriterion.BIC: 0.0,
+}
+
+# variance of a uniform distribution over one pixel, keeps single-pixel clusters non-degenerate
+PIXEL_VARIANCE = 1 / 12
+
+
+def get_cluster_statistics(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.intp],
+    n: int,
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Accumulate the per-cluster weighted sums used by the cluster validity criteria.
+
+    The weights are the absolute data values, the same weights used by k-means clustering.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    data_cluster_index
+        Cluster indices for each data point.
+    n
+        Number of clusters.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the buffers of the weights and the weighted coordinates. If None, the buffers are allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 6) with the weight, weighted sum of x, y, x^2, y^2 and xy of each cluster.
+    """
+
+    cluster_stats = np.zeros((n, 6))
+    buffer_size = len(data) if chunk_size is None else min(chunk_size, len(data))
+    weight_buffer = get_buffer(workspace, "abs_data", buffer_size, np.float64)
+    for chunk in iterate_chunks(len(data), chunk_size):
+        cluster_stats += grouped_moment_sums(
+            np.abs(data[chunk], out=weight_buffer[: chunk.stop - chunk.start]),
+            data_x[chunk],
+            data_y[chunk],
+            data_cluster_index[chunk],
+            n,
+            workspace=workspace,
+        )
+    return cluster_stats
+
+
+def _get_centroids_and_scatter(
+    cluster_stats: npt.NDArray[np.float64],
+) -> tuple[
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+]:
+    cluster_stats = cluster_stats[cluster_stats[:, 0] > 0]
+    weight = cluster_stats[:, 0]
+    centroid_x = cluster_stats[:, 1] / weight
+    centroid_y = cluster_stats[:, 2] / weight
+    # within-cluster weighted sum of squared distances to the centroid
+    scatter = np.maximum(
+        cluster_stats[:, 3]
+        + cluster_stats[:, 4]
+        - weight * (np.square(centroid_x) + np.square(centroid_y)),
+        0,
+    )
+    return weight, centroid_x, centroid_y, scatter
+
+
+def merge_clusters(
+    cluster_stats: npt.NDArray[np.float64],
+) -> list[npt.NDArray[np.float64]]:
+    """
+    Greedily merge clusters by Ward's criterion using only their statistics.
+
+    At each step the two clusters whose merge least increases the within-cluster weighted sum of squared distances are merged, which costs w_a * w_b / (w_a + w_b) times the squared distance between their centroids. The statistics of the merged cluster are the sums of the statistics of the two clusters, so the data points are not visited.
+
+    Parameters
+    ----------
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics. Empty clusters are dropped.
+
+    Returns
+    -------
+    list[numpy.ndarray]
+        The per-cluster statistics after each merge, from all non-empty clusters down to a single cluster.
+    """
+
+    cluster_stats = cluster_stats[cluster_stats[:, 0] > 0].copy()
+    num = len(cluster_stats)
+    if num == 0:
+        return []
+
+    def get_cost(i: int | slice) -> npt.NDArray[np.float64]:
+        weight = cluster_stats[:, 0]
+        centroid_x = cluster_stats[:, 1] / weight
+        centroid_y = cluster_stats[:, 2] / weight
+        sq_dist = np.square(centroid_x[i, None] - centroid_x) + np.square(
+            centroid_y[i, None] - centroid_y
+        )
+        return weight[i, None] * weight / (weight[i, None] + weight) * sq_dist
+
+    cost = get_cost(slice(None))
+    np.fill_diagonal(cost, np.inf)
+    # cheapest merge of each cluster, so a merge updates one row and one column instead of searching the matrix
+    nearest = np.argmin(cost, axis=1)
+    nearest_cost = cost[np.arange(num), nearest]
+    is_active = np.ones(num, dtype=bool)
+    levels = [cluster_stats.copy()]
+    for _ in range(num - 1):
+        # the first row and column of the minimum, as np.argmin over the matrix
+        i = int(np.argmin(nearest_cost))
+        i, j = sorted((i, int(nearest[i])))
+        cluster_stats[i] += cluster_stats[j]
+        is_active[j] = False
+        cost[j, :] = np.inf
+        cost[:, j] = np.inf
+        nearest_cost[j] = np.inf
+
+        merged_cost = get_cost(slice(i, i + 1))[0]
+        merged_cost[~is_active] = np.inf
+        merged_cost[i] = np.inf
+        cost[i, :] = merged_cost
+        cost[:, i] = merged_cost
+        nearest[i] = np.argmin(merged_cost)
+        nearest_cost[i] = merged_cost[nearest[i]]
+
+        # rows whose nearest cluster was merged are searched again, the others compare with the merged cluster
+        is_stale = is_active & ((nearest == i) | (nearest == j))
+        is_stale[i] = False
+        for r in np.flatnonzero(is_stale):
+            nearest[r] = np.argmin(cost[r])
+            nearest_cost[r] = cost[r, nearest[r]]
+        is_closer = (merged_cost < nearest_cost) | (
+            (merged_cost == nearest_cost) & (i < nearest)
+        )
+        is_closer &= is_active & ~is_stale
+        nearest[is_closer] = i
+        nearest_cost[is_closer] = merged_cost[is_closer]
+        levels.append(cluster_stats[is_active].copy())
+
+    return levels
+
+
+def calinski_harabasz_score(cluster_stats: npt.NDArray[np.float64], num: int) -> float:
+    """
+    Calculate the Calinski-Harabasz index from per-cluster statistics. Higher is better.
+
+    Parameters
+    ----------
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics.
+    num
+        Number of data points.
+
+    Returns
+    -------
+    float
+        The Calinski-Harabasz index.
+    """
+
+    weight, centroid_x, centroid_y, scatter = _get_centroids_and_scatter(cluster_stats)
+    k = len(weight)
+    if k < 2 or num <= k:
+        return 0.0
+
+    total_weight = weight.sum()
+    mean_x = np.dot(weight, centroid_x) / total_weight
+    mean_y = np.dot(weight, centroid_y) / total_weight
+    between = np.dot(
+        weight, np.square(centroid_x - mean_x) + np.square(centroid_y - mean_y)
+    )
+    within = scatter.sum()
+    if within == 0:
+        return math.inf
+
+    return float((between / (k - 1)) / (within / (num - k)))
+
+
+def davies_bouldin_score(cluster_stats: npt.NDArray[np.float64]) -> float:
+    """
+    Calculate the Davies-Bouldin index from per-cluster statistics. Lower is better.
+
+    The cluster scatter is the weighted root-mean-square distance to the centroid.
+
+    Parameters
+    ----------
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics.
+
+    Returns
+    -------
+    float
+        The Davies-Bouldin index.
+    """
+
+    weight, centroid_x, centroid_y, scatter = _get_centroids_and_scatter(cluster_stats)
+    k = len(weight)
+    if k < 2:
+        return 0.0
+
+    rms = np.sqrt(scatter / weight)
+    separation = np.sqrt(
+        np.square(centroid_x[:, None] - centroid_x[None, :])
+        + np.square(centroid_y[:, None] - centroid_y[None, :])
+    )
+    np.fill_diagonal(separation, np.inf)
+    with np.errstate(divide="ignore"):
+        similarity = (rms[:, None] + rms[None, :]) / separation
+    return float(np.mean(np.max(similarity, axis=1)))
+
+
+def bic_score(cluster_stats: npt.NDArray[np.float64], num: int) -> float:
+    """
+    Calculate the Bayesian information criterion of the Gaussian mixture given by the moments of each cluster. Lower is better.
+
+    The weights are rescaled to sum to the number of data points, so the likelihood is comparable to the parameter penalty.
+
+    Parameters
+    ----------
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics.
+    num
+        Number of data points.
+
+    Returns
+    -------
+    float
+        The Bayesian information criterion.
+    """
+
+    weight, centroid_x, centroid_y, _ = _get_centroids_and_scatter(cluster_stats)
+    cluster_stats = cluster_stats[cluster_stats[:, 0] > 0]
+    k = len(weight)
+    if k == 0:
+        return math.inf
+
+    var_x = cluster_stats[:, 3] / weight - np.square(centroid_x) + PIXEL_VARIANCE
+    var_y = cluster_stats[:, 4] / weight - np.square(centroid_y) + PIXEL_VARIANCE
+    cov_xy = cluster_stats[:, 5] / weight - centroid_x * centroid_y
+    det = np.maximum(var_x * var_y - np.square(cov_xy), PIXEL_VARIANCE**2)
+
+    count = weight * num / weight.sum()
+    log_likelihood = np.dot(
+        count,
+        np.log(count / num) - math.log(2 * math.pi) - 0.5 * np.log(det) - 1,
+    )
+    param_num = 6 * k - 1
+    return float(-2 * log_likelihood + param_num * math.log(num))
+
+
+def is_bic_decreased(cluster_stats: npt.NDArray[np.float64], num: int) -> bool:
+    """
+    Check if the clusters have a lower Bayesian information criterion than a single cluster of the same data points.
+
+    The statistics of the single cluster are the sums of the per-cluster statistics, so no pass over the data points is needed.
+
+    Parameters
+    ----------
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics.
+    num
+        Number of data points.
+
+    Returns
+    -------
+    bool
+        True if the BIC of the clusters is lower.
+    """
+
+    single_cluster_stats = cluster_stats.sum(axis=0, keepdims=True)
+    return bic_score(cluster_stats, num) < bic_score(single_cluster_stats, num)
+
+
+def get_criterion_score(
+    criterion: ClusteringCriterion,
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    data_cluster_index: npt.NDArray[np.intp],
+    chunk_size: int | None = None,
+    deadline: Deadline | None = None,
+    workspace: Workspace | None = None,
+) -> float:
+    """
+    Score a clustering result with the given cluster validity criterion.
+
+    Parameters
+    ----------
+    criterion
+        The cluster validity criterion.
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    centroid_x
+        X coordinates of the centroids.
+    centroid_y
+        Y coordinates of the centroids.
+    data_cluster_index
+        Cluster indices for each data point.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    deadline
+        Deadline of the scoring. The silhouette score raises DeadlineExceeded when it is reached. If None, the scoring is not limited by time.
+    workspace
+        Workspace providing the scratch buffers of the scoring. If None, the buffers are allocated.
+
+    Returns
+    -------
+    float
+        The score of the clustering result.
+    """
+
+    if criterion == ClusteringCriterion.SILHOUETTE:
+        return get_silhouette_score(
+            data,
+            data_x,
+            data_y,
+            centroid_x,
+            centroid_y,
+            data_cluster_index,
+            deadline,
+            workspace,
+        )
+
+    cluster_stats = get_cluster_statistics(
+        data,
+        data_x,
+        data_y,
+        data_cluster_index,
+        len(centroid_x),
+        chunk_size,
+        workspace,
+    )
+    return get_score_from_statistics(criterion, cluster_stats, len(data))
+
+
+def get_score_from_statistics(
+    criterion: ClusteringCriterion, cluster_stats: npt.NDArray[np.float64], num: int
+) -> float:
+    """
+    Score a clustering result from its per-cluster statistics.
+
+    Parameters
+    ----------
+    criterion
+        The cluster validity criterion. The silhouette score is not supported.
+    cluster_stats
+        Per-cluster statistics from get_cluster_statistics.
+    num
+        Number of data points.
+
+    Returns
+    -------
+    float
+        The score of the clustering result.
+    """
+
+    if criterion == ClusteringCriterion.CALINSKI_HARABASZ:
+        return calinski_harabasz_score(cluster_stats, num)
+    elif criterion == ClusteringCriterion.DAVIES_BOULDIN:
+        return davies_bouldin_score(cluster_stats)
+    elif criterion == ClusteringCriterion.BIC:
+        return bic_score(cluster_stats, num)
+    else:
+        raise Exception(
+            "The {} criterion can not be computed from cluster statistics.".format(
+                criterion
+            )
+        )
+
+
+def is_score_dropped(criterion: ClusteringCriterion, score: float, prev: float) -> bool:
+    """
+    Check if a score is worse than the previous one.
+
+    Parameters
+    ----------
+    criterion
+        The cluster validity criterion.
+    score
+        The current score.
+    prev
+        The previous score.
+
+    Returns
+    -------
+    bool
+        True if the current score is worse.
+    """
+
+    if HIGHER_IS_BETTER[criterion]:
+        return score < prev
+    return score > prev
+
+
+def select_component_number(
+    criterion: ClusteringCriterion,
+    scores: list[float],
+    threshold: float | None = None,
+    single_component_score: float | None = None,
+) -> int:
+    """
+    Select the number of components from the scores of the clustering results.
+
+    The best score is accepted only if it passes the threshold. For the silhouette and Calinski-Harabasz criteria the best score must be at least the threshold, for the Davies-Bouldin criterion at most the threshold. For BIC the best score must be lower than the single-component BIC by at least the threshold. A threshold of None accepts any best score, so the Calinski-Harabasz and Davies-Bouldin criteria, which do not score a single cluster, need a separate check such as is_bic_decreased to select a single component.
+
+    Parameters
+    ----------
+    criterion
+        The cluster validity criterion.
+    scores
+        Scores of the clustering results with 2, 3, ... components.
+    threshold
+        The threshold for accepting the best score.
+    single_component_score
+        The score with a single component. Only used for BIC.
+
+    Returns
+    -------
+    int
+        The selected number of components.
+    """
+
+    if len(scores) == 0:
+        return 1
+
+    if HIGHER_IS_BETTER[criterion]:
+        best_index = int(np.argmax(scores))
+    else:
+        best_index = int(np.argmin(scores))
+
+    if not is_score_accepted(
+        criterion, scores[best_index], threshold, single_component_score
+    ):
+        return 1
+
+    return best_index + 2
+
+
+def is_score_accepted(
+    criterion: ClusteringCriterion,
+    score: float,
+    threshold: float | None = None,
+    single_component_score: float | None = None,
+) -> bool:
+    """
+    Check if the score of a multi-component clustering result passes the threshold.
+
+    Parameters
+    ----------
+    criterion
+        The cluster validity criterion.
+    score
+        The score of the clustering result.
+    threshold
+        The threshold for accepting the score. If None, any score is accepted.
+    single_component_score
+        The score with a single component. Only used for BIC.
+
+    Returns
+    -------
+    bool
+        True if the score is accepted.
+    """
+
+    if threshold is None:
+        return True
+
+    if criterion == ClusteringCriterion.BIC:
+        return (
+            single_component_score is None
+            or single_component_score - score >= threshold
+        )
+    elif HIGHER_IS_BETTER[criterion]:
+        return score >= threshold
+    return score <= threshold
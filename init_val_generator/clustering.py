@@ -1,16 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+import time
 import numpy as np
 import numpy.typing as npt
 
+from .memory import iterate_chunks
+from .workspace import Workspace, get_buffer
+from .deadline import Deadline, DeadlineExceeded
+from .spatial_index import assign_clusters_with_grid
+
+# number of data points scored between the deadline checks of the silhouette score
+DEADLINE_CHECK_INTERVAL = 256
+# smallest number of centroids assigned through a centroid grid
+SPATIAL_INDEX_MIN_NUM = 32
+MAX_ITER = 10
+# relative margin of the distance bounds against rounding
+BOUND_TOLERANCE = 1e-9
+
+
+class KMeansAlgorithm(StrEnum):
+    LLOYD = "lloyd"
+    HAMERLY = "hamerly"
+
+
+@dataclass
+class KMeansRestart:
+    """
+    Result of one restart of the K-means clustering.
+
+    Attributes
+    ----------
+    index
+        Index of the restart.
+    inertia
+        Weighted sum of squared distances of data points to their centroids.
+    elapsed
+        Wall-clock time of the restart in seconds.
+    skipped
+        Fraction of the point-centroid distance evaluations skipped by k_means_hamerly, or None if the restart ran k_means.
+    """
+
+    index: int
+    inertia: float
+    elapsed: float
+    skipped: float | None = None
+
 
 def k_means_plus_plus(
     data: npt.NDArray[np.float64],
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     n: int,
+    rng: np.random.Generator | None = None,
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
 ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
     """
     Perform K-means++ initialization to choose initial centroids for K-means clustering.
 
+    Without a random generator, the brightest pixel is the first centroid and each next centroid is the pixel farthest from the chosen ones. With a random generator, the centroids are drawn with probability proportional to the absolute data value times the squared distance to the chosen ones.
+
     Parameters
     ----------
     data
@@ -21,6 +71,12 @@ def k_means_plus_plus(
         Y coordinates of data points.
     n
         Number of centroids to initialize.
+    rng
+        Random generator for the weighted random initialization.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the scratch buffers. If None, the buffers are allocated.
 
     Returns
     -------
@@ -31,39 +87,84 @@ def k_means_plus_plus(
     init_centroid_x = np.empty(n)
     init_centroid_y = np.empty(n)
 
-    initIndex = np.argmax(np.abs(data))  # find the max pixel instead of a random pixel
+    if rng is None:
+        # find the max pixel instead of a random pixel
+        initIndex = int(np.argmax(np.abs(data)))
+    else:
+        initIndex = _draw_index(rng, np.abs(data))
     init_centroid_x[0] = data_x[initIndex]
     init_centroid_y[0] = data_y[initIndex]
 
-    def getWeightedDist(
-        centroid_x: np.float64, centroid_y: np.float64
-    ) -> npt.NDArray[np.float64]:
-        # type hint undefined in np.sqrt
-        dist: npt.NDArray[np.float64] = np.sqrt(
-            np.square(data_x - centroid_x) + np.square(data_y - centroid_y)
-        )
-        return np.abs(data) * dist
-
+    # distance to the nearest chosen centroid, updated with each new centroid
+    dist = get_buffer(workspace, "min_dist", len(data))
+    dist.fill(np.inf)
+    buffer_size = len(data) if chunk_size is None else min(chunk_size, len(data))
+    new_dist_buffer = get_buffer(workspace, "dist", buffer_size)
+    sq_dist_buffer = get_buffer(workspace, "sq_dist", buffer_size)
     for i in range(1, n):
-        dist = getWeightedDist(init_centroid_x[0], init_centroid_y[0])
-        for j in range(1, i):
-            newDist = getWeightedDist(init_centroid_x[j], init_centroid_y[j])
-            dist = np.minimum(dist, newDist)
+        for chunk in iterate_chunks(len(data), chunk_size):
+            newDist = new_dist_buffer[: chunk.stop - chunk.start]
+            sq_dist = sq_dist_buffer[: chunk.stop - chunk.start]
+            _get_weighted_distance(
+                data[chunk],
+                data_x[chunk],
+                data_y[chunk],
+                init_centroid_x[i - 1],
+                init_centroid_y[i - 1],
+                newDist,
+                sq_dist,
+            )
+            np.minimum(dist[chunk], newDist, out=dist[chunk])
 
-        newIndex = np.argmax(dist)
+        if rng is None:
+            newIndex = int(np.argmax(dist))
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                newIndex = _draw_index(rng, dist * dist / np.abs(data))
         init_centroid_x[i] = data_x[newIndex]
         init_centroid_y[i] = data_y[newIndex]
 
     return init_centroid_x, init_centroid_y
 
 
+def _draw_index(rng: np.random.Generator, prob: npt.NDArray[np.float64]) -> int:
+    prob = np.nan_to_num(prob)
+    total = prob.sum()
+    if total <= 0:
+        return int(rng.integers(len(prob)))
+    return int(rng.choice(len(prob), p=prob / total))
+
+
+def _get_weighted_distance(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    x: float,
+    y: float,
+    out: npt.NDArray[np.float64],
+    buffer: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    # |data| * sqrt((data_x - x)^2 + (data_y - y)^2) without full-size temporaries
+    np.subtract(data_x, x, out=buffer)
+    np.square(buffer, out=buffer)
+    np.subtract(data_y, y, out=out)
+    np.square(out, out=out)
+    np.add(buffer, out, out=out)
+    np.sqrt(out, out=out)
+    np.abs(data, out=buffer)
+    return np.multiply(buffer, out, out=out)
+
+
 def k_means(
     data: npt.NDArray[np.float64],
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     centroid_x: npt.NDArray[np.float64],
     centroid_y: npt.NDArray[np.float64],
-) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
+    deadline: Deadline | None = None,
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
     """
     Perform K-means clustering on the input data.
 
@@ -79,45 +180,42 @@ def k_means(
         X coordinates of initial centroids.
     centroid_y
         Y coordinates of initial centroids.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the scratch buffers. If None, the buffers are allocated.
+    deadline
+        Deadline of the clustering. When it is reached, the iterations stop with the last assignment of the data points. If None, the iterations are not limited by time.
 
     tuple
         X coordinates of the initialized centroids, Y coordinates of the initialized centroids, cluster indices for each data point.
     """
 
-    MAX_ITER = 10
     n = len(centroid_x)
+    buffer_size = len(data) if chunk_size is None else min(chunk_size, len(data))
+    weight_buffer = get_buffer(workspace, "weight", buffer_size)
+    weighted_buffer = get_buffer(workspace, "weighted", buffer_size)
     for iter in range(MAX_ITER):
 
-        new_centroid_x = np.zeros(n)
-        new_centroid_y = np.zeros(n)
-        new_centroid_sum = np.zeros(n)
-        data_cluster_index = np.full((data.shape), -1)
+        data_cluster_index = assign_clusters(
+            data, data_x, data_y, centroid_x, centroid_y, chunk_size, workspace
+        )
+        new_centroid_x, new_centroid_y = _update_centroids(
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            n,
+            chunk_size,
+            weight_buffer,
+            weighted_buffer,
+        )
 
-        for i in range(len(data)):
-            dist = np.abs(data[i]) * np.sqrt(
-                (np.square(data_x[i] - centroid_x) + np.square(data_y[i] - centroid_y))
-            )
-            cluster_index = np.argmin(dist)
-            data_cluster_index[i] = cluster_index
-            new_centroid_x[cluster_index] += np.abs(data[i]) * data_x[i]
-            new_centroid_y[cluster_index] += np.abs(data[i]) * data_y[i]
-            new_centroid_sum[cluster_index] += np.abs(data[i])
-
-        new_centroid_x /= new_centroid_sum
-        new_centroid_y /= new_centroid_sum
-
-        isCoverged = True
-        for i in range(n):
-            if (
-                new_centroid_x[i] - centroid_x[i] >= 1
-                or new_centroid_y[i] - centroid_y[i] >= 1
-            ):
-                isCoverged = False
-                break
-
-        if isCoverged:
+        if _is_converged(centroid_x, centroid_y, new_centroid_x, new_centroid_y):
             # print("k-means clustering converged: {} iterations".format(iter))
             break
+        elif deadline is not None and deadline.is_expired():
+            break
         else:
             centroid_x = new_centroid_x
             centroid_y = new_centroid_y
@@ -125,9 +223,495 @@ def k_means(
     return data_cluster_index, centroid_x, centroid_y
 
 
+def _update_centroids(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.intp],
+    n: int,
+    chunk_size: int | None,
+    weight_buffer: npt.NDArray[np.float64],
+    weighted_buffer: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    new_centroid_x = np.zeros(n)
+    new_centroid_y = np.zeros(n)
+    new_centroid_sum = np.zeros(n)
+    for chunk in iterate_chunks(len(data), chunk_size):
+        weight = np.abs(data[chunk], out=weight_buffer[: chunk.stop - chunk.start])
+        weighted = weighted_buffer[: chunk.stop - chunk.start]
+        cluster_index = data_cluster_index[chunk]
+        new_centroid_x += np.bincount(
+            cluster_index,
+            weights=np.multiply(weight, data_x[chunk], out=weighted),
+            minlength=n,
+        )
+        new_centroid_y += np.bincount(
+            cluster_index,
+            weights=np.multiply(weight, data_y[chunk], out=weighted),
+            minlength=n,
+        )
+        new_centroid_sum += np.bincount(cluster_index, weights=weight, minlength=n)
+
+    new_centroid_x /= new_centroid_sum
+    new_centroid_y /= new_centroid_sum
+    return new_centroid_x, new_centroid_y
+
+
+def _is_converged(
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    new_centroid_x: npt.NDArray[np.float64],
+    new_centroid_y: npt.NDArray[np.float64],
+) -> bool:
+    for i in range(len(centroid_x)):
+        if (
+            new_centroid_x[i] - centroid_x[i] >= 1
+            or new_centroid_y[i] - centroid_y[i] >= 1
+        ):
+            return False
+    return True
+
+
+def k_means_hamerly(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    chunk_size: int | None = None,
+    deadline: Deadline | None = None,
+) -> tuple[
+    npt.NDArray[np.intp], npt.NDArray[np.float64], npt.NDArray[np.float64], float
+]:
+    """
+    Perform K-means clustering with Hamerly's bounds, skipping the distance evaluations that can not change the assignment.
+
+    Each data point keeps an upper bound of the distance to its centroid and a lower bound of the distance to any other centroid, loosened by the centroid shifts of each iteration. A data point keeps its cluster without evaluating distances if the upper bound is below the lower bound or half the distance from its centroid to the nearest other centroid. The bounds are tested with a margin against rounding, so the clustering result is the same as from k_means.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    centroid_x
+        X coordinates of initial centroids.
+    centroid_y
+        Y coordinates of initial centroids.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    deadline
+        Deadline of the clustering. When it is reached, the iterations stop with the last assignment of the data points. If None, the iterations are not limited by time.
+
+    Returns
+    -------
+    tuple
+        Cluster indices for each data point, X coordinates of the centroids, Y coordinates of the centroids, and the fraction of the point-centroid distance evaluations of k_means that were skipped.
+    """
+
+    n = len(centroid_x)
+    num = len(data)
+    buffer_size = num if chunk_size is None else min(chunk_size, num)
+    weight_buffer = np.empty(buffer_size)
+    weighted_buffer = np.empty(buffer_size)
+    # zero and NaN weights tie at every centroid and stay in the first cluster
+    is_weighted = np.abs(data) > 0
+
+    evaluations = 0
+    iter_num = 0
+    data_cluster_index = np.zeros(num, dtype=np.intp)
+    upper = np.empty(num)
+    lower = np.empty(num)
+    prev_centroid_x = prev_centroid_y = None
+    for iter in range(MAX_ITER):
+        iter_num += 1
+        is_finite = np.all(np.isfinite(centroid_x) & np.isfinite(centroid_y))
+        if prev_centroid_x is None or prev_centroid_y is None or not is_finite:
+            data_cluster_index = assign_clusters(
+                data, data_x, data_y, centroid_x, centroid_y, chunk_size
+            )
+            if is_finite:
+                _set_bounds(
+                    data_x,
+                    data_y,
+                    centroid_x,
+                    centroid_y,
+                    data_cluster_index,
+                    np.arange(num),
+                    upper,
+                    lower,
+                    chunk_size,
+                )
+            evaluations += num * n
+        else:
+            evaluations += _update_assignment(
+                data,
+                data_x,
+                data_y,
+                prev_centroid_x,
+                prev_centroid_y,
+                centroid_x,
+                centroid_y,
+                data_cluster_index,
+                is_weighted,
+                upper,
+                lower,
+                chunk_size,
+            )
+
+        new_centroid_x, new_centroid_y = _update_centroids(
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            n,
+            chunk_size,
+            weight_buffer,
+            weighted_buffer,
+        )
+
+        if _is_converged(centroid_x, centroid_y, new_centroid_x, new_centroid_y):
+            break
+        elif deadline is not None and deadline.is_expired():
+            break
+        else:
+            prev_centroid_x, prev_centroid_y = centroid_x, centroid_y
+            centroid_x = new_centroid_x
+            centroid_y = new_centroid_y
+
+    skipped = 1 - evaluations / max(iter_num * num * n, 1)
+    return data_cluster_index, centroid_x, centroid_y, skipped
+
+
+def _update_assignment(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    prev_centroid_x: npt.NDArray[np.float64],
+    prev_centroid_y: npt.NDArray[np.float64],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    data_cluster_index: npt.NDArray[np.intp],
+    is_weighted: npt.NDArray[np.bool_],
+    upper: npt.NDArray[np.float64],
+    lower: npt.NDArray[np.float64],
+    chunk_size: int | None,
+) -> int:
+    # loosen the bounds by the centroid shifts, NaN bounds after NaN centroids fail every test
+    shift = np.sqrt(
+        np.square(centroid_x - prev_centroid_x)
+        + np.square(centroid_y - prev_centroid_y)
+    )
+    upper += shift[data_cluster_index]
+    if len(shift) > 1:
+        order = np.argsort(shift)
+        max_shift = np.full(len(shift), shift[order[-1]])
+        max_shift[order[-1]] = shift[order[-2]]
+        lower -= max_shift[data_cluster_index]
+
+    separation = np.sqrt(
+        np.square(centroid_x[:, None] - centroid_x)
+        + np.square(centroid_y[:, None] - centroid_y)
+    )
+    np.fill_diagonal(separation, np.inf)
+    half_separation = 0.5 * separation.min(axis=1)
+
+    bound = np.maximum(half_separation[data_cluster_index], lower)
+    bound *= 1 - BOUND_TOLERANCE
+    index = np.flatnonzero(is_weighted & ~(upper < bound))
+    evaluations = len(index)
+
+    # tighten the upper bound before evaluating all centroids
+    cluster_index = data_cluster_index[index]
+    upper[index] = np.sqrt(
+        np.square(data_x[index] - centroid_x[cluster_index])
+        + np.square(data_y[index] - centroid_y[cluster_index])
+    )
+    index = index[~(upper[index] < bound[index])]
+    evaluations += len(index) * len(centroid_x)
+
+    data_cluster_index[index] = assign_clusters(
+        data[index], data_x[index], data_y[index], centroid_x, centroid_y, chunk_size
+    )
+    _set_bounds(
+        data_x,
+        data_y,
+        centroid_x,
+        centroid_y,
+        data_cluster_index,
+        index,
+        upper,
+        lower,
+        chunk_size,
+    )
+    return evaluations
+
+
+def _set_bounds(
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    data_cluster_index: npt.NDArray[np.intp],
+    index: npt.NDArray[np.intp],
+    upper: npt.NDArray[np.float64],
+    lower: npt.NDArray[np.float64],
+    chunk_size: int | None,
+) -> None:
+    for chunk in iterate_chunks(len(index), chunk_size):
+        chunk_index = index[chunk]
+        dist = np.sqrt(
+            np.square(data_x[chunk_index, None] - centroid_x)
+            + np.square(data_y[chunk_index, None] - centroid_y)
+        )
+        rows = np.arange(len(chunk_index))
+        cluster_index = data_cluster_index[chunk_index]
+        upper[chunk_index] = dist[rows, cluster_index]
+        dist[rows, cluster_index] = np.inf
+        lower[chunk_index] = dist.min(axis=1)
+
+
+def k_means_restarts(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    n: int,
+    n_init: int = 4,
+    random_seed: int | None = None,
+    n_jobs: int | None = None,
+    chunk_size: int | None = None,
+    deadline: Deadline | None = None,
+    algorithm: KMeansAlgorithm = KMeansAlgorithm.LLOYD,
+) -> tuple[
+    npt.NDArray[np.intp],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    list[KMeansRestart],
+]:
+    """
+    Perform K-means clustering several times from weighted random K-means++ initializations and keep the result with the lowest inertia.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    n
+        Number of clusters.
+    n_init
+        Number of restarts.
+    random_seed
+        Seed for the independent random generators of the restarts.
+    n_jobs
+        Number of threads running the restarts. If None, the default of ThreadPoolExecutor is used.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    deadline
+        Deadline of the clustering, shared by all restarts. If None, the restarts are not limited by time.
+    algorithm
+        K-means algorithm of the restarts: "lloyd" for k_means, "hamerly" for k_means_hamerly, which gives the same clustering and records the fraction of skipped distance evaluations of each restart.
+
+    Returns
+    -------
+    tuple
+        Cluster indices for each data point, X coordinates of the centroids, Y coordinates of the centroids, and the results of all restarts.
+    """
+
+    seeds = np.random.SeedSequence(random_seed).spawn(n_init)
+
+    def restart(index: int) -> tuple[
+        npt.NDArray[np.intp],
+        npt.NDArray[np.float64],
+        npt.NDArray[np.float64],
+        KMeansRestart,
+    ]:
+        start = time.perf_counter()
+        init_centroid_x, init_centroid_y = k_means_plus_plus(
+            data, data_x, data_y, n, np.random.default_rng(seeds[index]), chunk_size
+        )
+        skipped = None
+        if algorithm == KMeansAlgorithm.HAMERLY:
+            data_cluster_index, centroid_x, centroid_y, skipped = k_means_hamerly(
+                data,
+                data_x,
+                data_y,
+                init_centroid_x,
+                init_centroid_y,
+                chunk_size,
+                deadline,
+            )
+        else:
+            data_cluster_index, centroid_x, centroid_y = k_means(
+                data,
+                data_x,
+                data_y,
+                init_centroid_x,
+                init_centroid_y,
+                chunk_size,
+                deadline=deadline,
+            )
+        inertia = get_inertia(
+            data,
+            data_x,
+            data_y,
+            centroid_x,
+            centroid_y,
+            data_cluster_index,
+            chunk_size,
+        )
+        elapsed = time.perf_counter() - start
+        return (
+            data_cluster_index,
+            centroid_x,
+            centroid_y,
+            KMeansRestart(index, inertia, elapsed, skipped),
+        )
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(restart, range(n_init)))
+
+    restarts = [result[3] for result in results]
+    best = int(np.nanargmin([restart.inertia for restart in restarts]))
+    data_cluster_index, centroid_x, centroid_y, _ = results[best]
+    return data_cluster_index, centroid_x, centroid_y, restarts
+
+
+def get_inertia(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    data_cluster_index: npt.NDArray[np.intp],
+    chunk_size: int | None = None,
+) -> float:
+    """
+    Calculate the sum of squared distances of data points to their centroids, weighted by the absolute data value.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    centroid_x
+        X coordinates of centroids.
+    centroid_y
+        Y coordinates of centroids.
+    data_cluster_index
+        Cluster indices for each data point.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+
+    Returns
+    -------
+    float
+        The inertia of the clustering result.
+    """
+
+    inertia = 0.0
+    for chunk in iterate_chunks(len(data), chunk_size):
+        labels = np.asarray(data_cluster_index[chunk], dtype=np.intp)
+        sq_dist = np.square(data_x[chunk] - centroid_x[labels]) + np.square(
+            data_y[chunk] - centroid_y[labels]
+        )
+        inertia += float(np.dot(np.abs(data[chunk]), sq_dist))
+    return inertia
+
+
+def assign_clusters(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
+) -> npt.NDArray[np.intp]:
+    """
+    Assign each data point to the nearest centroid, weighted by the absolute data value.
+
+    With many finite centroids, the candidates of each data point are looked up in a centroid grid, so the cost grows with the number of data points rather than with the number of data points times centroids.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    centroid_x
+        X coordinates of centroids.
+    centroid_y
+        Y coordinates of centroids.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the scratch buffers and the returned array. If None, the buffers are allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Cluster indices for each data point.
+    """
+
+    data_cluster_index = get_buffer(workspace, "cluster_index", len(data), np.intp)
+    if len(centroid_x) >= SPATIAL_INDEX_MIN_NUM and np.all(
+        np.isfinite(centroid_x) & np.isfinite(centroid_y)
+    ):
+        return assign_clusters_with_grid(
+            data, data_x, data_y, centroid_x, centroid_y, chunk_size, data_cluster_index
+        )
+
+    data_cluster_index.fill(0)
+    buffer_size = len(data) if chunk_size is None else min(chunk_size, len(data))
+    min_dist_buffer = get_buffer(workspace, "min_dist", buffer_size)
+    dist_buffer = get_buffer(workspace, "dist", buffer_size)
+    sq_dist_buffer = get_buffer(workspace, "sq_dist", buffer_size)
+    is_closer_buffer = get_buffer(workspace, "is_closer", buffer_size, np.bool_)
+    is_nan_buffer = get_buffer(workspace, "is_nan", buffer_size, np.bool_)
+    for chunk in iterate_chunks(len(data), chunk_size):
+        num = chunk.stop - chunk.start
+        cluster_index = data_cluster_index[chunk]
+        min_dist = min_dist_buffer[:num]
+        min_dist.fill(np.inf)
+        dist = dist_buffer[:num]
+        is_closer = is_closer_buffer[:num]
+        is_nan = is_nan_buffer[:num]
+        for i in range(len(centroid_x)):
+            _get_weighted_distance(
+                data[chunk],
+                data_x[chunk],
+                data_y[chunk],
+                centroid_x[i],
+                centroid_y[i],
+                dist,
+                sq_dist_buffer[:num],
+            )
+            # the first minimum wins, and NaN counts as the minimum as in np.argmin
+            np.isnan(min_dist, out=is_closer)
+            np.logical_not(is_closer, out=is_closer)
+            np.isnan(dist, out=is_nan)
+            is_nan &= is_closer
+            np.less(dist, min_dist, out=is_closer)
+            is_closer |= is_nan
+            np.copyto(cluster_index, i, where=is_closer)
+            np.copyto(min_dist, dist, where=is_closer)
+
+    return data_cluster_index
+
+
 def mean_distance(
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     x: float,
     y: float,
 ) -> float:
@@ -139,23 +723,31 @@ def mean_distance(
 
 def get_silhouette_score(
     data: npt.NDArray[np.float64],
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     centroid_x: npt.NDArray[np.float64],
     centroid_y: npt.NDArray[np.float64],
-    data_cluster_index: npt.NDArray[np.float64],
+    data_cluster_index: npt.NDArray[np.intp],
+    deadline: Deadline | None = None,
+    workspace: Workspace | None = None,
 ) -> float:
 
     score = 0.0
     num = len(data)
+    is_member = get_buffer(workspace, "is_member", num, np.bool_)
 
     for i in range(num):
+        if deadline is not None and i % DEADLINE_CHECK_INTERVAL == 0:
+            if deadline.is_expired():
+                raise DeadlineExceeded()
+
         x = data_x[i]
         y = data_y[i]
         cluster_index = data_cluster_index[i]
 
-        data_x_cluster = data_x[data_cluster_index == cluster_index]
-        data_y_cluster = data_y[data_cluster_index == cluster_index]
+        np.equal(data_cluster_index, cluster_index, out=is_member)
+        data_x_cluster = data_x[is_member]
+        data_y_cluster = data_y[is_member]
 
         distances = [
             np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
@@ -164,12 +756,9 @@ def get_silhouette_score(
         sorted_indices = np.argsort(distances)
         second_nearest_cluster_index = sorted_indices[1]
 
-        data_x_second_nearest_cluster = data_x[
-            data_cluster_index == second_nearest_cluster_index
-        ]
-        data_y_second_nearest_cluster = data_y[
-            data_cluster_index == second_nearest_cluster_index
-        ]
+        np.equal(data_cluster_index, second_nearest_cluster_index, out=is_member)
+        data_x_second_nearest_cluster = data_x[is_member]
+        data_y_second_nearest_cluster = data_y[is_member]
 
         a = mean_distance(data_x_cluster, data_y_cluster, x, y)
         b = mean_distance(
@@ -0,0 +1,286 @@
+from collections.abc import Callable
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+from .init_val_generator import Estimates, InitValGenerator
+from .clustering import MAX_ITER, _is_converged, assign_clusters
+from .data_selection import SelectionMethod
+from .method_of_moments import get_parameters_from_moment_sums, grouped_moment_sums
+
+# lower and upper bound of the values excluded by a data selection
+Bounds = tuple[float, float]
+
+
+class DaskEstimator:
+    """
+    Estimates Gaussian components of an image stored as a chunked Dask array, such as a mosaic loaded from Zarr, without loading the image in one piece. Needs dask.
+
+    The image statistics of the data selection, the K-means initialization, the centroid updates of K-means and the moment sums are computed as reductions over the chunks, so only the centroids and the per-cluster sums are gathered. The estimates are the same as from InitValGenerator.estimate with the number of components given, up to the rounding of the sums in a different order.
+
+    Attributes
+    ----------
+    generator
+        The generator providing the data selections. Only the "3-sigma" selection or no selection, a single K-means initialization, and no refinement or bootstrap are supported.
+    scheduler
+        Dask scheduler computing the reductions, such as "threads" or "processes". If None, the default scheduler is used.
+
+    Examples
+    --------
+    >>> image = dask.array.from_zarr("mosaic.zarr")
+    >>> estimator = DaskEstimator(InitValGenerator("3-sigma", "3-sigma"))
+    >>> estimates = estimator.estimate(image, 5)
+    """
+
+    def __init__(
+        self, generator: InitValGenerator | None = None, scheduler: str | None = None
+    ) -> None:
+        """
+        Initialize the DaskEstimator.
+
+        Parameters
+        ----------
+        generator
+            The generator providing the data selections. If None, a generator with default settings is used.
+        scheduler
+            Dask scheduler computing the reductions. If None, the default scheduler is used.
+        """
+        self.generator = generator if generator is not None else InitValGenerator()
+        self.scheduler = scheduler
+        for selection in (
+            self.generator.data_selection,
+            self.generator.clustering_data_selection,
+        ):
+            if selection not in (None, SelectionMethod.THREE_SIGMA):
+                raise Exception(
+                    "The {} selection is not supported for Dask arrays.".format(
+                        selection
+                    )
+                )
+        if self.generator.n_init != 1:
+            raise Exception("K-means restarts are not supported for Dask arrays.")
+        if self.generator.refine_iterations > 0 or self.generator.bootstrap_replicates:
+            raise Exception(
+                "Refinement and bootstrap are not supported for Dask arrays."
+            )
+
+    def estimate(self, data: Any, n: int = 1) -> Estimates:
+        """
+        Estimates Gaussian components.
+
+        Parameters
+        ----------
+        data
+            The input image as a 2D array of shape (height, width): a Dask array, or an array that Dask can wrap such as a Zarr array.
+        n
+            Number of components.
+
+        Returns
+        -------
+        Estimates
+            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+        """
+
+        try:
+            import dask.array as da
+        except ImportError:
+            raise Exception("Estimating Dask arrays needs dask.")
+
+        image = data if isinstance(data, da.Array) else da.from_array(data)
+        if image.ndim != 2:
+            raise Exception("The Dask array must be a 2D image.")
+        if n < 1 or n > self.generator.max_components:
+            raise Exception("Invalid Gaussian component number.")
+
+        bounds = self._get_bounds(image, self.generator.data_selection)
+        if n == 1:
+            centroid_x = np.zeros(1)
+            centroid_y = np.zeros(1)
+        else:
+            clustering_bounds = (
+                bounds
+                if self.generator.clustering_data_selection
+                == self.generator.data_selection
+                else self._get_bounds(image, self.generator.clustering_data_selection)
+            )
+            centroid_x, centroid_y = self._k_means_plus_plus(
+                image, clustering_bounds, n
+            )
+            centroid_x, centroid_y = self._k_means(
+                image, clustering_bounds, centroid_x, centroid_y
+            )
+
+        sums = self._reduce(
+            image, _get_block_moment_sums, bounds, centroid_x, centroid_y
+        )
+        return Estimates(
+            get_parameters_from_moment_sums(sums[:, :6]),
+            pixel_num=sums[:, 6].astype(np.int64),
+            weight=sums[:, 7],
+        )
+
+    def _get_bounds(
+        self, image: Any, selection: SelectionMethod | None
+    ) -> Bounds | None:
+        if selection is None:
+            return None
+
+        # the population standard deviation in two passes, as filter_3_sigma
+        num, total = self._reduce(image, _get_block_sums)
+        (sq_deviation_sum,) = self._reduce(
+            image, _get_block_sq_deviation_sum, total / num
+        )
+        std = np.sqrt(sq_deviation_sum / num)
+        return -3 * std, 3 * std
+
+    def _k_means_plus_plus(
+        self, image: Any, bounds: Bounds | None, n: int
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        # the deterministic initialization of k_means_plus_plus: the brightest pixel, then the farthest pixels
+        centroid_x = np.empty(n)
+        centroid_y = np.empty(n)
+        for i in range(n):
+            candidates = self._map(
+                image, _get_block_farthest, bounds, centroid_x[:i], centroid_y[:i]
+            )
+            # the first maximum in the pixel order wins, as in np.argmax
+            _, x, y = max(
+                candidates,
+                key=lambda candidate: (candidate[0], -candidate[2], -candidate[1]),
+            )
+            centroid_x[i] = x
+            centroid_y[i] = y
+        return centroid_x, centroid_y
+
+    def _k_means(
+        self,
+        image: Any,
+        bounds: Bounds | None,
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        for _ in range(MAX_ITER):
+            sums = self._reduce(
+                image, _get_block_centroid_sums, bounds, centroid_x, centroid_y
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new_centroid_x = sums[:, 0] / sums[:, 2]
+                new_centroid_y = sums[:, 1] / sums[:, 2]
+            if _is_converged(centroid_x, centroid_y, new_centroid_x, new_centroid_y):
+                break
+            centroid_x = new_centroid_x
+            centroid_y = new_centroid_y
+        return centroid_x, centroid_y
+
+    def _map(self, image: Any, func: Callable[..., Any], *args: Any) -> list[Any]:
+        # applies func(block, x0, y0, *args) to every chunk and gathers the results
+        import dask
+
+        x_offsets = np.cumsum((0,) + image.chunks[1][:-1])
+        y_offsets = np.cumsum((0,) + image.chunks[0][:-1])
+        blocks = image.to_delayed()
+        tasks = [
+            dask.delayed(func)(blocks[i, j], int(x0), int(y0), *args)
+            for i, y0 in enumerate(y_offsets)
+            for j, x0 in enumerate(x_offsets)
+        ]
+        results: list[Any] = list(dask.compute(*tasks, scheduler=self.scheduler))
+        return results
+
+    def _reduce(
+        self, image: Any, func: Callable[..., Any], *args: Any
+    ) -> npt.NDArray[np.float64]:
+        sums: npt.NDArray[np.float64] = np.sum(self._map(image, func, *args), axis=0)
+        return sums
+
+
+def _get_block_points(
+    block: npt.NDArray[np.float64], x0: int, y0: int, bounds: Bounds | None
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    # selected data points of a chunk in the pixel order, with coordinates in the image
+    height, width = block.shape
+    data = np.asarray(block, dtype=np.float64).ravel()
+    data_x = np.tile(np.arange(x0, x0 + width), height)
+    data_y = np.repeat(np.arange(y0, y0 + height), width)
+    if bounds is not None:
+        is_selected = np.logical_or(data > bounds[1], data < bounds[0])
+        data = data[is_selected]
+        data_x = data_x[is_selected]
+        data_y = data_y[is_selected]
+    return data, data_x, data_y
+
+
+def _get_block_sums(
+    block: npt.NDArray[np.float64], x0: int, y0: int
+) -> npt.NDArray[np.float64]:
+    return np.array([block.size, np.sum(block)])
+
+
+def _get_block_sq_deviation_sum(
+    block: npt.NDArray[np.float64], x0: int, y0: int, mean: float
+) -> npt.NDArray[np.float64]:
+    return np.array([np.sum(np.square(block - mean))])
+
+
+def _get_block_farthest(
+    block: npt.NDArray[np.float64],
+    x0: int,
+    y0: int,
+    bounds: Bounds | None,
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+) -> tuple[float, float, float]:
+    # the largest weighted distance to the nearest centroid, or the largest absolute value without centroids
+    data, data_x, data_y = _get_block_points(block, x0, y0, bounds)
+    if len(data) == 0:
+        return -np.inf, np.nan, np.nan
+
+    weight = np.abs(data)
+    if len(centroid_x) == 0:
+        dist = weight
+    else:
+        dist = np.full(len(data), np.inf)
+        for x, y in zip(centroid_x, centroid_y):
+            new_dist = weight * np.sqrt(np.square(data_x - x) + np.square(data_y - y))
+            np.minimum(dist, new_dist, out=dist)
+    i = int(np.argmax(dist))
+    return float(dist[i]), float(data_x[i]), float(data_y[i])
+
+
+def _get_block_centroid_sums(
+    block: npt.NDArray[np.float64],
+    x0: int,
+    y0: int,
+    bounds: Bounds | None,
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    # the weighted sums of the centroid update of k_means
+    data, data_x, data_y = _get_block_points(block, x0, y0, bounds)
+    n = len(centroid_x)
+    data_cluster_index = assign_clusters(data, data_x, data_y, centroid_x, centroid_y)
+    weight = np.abs(data)
+    sums = np.empty((n, 3))
+    sums[:, 0] = np.bincount(data_cluster_index, weights=weight * data_x, minlength=n)
+    sums[:, 1] = np.bincount(data_cluster_index, weights=weight * data_y, minlength=n)
+    sums[:, 2] = np.bincount(data_cluster_index, weights=weight, minlength=n)
+    return sums
+
+
+def _get_block_moment_sums(
+    block: npt.NDArray[np.float64],
+    x0: int,
+    y0: int,
+    bounds: Bounds | None,
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    # the moment sums, pixel numbers and weights of the clusters
+    data, data_x, data_y = _get_block_points(block, x0, y0, bounds)
+    n = len(centroid_x)
+    data_cluster_index = assign_clusters(data, data_x, data_y, centroid_x, centroid_y)
+    sums = np.empty((n, 8))
+    sums[:, :6] = grouped_moment_sums(data, data_x, data_y, data_cluster_index, n)
+    sums[:, 6] = np.bincount(data_cluster_index, minlength=n)
+    sums[:, 7] = np.bincount(data_cluster_index, weights=np.abs(data), minlength=n)
+    return sums
@@ -2,8 +2,11 @@ from enum import StrEnum
 import numpy as np
 import numpy.typing as npt
 
-from .method_of_moments import method_of_moments
+from .method_of_moments import grouped_method_of_moments, method_of_moments
 
+from .memory import iterate_chunks
+from .workspace import Workspace, get_buffer
+from .robust_statistics import approximate_mad, sigma_clipped_stats
 from .util import plot_data
 
 
@@ -12,20 +15,54 @@ class SelectionMethod(StrEnum):
     MAD = "mad"
     TWO_MAD = "2-mad"
     THREE_MAD = "3-mad"
+    SIGMA_CLIP = "sigma-clip"
     FWHM_ESTIMATE = "fwhm-estimate"
     TWO_FWHM_ESTIMATE = "2-fwhm-estimate"
     THREE_FWHM_ESTIMATE = "3-fwhm-estimate"
 
 
+def get_fwhm_multiplier(method: SelectionMethod | None) -> float | None:
+    """
+    Get the FWHM multiplier of a FWHM estimate selection method.
+
+    Parameters
+    ----------
+    method
+        The selection method.
+
+    Returns
+    -------
+    float | None
+        The multiplier used to scale the selected area, or None if the method is not a FWHM estimate method.
+    """
+
+    if method == SelectionMethod.FWHM_ESTIMATE:
+        return 1
+    elif method == SelectionMethod.TWO_FWHM_ESTIMATE:
+        return 2
+    elif method == SelectionMethod.THREE_FWHM_ESTIMATE:
+        return 3
+    return None
+
+
 def filter_data(
     method: SelectionMethod,
     data: npt.NDArray[np.float64],
     width: int,
     height: int,
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     plot_mode: str = "none",
-) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    chunk_size: int | None = None,
+    is_grid: bool | None = None,
+    workspace: Workspace | None = None,
+    buffer_name: str = "selected",
+    precision: float | None = None,
+) -> tuple[
+    npt.NDArray[np.float64],
+    npt.NDArray[np.signedinteger],
+    npt.NDArray[np.signedinteger],
+]:
     """
     Filter out data points within different method.
 
@@ -45,6 +82,16 @@ def filter_data(
         Y coordinates of data points.
     plot_mode
         The mode for plotting. Options: "none", "all".
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    is_grid
+        Whether the data points are all pixels of the image in row-major order, which lets the FWHM estimate methods select apertures on the pixel grid. If None, the data points are taken as the pixel grid if their number is width * height.
+    workspace
+        Workspace providing the buffers of the filtered arrays, which are then only valid until the next selection with the same buffer name. If None, the filtered arrays are allocated.
+    buffer_name
+        Name prefix of the workspace buffers, different for selections whose results are used at the same time.
+    precision
+        Precision of the histogram-based median and MAD of the MAD selections. If None, they are exact.
 
     Returns
     -------
@@ -53,23 +100,43 @@ def filter_data(
     """
 
     if method == SelectionMethod.THREE_SIGMA:
-        indices = filter_3_sigma(data, plot_mode)
+        indices = filter_3_sigma(data, plot_mode, chunk_size)
     elif method == SelectionMethod.MAD:
-        indices = filter_mad(data, 1, plot_mode)
+        indices = filter_mad(data, 1, plot_mode, chunk_size, precision)
     elif method == SelectionMethod.TWO_MAD:
-        indices = filter_mad(data, 2, plot_mode)
+        indices = filter_mad(data, 2, plot_mode, chunk_size, precision)
     elif method == SelectionMethod.THREE_MAD:
-        indices = filter_mad(data, 3, plot_mode)
-    elif method == SelectionMethod.FWHM_ESTIMATE:
-        indices = filter_fwhm(data, data_x, data_y, 1, plot_mode)
-    elif method == SelectionMethod.TWO_FWHM_ESTIMATE:
-        indices = filter_fwhm(data, data_x, data_y, 2, plot_mode)
+        indices = filter_mad(data, 3, plot_mode, chunk_size, precision)
+    elif method == SelectionMethod.SIGMA_CLIP:
+        indices = filter_sigma_clip(data, 3, plot_mode, chunk_size)
     else:
-        indices = filter_fwhm(data, data_x, data_y, 3, plot_mode)
-
-    data = data[indices]
-    data_x = data_x[indices]
-    data_y = data_y[indices]
+        if is_grid is None:
+            is_grid = len(data) == width * height
+        grid = (width, height) if is_grid else None
+        indices = filter_fwhm(
+            data,
+            data_x,
+            data_y,
+            get_fwhm_multiplier(method),
+            plot_mode,
+            grid,
+            chunk_size,
+        )
+
+    num = len(indices)
+    data = np.take(
+        data, indices, out=get_buffer(workspace, buffer_name + "_data", num, data.dtype)
+    )
+    data_x = np.take(
+        data_x,
+        indices,
+        out=get_buffer(workspace, buffer_name + "_x", num, data_x.dtype),
+    )
+    data_y = np.take(
+        data_y,
+        indices,
+        out=get_buffer(workspace, buffer_name + "_y", num, data_y.dtype),
+    )
 
     if plot_mode == "all":
         print("selected {} / {}".format(len(data), width * height))
@@ -82,7 +149,9 @@ def filter_data(
 
 
 def filter_3_sigma(
-    data: npt.NDArray[np.float64], plot_mode: str = "none"
+    data: npt.NDArray[np.float64],
+    plot_mode: str = "none",
+    chunk_size: int | None = None,
 ) -> npt.NDArray[np.intc]:
     """
     Filter out data points within 3 standard deviations.
@@ -93,6 +162,8 @@ def filter_3_sigma(
         The input data array.
     plot_mode
         The mode for plotting. Options: "none", "all".
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
 
     Returns
     -------
@@ -100,8 +171,16 @@ def filter_3_sigma(
         Indices of not excluded data.
     """
 
-    std = np.std(data)
-    indices = np.where(np.logical_or(data > 3 * std, data < -3 * std))[0]
+    if chunk_size is None:
+        std = np.std(data)
+        indices = np.where(np.logical_or(data > 3 * std, data < -3 * std))[0]
+    else:
+        chunks = list(iterate_chunks(len(data), chunk_size))
+        mean = sum(data[chunk].sum() for chunk in chunks) / len(data)
+        std = np.sqrt(
+            sum(np.square(data[chunk] - mean).sum() for chunk in chunks) / len(data)
+        )
+        indices = _get_indices_beyond(data, -3 * std, 3 * std, chunk_size)
     if plot_mode == "all":
         print("std of the image: {}".format(std))
         print("excluded data within +/- {}".format(3 * std))
@@ -110,7 +189,11 @@ def filter_3_sigma(
 
 
 def filter_mad(
-    data: npt.NDArray[np.float64], multiplier: float = 3, plot_mode: str = "none"
+    data: npt.NDArray[np.float64],
+    multiplier: float = 3,
+    plot_mode: str = "none",
+    chunk_size: int | None = None,
+    precision: float | None = None,
 ) -> npt.NDArray[np.intc]:
     """
     Filter out data points within median absolute deviation (MAD).
@@ -123,6 +206,10 @@ def filter_mad(
         Multiplier used to scale the MAD threshold.
     plot_mode
         The mode for plotting. Options: "none", "all".
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    precision
+        Precision of the histogram-based median and MAD. If None, they are exact, and without chunks they are computed by np.median.
 
     Returns
     -------
@@ -130,10 +217,13 @@ def filter_mad(
         Indices of not excluded data.
     """
 
-    mad = 1.4826 * np.median(np.abs(data - np.median(data)))
-    indices = np.where(
-        np.logical_or(data > multiplier * mad, data < -multiplier * mad)
-    )[0]
+    if chunk_size is None and precision is None:
+        # without a memory budget the exact median of the whole array is the fastest
+        median = np.median(data)
+        mad = 1.4826 * float(np.median(np.abs(data - median)))
+    else:
+        mad = 1.4826 * approximate_mad(data, precision, chunk_size)
+    indices = _get_indices_beyond(data, -multiplier * mad, multiplier * mad, chunk_size)
 
     if plot_mode == "all":
         print("mad of the image: {}".format(mad))
@@ -142,12 +232,67 @@ def filter_mad(
     return indices
 
 
+def filter_sigma_clip(
+    data: npt.NDArray[np.float64],
+    multiplier: float = 3,
+    plot_mode: str = "none",
+    chunk_size: int | None = None,
+) -> npt.NDArray[np.intc]:
+    """
+    Filter out data points within standard deviations of the sigma-clipped background.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    multiplier
+        Multiplier used to scale the standard deviation threshold.
+    plot_mode
+        The mode for plotting. Options: "none", "all".
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+
+    Returns
+    -------
+    tuple
+        Indices of not excluded data.
+    """
+
+    background, std = sigma_clipped_stats(data, chunk_size=chunk_size)
+    indices = _get_indices_beyond(
+        data, background - multiplier * std, background + multiplier * std, chunk_size
+    )
+
+    if plot_mode == "all":
+        print("background of the image: {}, std: {}".format(background, std))
+        print("excluded data within {} +/- {}".format(background, multiplier * std))
+
+    return indices
+
+
+def _get_indices_beyond(
+    data: npt.NDArray[np.float64],
+    lower: float,
+    upper: float,
+    chunk_size: int | None,
+) -> npt.NDArray[np.intc]:
+    return np.concatenate(
+        [
+            np.where(np.logical_or(data[chunk] > upper, data[chunk] < lower))[0]
+            + chunk.start
+            for chunk in iterate_chunks(len(data), chunk_size)
+        ]
+    )
+
+
 def filter_fwhm(
     data: npt.NDArray[np.float64],
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
     multiplier: float = 3,
     plot_mode: str = "none",
+    grid: tuple[int, int] | None = None,
+    chunk_size: int | None = None,
 ) -> npt.NDArray[np.intc]:
     """
     Apply method of moments to the data and filter out data points out of the estimated FWHM.
@@ -164,6 +309,10 @@ def filter_fwhm(
         Multiplier used to scale the selected area.
     plot_mode
         The mode for plotting. Options: "none", "all".
+    grid
+        Width and height of the image if the data is the full image in row-major order. Only the pixels inside the bounding square of the selected area are visited then.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
 
     Returns
     -------
@@ -172,16 +321,180 @@ def filter_fwhm(
     """
 
     amp, center_x, center_y, fwhm_x, fwhm_y, pa = method_of_moments(
-        data, data_x, data_y
+        data, data_x, data_y, chunk_size
     )
     size = np.max([fwhm_x, fwhm_y])
-    indices = np.where(
-        np.sqrt((data_x - center_x) ** 2 + (data_y - center_y) ** 2)
-        <= size / 2 * multiplier
-    )[0]
+    radius = size / 2 * multiplier
+    if grid is not None:
+        indices = get_aperture_indices(
+            *select_aperture(center_x, center_y, radius, grid[0], grid[1])
+        )
+    else:
+        indices = np.where(
+            np.square(data_x - center_x) + np.square(data_y - center_y)
+            <= radius * radius
+        )[0]
 
     if plot_mode == "all":
         print("fwhm of the image: {}, {}".format(fwhm_x, fwhm_y))
-        print("excluded data out of radius {}".format(size / 2 * multiplier))
+        print("excluded data out of radius {}".format(radius))
 
     return indices
+
+
+def filter_fwhm_clusters(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.intp],
+    n: int,
+    multiplier: float = 3,
+    plot_mode: str = "none",
+    grid: tuple[int, int] | None = None,
+    chunk_size: int | None = None,
+) -> npt.NDArray[np.intp]:
+    """
+    Apply method of moments to every cluster and exclude data points out of the estimated FWHM of their cluster.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    data_cluster_index
+        Cluster indices for each data point.
+    n
+        Number of clusters.
+    multiplier
+        Multiplier used to scale the selected area.
+    plot_mode
+        The mode for plotting. Options: "none", "all".
+    grid
+        Width and height of the image if the data is the full image in row-major order. Only the pixels inside the bounding square of each selected area are visited then.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+
+    Returns
+    -------
+    numpy.ndarray
+        Cluster indices for each data point, with -1 for excluded data points.
+    """
+
+    estimates = grouped_method_of_moments(
+        data, data_x, data_y, data_cluster_index, n, chunk_size
+    )
+    radius = np.max(estimates[:, 3:5], axis=1) / 2 * multiplier
+
+    if grid is not None:
+        selected_cluster_index = np.full(data_cluster_index.shape, -1)
+        for i in range(n):
+            if not np.isfinite(radius[i]):
+                continue
+            indices = get_aperture_indices(
+                *select_aperture(
+                    estimates[i, 1], estimates[i, 2], radius[i], grid[0], grid[1]
+                )
+            )
+            indices = indices[data_cluster_index[indices] == i]
+            selected_cluster_index[indices] = i
+    else:
+        center_x = estimates[data_cluster_index, 1]
+        center_y = estimates[data_cluster_index, 2]
+        cluster_radius = radius[data_cluster_index]
+        selected_cluster_index = np.where(
+            np.square(data_x - center_x) + np.square(data_y - center_y)
+            <= cluster_radius * cluster_radius,
+            data_cluster_index,
+            -1,
+        )
+
+    if plot_mode == "all":
+        for i in range(n):
+            print(
+                "fwhm of cluster {}: {}, {}".format(i, estimates[i, 3], estimates[i, 4])
+            )
+            print("excluded data out of radius {}".format(radius[i]))
+
+    return selected_cluster_index
+
+
+def select_aperture(
+    center_x: float,
+    center_y: float,
+    radius: float,
+    width: int,
+    height: int,
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """
+    Select the pixels of a row-major image within a circular aperture.
+
+    Only the pixels inside the bounding square of the aperture are visited, and squared distances are compared, so the cost is proportional to the aperture area.
+
+    Parameters
+    ----------
+    center_x
+        X coordinate of the aperture center.
+    center_y
+        Y coordinate of the aperture center.
+    radius
+        Radius of the aperture.
+    width
+        Width of the image.
+    height
+        Height of the image.
+
+    Returns
+    -------
+    tuple
+        Start and stop indices of the selected range of each row, as indices of the flattened image.
+    """
+
+    empty = np.empty(0, dtype=np.intp)
+    if not radius >= 0:
+        return empty, empty
+
+    x_min = max(int(np.ceil(center_x - radius)), 0)
+    x_max = min(int(np.floor(center_x + radius)), width - 1)
+    y_min = max(int(np.ceil(center_y - radius)), 0)
+    y_max = min(int(np.floor(center_y + radius)), height - 1)
+    if x_min > x_max or y_min > y_max:
+        return empty, empty
+
+    sq_dx = np.square(np.arange(x_min, x_max + 1) - center_x)
+    sq_dy = np.square(np.arange(y_min, y_max + 1) - center_y)
+    is_inside = sq_dx[None, :] + sq_dy[:, None] <= radius * radius
+
+    # the selected pixels of a row are contiguous, so each row is one range
+    rows = np.where(np.any(is_inside, axis=1))[0]
+    is_inside = is_inside[rows]
+    first = np.argmax(is_inside, axis=1)
+    last = is_inside.shape[1] - np.argmax(is_inside[:, ::-1], axis=1)
+    row_start = (rows + y_min) * width + x_min
+    return row_start + first, row_start + last
+
+
+def get_aperture_indices(
+    starts: npt.NDArray[np.intp], stops: npt.NDArray[np.intp]
+) -> npt.NDArray[np.intp]:
+    """
+    Expand index ranges to the indices within them.
+
+    Parameters
+    ----------
+    starts
+        Start index of each range.
+    stops
+        Stop index of each range, exclusive.
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices within the ranges.
+    """
+
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by a stage whose partial result is not usable when the deadline is reached.
+    """
+
+
+class Deadline:
+    """
+    Time budget and cancellation of an estimation, checked by the stages between units of work.
+
+    Attributes
+    ----------
+    truncated
+        Whether a stage stopped early because the deadline was reached.
+
+    Examples
+    --------
+    >>> cancel_event = threading.Event()
+    >>> deadline = Deadline(0.5, cancel_event)
+    >>> while not deadline.is_expired():
+    ...     do_some_work()
+    """
+
+    def __init__(
+        self,
+        time_budget: float | None = None,
+        cancel_event: threading.Event | None = None,
+        parent: "Deadline | None" = None,
+    ) -> None:
+        """
+        Start the time budget.
+
+        Parameters
+        ----------
+        time_budget
+            Time budget in seconds. If None, the time is not limited.
+        cancel_event
+            Event that cancels the work when set, for example from another thread. If None, the work can not be cancelled.
+        parent
+            Deadline of the enclosing work, which also expires this deadline. If None, only the own time budget and cancel event are checked.
+        """
+        self.__end = None if time_budget is None else time.perf_counter() + time_budget
+        self.__cancel_event = cancel_event
+        self.__parent = parent
+        self.truncated = False
+
+    def is_expired(self) -> bool:
+        """
+        Check if the time budget is used up or the work is cancelled, and mark the work as truncated if so.
+
+        Returns
+        -------
+        bool
+            True if the stage should stop.
+        """
+        expired = (
+            self.__cancel_event is not None and self.__cancel_event.is_set()
+        ) or (self.__end is not None and time.perf_counter() >= self.__end)
+        if not expired and self.__parent is not None:
+            expired = self.__parent.is_expired()
+        if expired:
+            self.truncated = True
+        return expired
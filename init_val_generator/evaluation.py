@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+import math
+import numpy as np
+import numpy.typing as npt
+
+from .refinement import DEFAULT_N_SIGMA
+from .robust_statistics import approximate_mad
+from .tools.gaussian_image import get_boxes, to_quadratic_parameters
+
+
+@dataclass
+class FitStatistics:
+    """
+    Goodness of fit of estimated Gaussian components to an image.
+
+    Attributes
+    ----------
+    residual_rms
+        Root mean square of the residual image, data minus model.
+    chi_square
+        Sum of the squared residuals in units of the noise.
+    reduced_chi_square
+        Chi-square per degree of freedom, the number of finite pixels minus 6 per component.
+    noise
+        Standard deviation of the noise used for the chi-square.
+    model_flux
+        Integrated flux of each component.
+    recovered_flux
+        Data flux attributed to each component, where each pixel of the data is shared among the components in proportion to their model values.
+    """
+
+    residual_rms: float
+    chi_square: float
+    reduced_chi_square: float
+    noise: float
+    model_flux: npt.NDArray[np.float64]
+    recovered_flux: npt.NDArray[np.float64]
+
+
+def render_model(
+    estimates: list[list[float]],
+    width: int,
+    height: int,
+    n_sigma: float = DEFAULT_N_SIGMA,
+    out: npt.NDArray[np.float64] | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Render the Gaussian components into an image, each only inside its bounding box.
+
+    Parameters
+    ----------
+    estimates
+        List of parameters for the Gaussian components: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Components with non-finite parameters are skipped.
+    width
+        Width of the image.
+    height
+        Height of the image.
+    n_sigma
+        Half size of the bounding box of a component in standard deviations.
+    out
+        Array of width * height values receiving the model, reused between calls. If None, a new array is allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        The model image, flattened row by row.
+    """
+
+    model = np.empty(width * height) if out is None else out
+    model.fill(0)
+    image = model.reshape(height, width)
+    _, theta, boxes = _get_component_boxes(estimates, width, height, n_sigma)
+    for component_theta, (x0, x1, y0, y1) in zip(theta, boxes):
+        image[y0:y1, x0:x1] += _get_component(component_theta, x0, x1, y0, y1)
+    return model
+
+
+def evaluate_fit(
+    data: npt.NDArray[np.float64],
+    width: int,
+    height: int,
+    estimates: list[list[float]],
+    noise: float | None = None,
+    n_sigma: float = DEFAULT_N_SIGMA,
+    out: npt.NDArray[np.float64] | None = None,
+) -> FitStatistics:
+    """
+    Measure the goodness of fit of estimated Gaussian components to an image.
+
+    The model is rendered once into the buffer, and the statistics are computed in vectorized passes over the residual and over the bounding box of each component.
+
+    Parameters
+    ----------
+    data
+        The input data array of the whole image.
+    width
+        Width of the data array.
+    height
+        Height of the data array.
+    estimates
+        List of estimated parameters for the Gaussian components.
+    noise
+        Standard deviation of the noise. If None, it is estimated from the MAD of the residual.
+    n_sigma
+        Half size of the bounding box of a component in standard deviations.
+    out
+        Array of width * height values receiving the model, reused between calls. If None, a new array is allocated.
+
+    Returns
+    -------
+    FitStatistics
+        The statistics of the fit.
+    """
+
+    model = render_model(estimates, width, height, n_sigma, out)
+    residual = data - model
+    residual = residual[np.isfinite(residual)]
+    if noise is None:
+        noise = 1.4826 * approximate_mad(residual) if len(residual) else math.nan
+
+    sq_residual_sum = float(np.dot(residual, residual))
+    residual_rms = math.sqrt(sq_residual_sum / len(residual)) if len(residual) else 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi_square = sq_residual_sum / (noise * noise)
+        reduced_chi_square = chi_square / (len(residual) - 6 * len(estimates))
+
+    params = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+    # the integral of amp * exp(-(x^2 / 2s_x^2 + y^2 / 2s_y^2)) with s = FWHM / sqrt(8 ln 2)
+    model_flux = params[:, 0] * params[:, 3] * params[:, 4] * math.pi / 4 / math.log(2)
+
+    recovered_flux = np.full(len(params), np.nan)
+    image = data.reshape(height, width)
+    model_image = model.reshape(height, width)
+    index, theta, boxes = _get_component_boxes(estimates, width, height, n_sigma)
+    for i, component_theta, (x0, x1, y0, y1) in zip(index, theta, boxes):
+        component = _get_component(component_theta, x0, x1, y0, y1)
+        box_model = model_image[y0:y1, x0:x1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(box_model != 0, component / box_model, 0)
+        recovered_flux[i] = np.nansum(image[y0:y1, x0:x1] * share)
+
+    return FitStatistics(
+        residual_rms,
+        chi_square,
+        reduced_chi_square,
+        noise,
+        model_flux,
+        recovered_flux,
+    )
+
+
+def _get_component_boxes(
+    estimates: list[list[float]], width: int, height: int, n_sigma: float
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64], npt.NDArray[np.intp]]:
+    # components with finite parameters and pixels in their bounding box, as in refine
+    params = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+    index = np.flatnonzero(
+        np.all(np.isfinite(params), axis=1) & (params[:, 3] > 0) & (params[:, 4] > 0)
+    )
+    theta = to_quadratic_parameters(params[index])
+    boxes = get_boxes(theta, width, height, n_sigma)
+    is_empty = (boxes[:, 1] <= boxes[:, 0]) | (boxes[:, 3] <= boxes[:, 2])
+    return index[~is_empty], theta[~is_empty], boxes[~is_empty]
+
+
+def _get_component(
+    theta: npt.NDArray[np.float64], x0: int, x1: int, y0: int, y1: int
+) -> npt.NDArray[np.float64]:
+    amp, center_x, center_y, a, dbl_b, c = theta
+    dx = np.arange(x0, x1) - center_x
+    dy = (np.arange(y0, y1) - center_y)[:, None]
+    component: npt.NDArray[np.float64] = amp * np.exp(
+        -(a * dx * dx + dbl_b * dx * dy + c * dy * dy)
+    )
+    return component
@@ -1,12 +1,152 @@
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from enum import StrEnum
+from pathlib import Path
+import threading
+from typing import Any
 import matplotlib.pyplot as plt
 import numpy as np
 import numpy.typing as npt
 
-from .data_selection import SelectionMethod, filter_data
-from .method_of_moments import method_of_moments
-from .clustering import get_silhouette_score, k_means, k_means_plus_plus
+from .data_selection import (
+    SelectionMethod,
+    filter_data,
+    filter_fwhm_clusters,
+    get_fwhm_multiplier,
+)
+from .method_of_moments import (
+    grouped_method_of_moments,
+    grouped_moment_sums,
+    method_of_moments,
+)
+from .clustering import (
+    KMeansAlgorithm,
+    KMeansRestart,
+    assign_clusters,
+    k_means,
+    k_means_hamerly,
+    k_means_plus_plus,
+    k_means_restarts,
+)
+from .segmentation import lookup_labels, segment
+from .peaks import DEFAULT_MIN_SEPARATION, find_peaks
+from .profile import Profile, load_profile, select_configuration
+from .workspace import Workspace, get_buffer
+from .deadline import Deadline, DeadlineExceeded
+from .memory import (
+    get_chunk_size,
+    get_coordinate_dtype,
+    get_worker_num,
+    iterate_chunks,
+)
+from .results import to_records
+from .refinement import refine
+from .roi import Box, get_region
+from .bootstrap import bootstrap_standard_errors
+from .evaluation import evaluate_fit
+from .cluster_validity import (
+    ClusteringCriterion,
+    DEFAULT_THRESHOLDS,
+    get_cluster_statistics,
+    get_criterion_score,
+    get_score_from_statistics,
+    is_bic_decreased,
+    is_score_accepted,
+    is_score_dropped,
+    merge_clusters,
+    select_component_number,
+)
 
 MAX_COMPONENT_NUM = 10
+# maximum number of components a touching region is split into
+MAX_SPLIT_NUM = 4
+GOLDEN_RATIO = (1 + 5**0.5) / 2
+
+# pixel coordinates of the segmented clustering data and their component indices
+Regions = tuple[
+    npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger], npt.NDArray[np.intp]
+]
+
+
+class ComponentSearch(StrEnum):
+    SWEEP = "sweep"
+    SEGMENTATION = "segmentation"
+    PEAKS = "peaks"
+    GOLDEN_SECTION = "golden-section"
+    SPLIT_MERGE = "split-merge"
+
+
+class Estimates(list[list[float]]):
+    """
+    List of estimated parameters for the Gaussian components.
+
+    Attributes
+    ----------
+    truncated
+        Whether the estimation was cut short by its time budget or a cancellation, so the estimates are the best found so far.
+    pixel_num
+        Number of pixels of the cluster of each component, or None if unknown.
+    weight
+        Sum of the absolute data values of the cluster of each component, or None if unknown.
+    standard_errors
+        Bootstrap standard errors of the method of moments parameters of each component, or None if not computed.
+    parameters
+        The estimated parameters as an array of shape (component number, 6), built from the list on each access, so it always reflects changes of the list.
+    restarts
+        Index, inertia, wall-clock time and skipped distance fraction of each K-means restart of the last clustering into the returned number of components, or None if no clustering with restarts ran for it, such as with n_init of 1.
+    """
+
+    def __init__(
+        self,
+        estimates: list[list[float]] | npt.NDArray[np.float64],
+        truncated: bool = False,
+        pixel_num: npt.NDArray[np.int64] | None = None,
+        weight: npt.NDArray[np.float64] | None = None,
+        standard_errors: npt.NDArray[np.float64] | None = None,
+        restarts: list[KMeansRestart] | None = None,
+    ) -> None:
+        if isinstance(estimates, np.ndarray):
+            # the list is the only storage, so arrays are converted once here
+            super().__init__(estimates.reshape(-1, 6).tolist())
+        else:
+            super().__init__(estimates)
+        self.truncated = truncated
+        self.pixel_num = pixel_num
+        self.weight = weight
+        self.standard_errors = standard_errors
+        self.restarts = restarts
+        # deferred bootstrap of the standard errors, run once the estimates are known to be returned
+        self._bootstrap: Callable[[], npt.NDArray[np.float64] | None] | None = None
+
+    def to_records(self) -> npt.NDArray[np.void]:
+        """
+        Convert the estimates to a structured array with named fields.
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array of RESULT_DTYPE with the fields amp, center_x, center_y, fwhm_x, fwhm_y, pa, pixel_num and weight.
+        """
+        return to_records(self.parameters, self.pixel_num, self.weight)
+
+    @property
+    def parameters(self) -> npt.NDArray[np.float64]:
+        return np.array(self, dtype=np.float64).reshape(-1, 6)
+
+
+@dataclass
+class _EstimationContext:
+    workspace: Workspace | None = None
+    deadline: Deadline | None = None
+    # centroids of each component number clustered by the last sweep
+    sweep_centroids: dict[
+        int, tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]
+    ] = field(default_factory=dict)
+    # K-means restarts of the last clustering into each component number
+    restarts: dict[int, list[KMeansRestart]] = field(default_factory=dict)
 
 
 class InitValGenerator:
@@ -21,6 +161,38 @@ class InitValGenerator:
         Method for selecting data for clustering.
     plot_mode
         Plotting mode. 'none' for no plots, 'all' for all plots.
+    criterion
+        Cluster validity criterion for estimating the number of components.
+    criterion_threshold
+        Threshold for accepting the best score of the criterion.
+    n_init
+        Number of K-means restarts from weighted random initializations.
+    random_seed
+        Seed for the random initializations of the K-means restarts.
+    n_jobs
+        Number of threads used for parallel work.
+    memory_budget
+        Memory budget in bytes for the working memory.
+    component_search
+        Method for finding the components when the number of components is not given.
+    split_regions
+        Whether touching sources in a segmented region are split by K-means.
+    min_peak_separation
+        Minimum distance in pixels between peaks seeding K-means.
+    max_components
+        Maximum number of components.
+    parallel_sweep
+        Whether the component numbers of the sweep are evaluated concurrently.
+    refine_iterations
+        Maximum number of Levenberg-Marquardt iterations of a component refining the estimates.
+    residual_threshold
+        Relative decrease of the residual RMS needed to accept an estimated number of components over a single component.
+    bootstrap_replicates
+        Number of bootstrap replicates for the standard errors of the estimates.
+    k_means_algorithm
+        K-means algorithm.
+    mad_precision
+        Precision of the histogram-based median and MAD of the MAD data selections.
     """
 
     def __init__(
@@ -28,6 +200,22 @@ class InitValGenerator:
         data_selection: SelectionMethod | None = None,
         clustering_data_selection: SelectionMethod | None = None,
         plot_mode: str = "none",
+        criterion: ClusteringCriterion = ClusteringCriterion.SILHOUETTE,
+        criterion_threshold: float | None = None,
+        n_init: int = 1,
+        random_seed: int | None = None,
+        n_jobs: int | None = None,
+        memory_budget: int | None = None,
+        component_search: ComponentSearch = ComponentSearch.SWEEP,
+        split_regions: bool = False,
+        min_peak_separation: float = DEFAULT_MIN_SEPARATION,
+        parallel_sweep: bool = False,
+        max_components: int = MAX_COMPONENT_NUM,
+        refine_iterations: int = 0,
+        residual_threshold: float | None = None,
+        bootstrap_replicates: int = 0,
+        k_means_algorithm: KMeansAlgorithm = KMeansAlgorithm.LLOYD,
+        mad_precision: float | None = None,
     ):
         """
         Initialize the InitValGenerator.
@@ -40,14 +228,124 @@ class InitValGenerator:
             Method for selecting data for clustering.
         plot_mode
             Plotting mode. 'none' for no plots, 'all' for all plots.
+        criterion
+            Cluster validity criterion for estimating the number of components.
+        criterion_threshold
+            Threshold for accepting the best score of the criterion. If None, the default threshold of the criterion is used. The Calinski-Harabasz and Davies-Bouldin criteria do not score a single cluster and have no default threshold, so their best number of components is accepted only if its clustering has a lower BIC than a single cluster.
+        n_init
+            Number of K-means restarts from weighted random initializations. If 1, K-means is initialized deterministically from the brightest pixel.
+        random_seed
+            Seed for the random initializations of the K-means restarts.
+        n_jobs
+            Number of threads used for parallel work. If None, the default of ThreadPoolExecutor is used.
+        memory_budget
+            Memory budget in bytes for the working memory, not counting the input data. The data is processed in chunks and the coordinates use the smallest integer type to stay within the budget. If None, the memory is not limited.
+        component_search
+            Method for finding the components when the number of components is not given. "sweep" clusters the data with 1 to max_components components and selects the number by the clustering criterion. "golden-section" searches the number between 2 and max_components by a golden-section search on the clustering criterion, which clusters the data a logarithmic number of times and suits crowded fields with hundreds of components. "split-merge" clusters the data once with max_components components and merges the clusters pairwise by Ward's criterion on their statistics, scoring every number of components on the way, which needs a criterion other than the silhouette score. "segmentation" labels the connected regions of the clustering data selection as components in one pass, "peaks" seeds K-means with the local maxima of the clustering data selection, one component per peak. Both "segmentation" and "peaks" need a clustering data selection that thresholds the image.
+        split_regions
+            Whether each segmented region is split by K-means into up to 4 components, with the number selected by the clustering criterion.
+        min_peak_separation
+            Minimum distance in pixels between peaks seeding K-means. Closer peaks are merged into the brighter one.
+        parallel_sweep
+            Whether the component numbers of the sweep are clustered and scored concurrently in a thread pool of n_jobs threads. The selected number is the same as in the sequential sweep, and the work for larger component numbers is cancelled when the scores stop the sweep early.
+        max_components
+            Maximum number of components, given or estimated. Crowded fields need a larger value than the default 10, best with the "golden-section" component search and a criterion computed from cluster statistics, since the cost of the silhouette score grows quadratically with the number of data points.
+        refine_iterations
+            Maximum number of Levenberg-Marquardt iterations of a component, in total over its refits, of a least-squares fit refining the estimates, with each component evaluated inside its bounding box. The refinement stops early when the time budget is used up. If 0, the estimates are not refined.
+        residual_threshold
+            Relative decrease of the residual RMS of the rendered model needed to accept an estimated number of components larger than 1. When the estimated components do not decrease the residual RMS of the single-component estimate by this fraction, the single-component estimate is returned. If None, the estimated number is not checked.
+        bootstrap_replicates
+            Number of Poisson bootstrap replicates of the method of moments estimating the standard errors of the parameters, which are returned in the standard_errors attribute of the estimates. The random seed of the replicates is random_seed. If 0, the standard errors are not estimated.
+        k_means_algorithm
+            K-means algorithm. "lloyd" evaluates the distances of all data points to all centroids in every iteration. "hamerly" skips the distance evaluations that can not change the assignment by Hamerly's bounds, with the same clustering result, which pays off with many components. The fraction of skipped evaluations is printed for each clustering.
+        mad_precision
+            Precision of the median and MAD of the "mad", "2-mad" and "3-mad" data selections. If not None, they are approximated by narrowing down histograms to this width, which is faster than the exact selection on large images. If None, they are exact.
         """
         self.data_selection = data_selection
         self.clustering_data_selection = clustering_data_selection
         self.plot_mode = plot_mode
+        self.criterion = ClusteringCriterion(criterion)
+        self.criterion_threshold = (
+            DEFAULT_THRESHOLDS[self.criterion]
+            if criterion_threshold is None
+            else criterion_threshold
+        )
+        self.n_init = n_init
+        self.random_seed = random_seed
+        self.n_jobs = n_jobs
+        self.memory_budget = memory_budget
+        self.component_search = ComponentSearch(component_search)
+        if (
+            self.component_search == ComponentSearch.SPLIT_MERGE
+            and self.criterion == ClusteringCriterion.SILHOUETTE
+        ):
+            raise Exception(
+                "The split-merge component search needs a criterion computed from cluster statistics."
+            )
+        self.split_regions = split_regions
+        self.min_peak_separation = min_peak_separation
+        self.parallel_sweep = parallel_sweep
+        self.max_components = max_components
+        self.refine_iterations = refine_iterations
+        self.residual_threshold = residual_threshold
+        self.bootstrap_replicates = bootstrap_replicates
+        self.k_means_algorithm = KMeansAlgorithm(k_means_algorithm)
+        self.mad_precision = mad_precision
+        # workspace and deadline of the estimation running in each thread
+        self._contexts: dict[int, _EstimationContext] = {}
+
+    @classmethod
+    def from_profile(
+        cls,
+        profile: str | Path | Profile,
+        width: int,
+        height: int,
+        **kwargs: Any,
+    ) -> "InitValGenerator":
+        """
+        Create a generator with the configuration recommended by a tuning profile for the image size.
+
+        Parameters
+        ----------
+        profile
+            The tuning profile from the autotune tool, or the path of its JSON file.
+        width
+            Width of the images.
+        height
+            Height of the images.
+        kwargs
+            Other arguments of the generator, such as plot_mode or memory_budget.
+
+        Returns
+        -------
+        InitValGenerator
+            The configured generator.
+        """
+        if not isinstance(profile, dict):
+            profile = load_profile(profile)
+        configuration = select_configuration(profile, width, height)
+        return cls(
+            configuration["data_selection"],
+            configuration["clustering_data_selection"],
+            criterion=configuration["criterion"],
+            # profiles saved before the component search was tuned use the sweep
+            component_search=configuration.get(
+                "component_search", ComponentSearch.SWEEP
+            ),
+            **kwargs,
+        )
 
     def estimate(
-        self, data: npt.NDArray[np.float64], width: int, height: int, n: int | None = 1
-    ) -> list[list[float]]:
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        n: int | None = 1,
+        workspace: Workspace | None = None,
+        time_budget: float | None = None,
+        cancel_event: threading.Event | None = None,
+        roi: Box | npt.ArrayLike | None = None,
+    ) -> Estimates:
         """
         Estimates Gaussian components.
 
@@ -61,173 +359,1242 @@ class InitValGenerator:
             Height of the data array.
         n
             Number of components. If None, the optimal number is estimated.
+        workspace
+            Workspace of the image size providing preallocated buffers to the stages. Each thread needs its own workspace. If None, the buffers are allocated for each estimation.
+        time_budget
+            Time budget in seconds. When it is used up, the stages stop and the best result found so far is returned: the best-scoring component number clustered so far, the last K-means iteration, or a single-component estimate. If None, the time is not limited.
+        cancel_event
+            Event that cancels the estimation in the same way as a used up time budget when set from another thread.
+        roi
+            Region of interest: a bounding box (x start, y start, x stop, y stop) with exclusive stops, a polygon as an array of shape (vertex number, 2) with the x and y coordinates of its vertices, or a boolean mask of the image size. Only the bounding box of the region is estimated, and of a polygon or mask only the pixels of the region, as in estimate_pixels, so the cost grows with the region area rather than with the image size. The workspace must match the size of the bounding box. If None, the whole image is estimated.
 
         Returns
         -------
-        list[list[float]]
-            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+        Estimates
+            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Its truncated attribute tells if the estimation was cut short. The centers are in the coordinates of the whole image.
         """
 
-        x = np.arange(width)
-        y = np.arange(height)
-        data_x = np.tile(x, height)
-        data_y = np.repeat(y, width)
+        offset_x = offset_y = 0
+        coordinates = None
+        image = data
+        if roi is not None:
+            (offset_x, offset_y, stop_x, stop_y), mask = get_region(roi, width, height)
+            region = data.reshape(height, width)[offset_y:stop_y, offset_x:stop_x]
+            width = stop_x - offset_x
+            height = stop_y - offset_y
+            if mask is None:
+                data = image = region.ravel()
+            else:
+                # only the pixels of the region are estimated, the others are missing pixels of the refinement
+                data_y, data_x = np.nonzero(mask)
+                coordinates = (data_x, data_y)
+                data = region[mask]
+                image = np.where(mask, region, np.nan).ravel()
+
+        if workspace is not None and (workspace.width, workspace.height) != (
+            width,
+            height,
+        ):
+            raise Exception("The workspace does not match the image size.")
+
+        deadline = None
+        if time_budget is not None or cancel_event is not None:
+            deadline = Deadline(time_budget, cancel_event)
+        estimates = self.__estimate_in_context(
+            data, width, height, n, workspace, deadline, coordinates
+        )
+
+        if self.refine_iterations > 0 and (
+            deadline is None or not deadline.is_expired()
+        ):
+            estimates[:] = refine(
+                image,
+                width,
+                height,
+                estimates,
+                max_iter=self.refine_iterations,
+                n_jobs=self.n_jobs,
+                deadline=deadline,
+            )
+        estimates.truncated = deadline is not None and deadline.truncated
+        if roi is not None:
+            for estimate in estimates:
+                estimate[1] += offset_x
+                estimate[2] += offset_y
+        return estimates
+
+    def estimate_pixels(
+        self,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        n: int | None = 1,
+        time_budget: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> Estimates:
+        """
+        Estimates Gaussian components from a sparse list of pixels, such as the significant pixels found by a source finder, without building the whole image.
+
+        The data selection, the clustering and the method of moments run on the listed pixels only, so the cost grows with the number of pixels rather than with the image size. The statistics of the data selections are computed over the listed pixels, so for pixels that are already significant the selections are usually None. The "peaks" component search, the refinement and the residual threshold need the whole image and are not supported.
+
+        Parameters
+        ----------
+        data_x
+            X coordinates of the pixels.
+        data_y
+            Y coordinates of the pixels.
+        data
+            Values of the pixels.
+        width
+            Width of the image.
+        height
+            Height of the image.
+        n
+            Number of components. If None, the optimal number is estimated.
+        time_budget
+            Time budget in seconds. When it is used up, the best result found so far is returned. If None, the time is not limited.
+        cancel_event
+            Event that cancels the estimation in the same way as a used up time budget when set from another thread.
+
+        Returns
+        -------
+        Estimates
+            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Its truncated attribute tells if the estimation was cut short.
+        """
+
+        if (
+            self.component_search == ComponentSearch.PEAKS
+            or self.refine_iterations > 0
+            or self.residual_threshold is not None
+        ):
+            raise Exception(
+                "The peak search, refinement and residual threshold need the whole image."
+            )
+        if not len(data_x) == len(data_y) == len(data):
+            raise Exception("The pixel coordinates and values differ in length.")
+        data_x = np.asarray(data_x)
+        data_y = np.asarray(data_y)
+        if len(data_x) and (
+            data_x.min() < 0
+            or data_x.max() >= width
+            or data_y.min() < 0
+            or data_y.max() >= height
+        ):
+            raise Exception("The pixel coordinates are outside the image.")
+        # the moments multiply the coordinates, so narrow input types are widened
+        dtype = get_coordinate_dtype(width, height, self.memory_budget)
+        data_x = data_x.astype(dtype, copy=False)
+        data_y = data_y.astype(dtype, copy=False)
+
+        deadline = None
+        if time_budget is not None or cancel_event is not None:
+            deadline = Deadline(time_budget, cancel_event)
+        estimates = self.__estimate_in_context(
+            np.asarray(data, dtype=np.float64),
+            width,
+            height,
+            n,
+            None,
+            deadline,
+            (data_x, data_y),
+        )
+        estimates.truncated = deadline is not None and deadline.truncated
+        return estimates
+
+    def estimate_sparse(
+        self,
+        matrix: Any,
+        n: int | None = 1,
+        time_budget: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> Estimates:
+        """
+        Estimates Gaussian components from a sparse image, with the stored entries as the pixels of estimate_pixels.
+
+        Parameters
+        ----------
+        matrix
+            The image as a SciPy sparse matrix or array of shape (height, width). Duplicate entries are summed.
+        n
+            Number of components. If None, the optimal number is estimated.
+        time_budget
+            Time budget in seconds. When it is used up, the best result found so far is returned. If None, the time is not limited.
+        cancel_event
+            Event that cancels the estimation in the same way as a used up time budget when set from another thread.
+
+        Returns
+        -------
+        Estimates
+            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Its truncated attribute tells if the estimation was cut short.
+        """
+
+        # summing the duplicates also sorts the entries in the pixel order of the whole image
+        coo = matrix.tocoo(copy=True)
+        coo.sum_duplicates()
+        height, width = matrix.shape
+        return self.estimate_pixels(
+            coo.col, coo.row, coo.data, width, height, n, time_budget, cancel_event
+        )
+
+    def __estimate_in_context(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        n: int | None,
+        workspace: Workspace | None,
+        deadline: Deadline | None,
+        coordinates: (
+            tuple[npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger]] | None
+        ) = None,
+    ) -> Estimates:
+        if workspace is None and deadline is None and self.n_init == 1:
+            return self.__estimate(data, width, height, n, coordinates)
+
+        with self._estimation_context(workspace, deadline) as context:
+            estimates = self.__estimate(data, width, height, n, coordinates)
+        estimates.restarts = context.restarts.get(len(estimates))
+        return estimates
+
+    @contextmanager
+    def _estimation_context(
+        self, workspace: Workspace | None, deadline: Deadline | None
+    ) -> Iterator[_EstimationContext]:
+        # the stages running in this thread use the workspace and deadline of the context
+        thread_id = threading.get_ident()
+        context = _EstimationContext(workspace, deadline)
+        self._contexts[thread_id] = context
+        try:
+            yield context
+        finally:
+            del self._contexts[thread_id]
+
+    def __estimate(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        n: int | None,
+        coordinates: (
+            tuple[npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger]] | None
+        ) = None,
+    ) -> Estimates:
+        # the coordinates of the whole image unless a pixel list is given
+        data_x, data_y = (
+            self._get_coordinates(width, height) if coordinates is None else coordinates
+        )
+        # the standard errors are bootstrapped only for the estimates kept by the residual check
+        threshold = self.residual_threshold if n is None else None
+        estimates = self._estimate_components(
+            data,
+            width,
+            height,
+            n,
+            data_x,
+            data_y,
+            coordinates is None,
+            threshold is None,
+        )
+
+        deadline = self._get_deadline()
+        if (
+            threshold is not None
+            and len(estimates) > 1
+            and (deadline is None or not deadline.is_expired())
+        ):
+            single_estimates = self._estimate_single_component(
+                data, width, height, data_x, data_y, coordinates is None, False
+            )
+            if not self._is_residual_decreased(
+                (
+                    data
+                    if coordinates is None
+                    else _to_grid(data, data_x, data_y, width, height, np.nan)
+                ),
+                width,
+                height,
+                estimates,
+                single_estimates,
+                threshold,
+            ):
+                print("residuals reject component num {}".format(len(estimates)))
+                estimates = single_estimates
+
+        if estimates._bootstrap is not None:
+            estimates.standard_errors = estimates._bootstrap()
+            estimates._bootstrap = None
+        return estimates
+
+    def _estimate_components(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        n: int | None,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        is_grid: bool,
+        standard_errors: bool = True,
+    ) -> Estimates:
+        if n is None and self.component_search != ComponentSearch.SWEEP:
+            centroid_x, centroid_y, regions = self._search_components(
+                data, width, height, data_x, data_y, is_grid
+            )
+            if len(centroid_x) <= 1:
+                return self._estimate_single_component(
+                    data, width, height, data_x, data_y, is_grid, standard_errors
+                )
+            return self._estimate_from_centroids(
+                data,
+                width,
+                height,
+                data_x,
+                data_y,
+                centroid_x,
+                centroid_y,
+                is_grid,
+                standard_errors,
+                regions,
+            )
 
         if n is None:
-            scores = []
-            for i in range(MAX_COMPONENT_NUM):
-                input_num = i + 1
-                print("clustering with component number {}".format(str(input_num)))
-
-                if self.clustering_data_selection is not None:
-                    clustering_data, clustering_data_x, clustering_data_y = filter_data(
-                        self.clustering_data_selection,
-                        data,
-                        width,
-                        height,
-                        data_x,
-                        data_y,
-                        self.plot_mode,
+            n = self._estimate_component_number(
+                data, width, height, data_x, data_y, is_grid
+            )
+
+        if n == 1:
+            estimates = self._estimate_single_component(
+                data, width, height, data_x, data_y, is_grid, standard_errors
+            )
+        elif n <= self.max_components:
+            deadline = self._get_deadline()
+            if deadline is not None and deadline.is_expired():
+                # only the estimation pass is left in an exceeded time budget
+                context = self._contexts[threading.get_ident()]
+                if n not in context.sweep_centroids:
+                    return self._estimate_single_component(
+                        data, width, height, data_x, data_y, is_grid, standard_errors
                     )
-                else:
-                    clustering_data, clustering_data_x, clustering_data_y = (
-                        data,
-                        data_x,
-                        data_y,
+                centroid_x, centroid_y = context.sweep_centroids[n]
+            else:
+                clustering_data, clustering_data_x, clustering_data_y = (
+                    self._select_clustering_data(
+                        data, width, height, data_x, data_y, is_grid
                     )
-
-                init_centroid_x, init_centroid_y = k_means_plus_plus(
-                    clustering_data, clustering_data_x, clustering_data_y, input_num
                 )
-                data_cluster_index, centroid_x, centroid_y = k_means(
-                    clustering_data,
-                    clustering_data_x,
-                    clustering_data_y,
-                    init_centroid_x,
-                    init_centroid_y,
+                _, centroid_x, centroid_y = self._cluster(
+                    clustering_data, clustering_data_x, clustering_data_y, n
                 )
+            estimates = self._estimate_from_centroids(
+                data,
+                width,
+                height,
+                data_x,
+                data_y,
+                centroid_x,
+                centroid_y,
+                is_grid,
+                standard_errors,
+            )
+        else:
+            raise Exception("Invalid Gaussian component number.")
 
-                if i != 0:
-                    score = get_silhouette_score(
-                        clustering_data,
-                        clustering_data_x,
-                        clustering_data_y,
-                        centroid_x,
-                        centroid_y,
-                        data_cluster_index,
-                    )
-                    scores.append(score)
+        return estimates
+
+    def _is_residual_decreased(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        estimates: list[list[float]],
+        single_estimates: list[list[float]],
+        threshold: float,
+    ) -> bool:
+        model = get_buffer(self._get_workspace(), "model", width * height, np.float64)
+        residual_rms = evaluate_fit(
+            data, width, height, estimates, out=model
+        ).residual_rms
+        single_residual_rms = evaluate_fit(
+            data, width, height, single_estimates, out=model
+        ).residual_rms
+        return residual_rms <= (1 - threshold) * single_residual_rms
+
+    def _estimate_component_number(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        is_grid: bool = True,
+    ) -> int:
+        clustering_data, clustering_data_x, clustering_data_y = (
+            self._select_clustering_data(data, width, height, data_x, data_y, is_grid)
+        )
+        return self._sweep_component_number(
+            clustering_data, clustering_data_x, clustering_data_y, self.max_components
+        )
+
+    def _sweep_component_number(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        max_num: int,
+    ) -> int:
+        deadline = self._get_deadline()
+        context = self._contexts.get(threading.get_ident())
+        if context is not None:
+            context.sweep_centroids.clear()
+
+        scores = []
+        single_component_score = None
+        centroids = {}
+        with self.__sweep(
+            clustering_data, clustering_data_x, clustering_data_y, max_num, deadline
+        ) as results:
+            for i, result in enumerate(results):
+                if result is None:
+                    break
+                input_num = i + 1
+                centroid_x, centroid_y, score = result
+
+                centroids[input_num] = (centroid_x, centroid_y)
+                if score is not None:
+                    if context is not None:
+                        context.sweep_centroids[input_num] = (centroid_x, centroid_y)
+                    if i == 0:
+                        single_component_score = score
+                    else:
+                        scores.append(score)
 
                 if i > 2:
-                    if scores[i - 1] < scores[i - 2] and scores[i - 2] < scores[i - 3]:
+                    if is_score_dropped(
+                        self.criterion, scores[i - 1], scores[i - 2]
+                    ) and is_score_dropped(
+                        self.criterion, scores[i - 2], scores[i - 3]
+                    ):
                         break
 
-            if self.plot_mode == "all":
-                print(scores)
-                plt.figure()
-                plt.plot(list(range(2, len(scores) + 2)), scores)
+        if self.plot_mode == "all":
+            print(scores)
+            plt.figure()
+            plt.plot(list(range(2, len(scores) + 2)), scores)
 
+        n = select_component_number(
+            self.criterion,
+            scores,
+            self.criterion_threshold,
+            single_component_score,
+        )
+        if n > 1 and not self._is_split_accepted(
+            clustering_data, clustering_data_x, clustering_data_y, *centroids[n]
+        ):
             n = 1
-            if np.max(scores) >= 0.6:
-                max_index = np.argmax(scores)
-                n = int(max_index) + 2
-            print("best component num is {}".format(str(n)))
+        print("best component num is {}".format(str(n)))
+        return n
 
-        if n == 1:
-            if self.data_selection is not None:
-                data, data_x, data_y = filter_data(
-                    self.data_selection,
-                    data,
-                    width,
-                    height,
-                    data_x,
-                    data_y,
-                    self.plot_mode,
+    @contextmanager
+    def __sweep(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        max_num: int,
+        deadline: Deadline | None,
+    ) -> Iterator[
+        Iterator[
+            tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float | None] | None
+        ]
+    ]:
+        # yields the sweep results in order of the component number, None once the deadline is reached
+        if not self.parallel_sweep:
+            yield (
+                self._evaluate_component_number(
+                    clustering_data,
+                    clustering_data_x,
+                    clustering_data_y,
+                    i + 1,
+                    deadline,
                 )
+                for i in range(max_num)
+            )
+            return
+
+        # the workers share read-only views of the clustering data
+        shared_data = clustering_data.view()
+        shared_x = clustering_data_x.view()
+        shared_y = clustering_data_y.view()
+        for view in (shared_data, shared_x, shared_y):
+            view.flags.writeable = False
 
-            estimates = [method_of_moments(data, data_x, data_y)]
-        elif n <= MAX_COMPONENT_NUM:
-            if self.clustering_data_selection is not None:
-                clustering_data, clustering_data_x, clustering_data_y = filter_data(
-                    self.clustering_data_selection,
-                    data,
-                    width,
-                    height,
-                    data_x,
-                    data_y,
-                    self.plot_mode,
+        stop_event = threading.Event()
+
+        def evaluate(
+            input_num: int,
+        ) -> (
+            tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float | None] | None
+        ):
+            # the worker deadline also stops the running work when the sweep stops early
+            worker_deadline = Deadline(cancel_event=stop_event, parent=deadline)
+            self._contexts[threading.get_ident()] = _EstimationContext(
+                deadline=worker_deadline
+            )
+            try:
+                return self._evaluate_component_number(
+                    shared_data, shared_x, shared_y, input_num, worker_deadline
                 )
-            else:
-                clustering_data, clustering_data_x, clustering_data_y = (
-                    data,
-                    data_x,
-                    data_y,
+            finally:
+                del self._contexts[threading.get_ident()]
+
+        executor = ThreadPoolExecutor(
+            max_workers=get_worker_num(
+                self.memory_budget, len(clustering_data), self.n_jobs
+            )
+        )
+        futures = [executor.submit(evaluate, i + 1) for i in range(max_num)]
+        try:
+            yield (future.result() for future in futures)
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _evaluate_component_number(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        input_num: int,
+        deadline: Deadline | None,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float | None] | None:
+        if deadline is not None and deadline.is_expired():
+            return None
+        print("clustering with component number {}".format(str(input_num)))
+
+        data_cluster_index, centroid_x, centroid_y = self._cluster(
+            clustering_data, clustering_data_x, clustering_data_y, input_num
+        )
+        if input_num == 1 and self.criterion != ClusteringCriterion.BIC:
+            return centroid_x, centroid_y, None
+
+        try:
+            score = get_criterion_score(
+                self.criterion,
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                centroid_x,
+                centroid_y,
+                data_cluster_index,
+                self._get_chunk_size(len(clustering_data)),
+                deadline,
+                self._get_workspace(),
+            )
+        except DeadlineExceeded:
+            return None
+        return centroid_x, centroid_y, score
+
+    def _search_components(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        is_grid: bool = True,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], Regions | None]:
+        # the segmentation also returns its regions, so their pixels are estimated by region
+        clustering_data, clustering_data_x, clustering_data_y = (
+            self._select_clustering_data(data, width, height, data_x, data_y, is_grid)
+        )
+
+        if self.component_search == ComponentSearch.GOLDEN_SECTION:
+            centroid_x, centroid_y = self._golden_section_search(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                self.max_components,
+            )
+            return centroid_x, centroid_y, None
+
+        if self.component_search == ComponentSearch.SPLIT_MERGE:
+            centroid_x, centroid_y = self._split_merge_search(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                self.max_components,
+            )
+            return centroid_x, centroid_y, None
+
+        if self.component_search == ComponentSearch.PEAKS:
+            mask = np.zeros(width * height, dtype=bool)
+            mask[
+                np.asarray(clustering_data_y, dtype=np.intp) * width + clustering_data_x
+            ] = True
+            peak_x, peak_y, _ = find_peaks(
+                data if is_grid else _to_grid(data, data_x, data_y, width, height, 0),
+                width,
+                height,
+                mask,
+                self.min_peak_separation,
+                self.max_components,
+            )
+            print("found {} peaks".format(len(peak_x)))
+            if len(peak_x) <= 1:
+                return peak_x.astype(np.float64), peak_y.astype(np.float64), None
+
+            _, centroid_x, centroid_y = self._cluster(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                len(peak_x),
+                peak_x.astype(np.float64),
+                peak_y.astype(np.float64),
+            )
+            return centroid_x, centroid_y, None
+
+        region_index, region_num = segment(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            width,
+            height,
+            self.max_components,
+        )
+        region_sums = grouped_moment_sums(
+            np.abs(clustering_data),
+            clustering_data_x,
+            clustering_data_y,
+            region_index,
+            region_num,
+            self._get_chunk_size(len(clustering_data)),
+            self._get_workspace(),
+        )
+        centroid_x = region_sums[:, 1] / region_sums[:, 0]
+        centroid_y = region_sums[:, 2] / region_sums[:, 0]
+        print("found {} regions".format(region_num))
+
+        if self.split_regions:
+            centroid_x, centroid_y, region_index = self._split_regions(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                region_index,
+                centroid_x,
+                centroid_y,
+            )
+
+        return (
+            centroid_x,
+            centroid_y,
+            (clustering_data_x, clustering_data_y, region_index),
+        )
+
+    def _golden_section_search(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        max_num: int,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        deadline = self._get_deadline()
+        context = self._contexts.get(threading.get_ident())
+        if context is not None:
+            context.sweep_centroids.clear()
+
+        results: dict[
+            int,
+            tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], float | None],
+        ] = {}
+
+        def evaluate(input_num: int) -> float | None:
+            if input_num not in results:
+                result = self._evaluate_component_number(
+                    clustering_data,
+                    clustering_data_x,
+                    clustering_data_y,
+                    input_num,
+                    deadline,
                 )
+                if result is None:
+                    raise DeadlineExceeded()
+                results[input_num] = result
+                if context is not None:
+                    context.sweep_centroids[input_num] = result[:2]
+            return results[input_num][2]
 
-            init_centroid_x, init_centroid_y = k_means_plus_plus(
-                clustering_data, clustering_data_x, clustering_data_y, n
+        single_component_score = None
+        low = 2
+        high = min(max_num, len(clustering_data))
+        try:
+            if self.criterion == ClusteringCriterion.BIC:
+                single_component_score = evaluate(1)
+            # the ends are scored first, so a score curve that is not unimodal
+            # cannot drop a better number at an end of the range
+            evaluate(low)
+            evaluate(high)
+            # the bracket keeps the best score of a unimodal score curve, and the
+            # inner numbers stay distinct so that no number is dropped unscored
+            while high - low > 2:
+                step = round((high - low) / GOLDEN_RATIO)
+                step = min(max(step, (high - low) // 2 + 1), high - low - 1)
+                inner_low, inner_high = high - step, low + step
+                if is_score_dropped(
+                    self.criterion, evaluate(inner_high), evaluate(inner_low)
+                ):
+                    high = inner_high
+                else:
+                    low = inner_low
+            for input_num in range(low, high + 1):
+                evaluate(input_num)
+        except DeadlineExceeded:
+            pass
+
+        scored = sorted(num for num in results if num >= 2)
+        if self.plot_mode == "all":
+            print({num: results[num][2] for num in scored})
+            plt.figure()
+            plt.plot(scored, [results[num][2] for num in scored], "o")
+
+        best = None
+        for num in scored:
+            if best is None or is_score_dropped(
+                self.criterion, results[best][2], results[num][2]
+            ):
+                best = num
+        if (
+            best is None
+            or not is_score_accepted(
+                self.criterion,
+                results[best][2],
+                self.criterion_threshold,
+                single_component_score,
             )
-            data_cluster_index, centroid_x, centroid_y = k_means(
+            or not self._is_split_accepted(
                 clustering_data,
                 clustering_data_x,
                 clustering_data_y,
-                init_centroid_x,
-                init_centroid_y,
+                *results[best][:2],
+            )
+        ):
+            print("best component num is 1")
+            return np.empty(0), np.empty(0)
+
+        print("best component num is {}".format(str(best)))
+        centroid_x, centroid_y, _ = results[best]
+        return centroid_x, centroid_y
+
+    def _split_merge_search(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        max_num: int,
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        max_num = min(max_num, len(clustering_data))
+        if max_num < 2:
+            return np.empty(0), np.empty(0)
+
+        print("clustering with component number {}".format(str(max_num)))
+        data_cluster_index, _, _ = self._cluster(
+            clustering_data, clustering_data_x, clustering_data_y, max_num
+        )
+        cluster_stats = get_cluster_statistics(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            data_cluster_index,
+            max_num,
+            self._get_chunk_size(len(clustering_data)),
+            self._get_workspace(),
+        )
+        # levels from the most clusters down to a single cluster
+        levels = merge_clusters(cluster_stats)[::-1]
+
+        scores = [
+            get_score_from_statistics(self.criterion, level, len(clustering_data))
+            for level in levels[1:]
+        ]
+        single_component_score = None
+        if self.criterion == ClusteringCriterion.BIC:
+            single_component_score = get_score_from_statistics(
+                self.criterion, levels[0], len(clustering_data)
             )
 
-            if (
-                self.data_selection is not None
-                and self.data_selection != "fwhm-estimate"
-                and self.data_selection != "2-fwhm-estimate"
-                and self.data_selection != "3-fwhm-estimate"
+        if self.plot_mode == "all":
+            print(scores)
+            plt.figure()
+            plt.plot(list(range(2, len(scores) + 2)), scores)
+
+        n = select_component_number(
+            self.criterion,
+            scores,
+            self.criterion_threshold,
+            single_component_score,
+        )
+        if n > 1:
+            level = levels[n - 1]
+            centroid_x = level[:, 1] / level[:, 0]
+            centroid_y = level[:, 2] / level[:, 0]
+            if not self._is_split_accepted(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                centroid_x,
+                centroid_y,
             ):
-                data, data_x, data_y = filter_data(
-                    self.data_selection,
-                    data,
-                    width,
-                    height,
-                    data_x,
-                    data_y,
-                    self.plot_mode,
+                n = 1
+        print("best component num is {}".format(str(n)))
+        if n == 1:
+            return np.empty(0), np.empty(0)
+        return centroid_x, centroid_y
+
+    def _is_split_accepted(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+    ) -> bool:
+        # the criteria not scoring a single cluster fall back to BIC without a threshold
+        if self.criterion_threshold is not None or self.criterion not in (
+            ClusteringCriterion.CALINSKI_HARABASZ,
+            ClusteringCriterion.DAVIES_BOULDIN,
+        ):
+            return True
+
+        chunk_size = self._get_chunk_size(len(clustering_data))
+        data_cluster_index = assign_clusters(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            centroid_x,
+            centroid_y,
+            chunk_size,
+            self._get_workspace(),
+        )
+        cluster_stats = get_cluster_statistics(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            data_cluster_index,
+            len(centroid_x),
+            chunk_size,
+            self._get_workspace(),
+        )
+        return is_bic_decreased(cluster_stats, len(clustering_data))
+
+    def _split_regions(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        region_index: npt.NDArray[np.intp],
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.intp]]:
+        split_x = []
+        split_y = []
+        split_index = np.full(len(region_index), -1, dtype=np.intp)
+        split_num_sum = 0
+        for i in range(len(centroid_x)):
+            in_region = region_index == i
+            region_data = clustering_data[in_region]
+            region_x = clustering_data_x[in_region]
+            region_y = clustering_data_y[in_region]
+
+            split_num = self._sweep_component_number(
+                region_data,
+                region_x,
+                region_y,
+                min(MAX_SPLIT_NUM, self.max_components - len(centroid_x) + 1),
+            )
+            if split_num == 1:
+                split_x.append(centroid_x[i : i + 1])
+                split_y.append(centroid_y[i : i + 1])
+                split_index[in_region] = split_num_sum
+            else:
+                region_cluster_index, region_centroid_x, region_centroid_y = (
+                    self._cluster(region_data, region_x, region_y, split_num)
                 )
+                split_x.append(region_centroid_x)
+                split_y.append(region_centroid_y)
+                split_index[in_region] = split_num_sum + region_cluster_index
+            split_num_sum += len(split_x[-1])
+
+        centroid_x = np.concatenate(split_x)[: self.max_components]
+        centroid_y = np.concatenate(split_y)[: self.max_components]
+        split_index[split_index >= self.max_components] = -1
+        return centroid_x, centroid_y, split_index
 
-            data_cluster_index = np.full((data.shape), -1)
-            for i in range(len(data)):
-                dist = np.abs(data[i]) * np.sqrt(
-                    (
-                        np.square(data_x[i] - centroid_x)
-                        + np.square(data_y[i] - centroid_y)
+    def _cluster(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        n: int,
+        init_centroid_x: npt.NDArray[np.float64] | None = None,
+        init_centroid_y: npt.NDArray[np.float64] | None = None,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        chunk_size = self._get_chunk_size(len(clustering_data))
+        if (init_centroid_x is None or init_centroid_y is None) and self.n_init > 1:
+            data_cluster_index, centroid_x, centroid_y, restarts = k_means_restarts(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                n,
+                self.n_init,
+                self.random_seed,
+                get_worker_num(self.memory_budget, len(clustering_data), self.n_jobs),
+                chunk_size,
+                self._get_deadline(),
+                self.k_means_algorithm,
+            )
+            context = self._contexts.get(threading.get_ident())
+            if context is not None:
+                context.restarts[n] = restarts
+            if self.plot_mode == "all":
+                for restart in restarts:
+                    print(
+                        "k-means restart {}: inertia {}, {} s".format(
+                            restart.index, restart.inertia, restart.elapsed
+                        )
+                    )
+            skipped_fractions = [
+                restart.skipped for restart in restarts if restart.skipped is not None
+            ]
+            if skipped_fractions:
+                print(
+                    "k-means skipped {:.1%} of the distance evaluations".format(
+                        sum(skipped_fractions) / len(skipped_fractions)
                     )
                 )
-                cluster_index = np.argmin(dist)
-                data_cluster_index[i] = cluster_index
-
-            estimates = []
-            for i in range(n):
-                cluster_indexes = np.where(data_cluster_index == i)[0]
-                data_cluster = data[cluster_indexes]
-                data_x_cluster = data_x[cluster_indexes]
-                data_y_cluster = data_y[cluster_indexes]
-
-                if (
-                    self.data_selection == "fwhm-estimate"
-                    or self.data_selection == "2-fwhm-estimate"
-                    or self.data_selection == "3-fwhm-estimate"
-                ):
-                    data_cluster, data_x_cluster, data_y_cluster = filter_data(
-                        self.data_selection,
-                        data_cluster,
-                        width,
-                        height,
-                        data_x_cluster,
-                        data_y_cluster,
-                        self.plot_mode,
+            return data_cluster_index, centroid_x, centroid_y
+
+        if init_centroid_x is None or init_centroid_y is None:
+            init_centroid_x, init_centroid_y = k_means_plus_plus(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                n,
+                chunk_size=chunk_size,
+                workspace=self._get_workspace(),
+            )
+
+        if self.k_means_algorithm == KMeansAlgorithm.HAMERLY:
+            data_cluster_index, centroid_x, centroid_y, skipped = k_means_hamerly(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                init_centroid_x,
+                init_centroid_y,
+                chunk_size,
+                self._get_deadline(),
+            )
+            print("k-means skipped {:.1%} of the distance evaluations".format(skipped))
+            return data_cluster_index, centroid_x, centroid_y
+
+        return k_means(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            init_centroid_x,
+            init_centroid_y,
+            chunk_size,
+            self._get_workspace(),
+            self._get_deadline(),
+        )
+
+    def _estimate_single_component(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        is_grid: bool = True,
+        standard_errors: bool = True,
+    ) -> Estimates:
+        if self.data_selection is not None:
+            # separate buffers keep the selection of the estimates it is compared with
+            data, data_x, data_y = filter_data(
+                self.data_selection,
+                data,
+                width,
+                height,
+                data_x,
+                data_y,
+                self.plot_mode,
+                self._get_chunk_size(len(data)),
+                is_grid,
+                self._get_workspace(),
+                "single",
+                self.mad_precision,
+            )
+
+        chunk_size = self._get_chunk_size(len(data))
+        data_cluster_index = np.zeros(len(data), dtype=np.int8)
+        pixel_num, weight = self._get_cluster_sizes(
+            data, data_cluster_index, 1, chunk_size
+        )
+        estimates = Estimates(
+            np.array(
+                [
+                    method_of_moments(
+                        data, data_x, data_y, chunk_size, self._get_workspace()
                     )
+                ]
+            ),
+            pixel_num=pixel_num,
+            weight=weight,
+        )
+        self._set_standard_errors(
+            estimates,
+            standard_errors,
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            1,
+            chunk_size,
+        )
+        return estimates
+
+    def _estimate_from_centroids(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+        is_grid: bool = True,
+        standard_errors: bool = True,
+        regions: Regions | None = None,
+    ) -> Estimates:
+        fwhm_multiplier = get_fwhm_multiplier(self.data_selection)
+        if self.data_selection is not None and fwhm_multiplier is None:
+            data, data_x, data_y = filter_data(
+                self.data_selection,
+                data,
+                width,
+                height,
+                data_x,
+                data_y,
+                self.plot_mode,
+                self._get_chunk_size(len(data)),
+                is_grid,
+                self._get_workspace(),
+                precision=self.mad_precision,
+            )
 
-                estimates.append(
-                    method_of_moments(data_cluster, data_x_cluster, data_y_cluster)
+        chunk_size = self._get_chunk_size(len(data))
+        if regions is None:
+            data_cluster_index = assign_clusters(
+                data,
+                data_x,
+                data_y,
+                centroid_x,
+                centroid_y,
+                chunk_size,
+                self._get_workspace(),
+            )
+        else:
+            # the pixels of a region belong to its component, the others to the nearest centroid
+            region_x, region_y, region_index = regions
+            data_cluster_index = lookup_labels(
+                region_x, region_y, region_index, width, data_x, data_y
+            )
+            unlabeled = np.flatnonzero(data_cluster_index < 0)
+            if len(unlabeled):
+                data_cluster_index[unlabeled] = assign_clusters(
+                    data[unlabeled],
+                    data_x[unlabeled],
+                    data_y[unlabeled],
+                    centroid_x,
+                    centroid_y,
+                    self._get_chunk_size(len(unlabeled)),
                 )
+
+        if fwhm_multiplier is not None:
+            data_cluster_index = filter_fwhm_clusters(
+                data,
+                data_x,
+                data_y,
+                data_cluster_index,
+                len(centroid_x),
+                fwhm_multiplier,
+                self.plot_mode,
+                (width, height) if is_grid else None,
+                chunk_size,
+            )
+
+        estimates = grouped_method_of_moments(
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            len(centroid_x),
+            chunk_size,
+            self._get_workspace(),
+        )
+        pixel_num, weight = self._get_cluster_sizes(
+            data, data_cluster_index, len(centroid_x), chunk_size
+        )
+        result = Estimates(estimates, pixel_num=pixel_num, weight=weight)
+        self._set_standard_errors(
+            result,
+            standard_errors,
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            len(centroid_x),
+            chunk_size,
+        )
+        return result
+
+    def _set_standard_errors(
+        self,
+        estimates: Estimates,
+        now: bool,
+        data: npt.NDArray[np.float64],
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        data_cluster_index: npt.NDArray[np.integer],
+        n: int,
+        chunk_size: int | None,
+    ) -> None:
+        # bootstraps now, or defers the bootstrap until the estimates are known to be returned
+        if self.bootstrap_replicates == 0:
+            return
+        bootstrap = partial(
+            self._get_standard_errors,
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            n,
+            chunk_size,
+        )
+        if now:
+            estimates.standard_errors = bootstrap()
         else:
-            raise Exception("Invalid Gaussian component number.")
+            estimates._bootstrap = bootstrap
 
-        return estimates
+    def _get_standard_errors(
+        self,
+        data: npt.NDArray[np.float64],
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        data_cluster_index: npt.NDArray[np.integer],
+        n: int,
+        chunk_size: int | None,
+    ) -> npt.NDArray[np.float64] | None:
+        if self.bootstrap_replicates == 0:
+            return None
+        return bootstrap_standard_errors(
+            data,
+            data_x,
+            data_y,
+            data_cluster_index,
+            n,
+            self.bootstrap_replicates,
+            chunk_size,
+            self.random_seed,
+            self.n_jobs,
+        )
+
+    def _get_cluster_sizes(
+        self,
+        data: npt.NDArray[np.float64],
+        data_cluster_index: npt.NDArray[np.integer],
+        n: int,
+        chunk_size: int | None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        pixel_num = np.zeros(n, dtype=np.int64)
+        weight = np.zeros(n)
+        for chunk in iterate_chunks(len(data), chunk_size):
+            cluster_index = data_cluster_index[chunk]
+            # data points excluded from every cluster have negative indices
+            is_included = cluster_index >= 0
+            cluster_index = cluster_index[is_included]
+            pixel_num += np.bincount(cluster_index, minlength=n)
+            weight += np.bincount(
+                cluster_index, weights=np.abs(data[chunk][is_included]), minlength=n
+            )
+        return pixel_num, weight
+
+    def _select_clustering_data(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        is_grid: bool = True,
+    ) -> tuple[
+        npt.NDArray[np.float64],
+        npt.NDArray[np.signedinteger],
+        npt.NDArray[np.signedinteger],
+    ]:
+        if self.clustering_data_selection is None:
+            return data, data_x, data_y
+
+        return filter_data(
+            self.clustering_data_selection,
+            data,
+            width,
+            height,
+            data_x,
+            data_y,
+            self.plot_mode,
+            self._get_chunk_size(len(data)),
+            is_grid,
+            self._get_workspace(),
+            "clustering",
+            self.mad_precision,
+        )
+
+    def _get_coordinates(
+        self, width: int, height: int
+    ) -> tuple[npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger]]:
+        dtype = get_coordinate_dtype(width, height, self.memory_budget)
+        workspace = self._get_workspace()
+        if workspace is not None:
+            return workspace.get_coordinates(dtype)
+
+        x = np.arange(width, dtype=dtype)
+        y = np.arange(height, dtype=dtype)
+        data_x = np.tile(x, height)
+        data_y = np.repeat(y, width)
+        return data_x, data_y
+
+    def _get_chunk_size(self, num: int) -> int | None:
+        return get_chunk_size(self.memory_budget, num)
+
+    def _get_workspace(self) -> Workspace | None:
+        context = self._contexts.get(threading.get_ident())
+        return None if context is None else context.workspace
+
+    def _get_deadline(self) -> Deadline | None:
+        context = self._contexts.get(threading.get_ident())
+        return None if context is None else context.deadline
+
+
+def _to_grid(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    width: int,
+    height: int,
+    fill_value: float,
+) -> npt.NDArray[np.float64]:
+    # the listed pixels on the pixel grid, for the stages that need the grid
+    grid = np.full(width * height, fill_value, dtype=np.float64)
+    grid[np.asarray(data_y, dtype=np.intp) * width + data_x] = data
+    return grid
@@ -0,0 +1,119 @@
+from typing import Iterator
+import numpy as np
+
+# bytes per pixel held for a whole stage: coordinates, cluster indices and running minimum distances
+PERSISTENT_BYTES_PER_PIXEL = 32
+# bytes per pixel of the temporaries of one vectorized pass over a chunk
+TEMPORARY_BYTES_PER_PIXEL = 64
+MIN_CHUNK_SIZE = 4096
+# largest coordinate whose square and products fit in a 32-bit integer
+MAX_INT32_COORDINATE = 46340
+
+
+def get_chunk_size(memory_budget: int | None, num: int) -> int | None:
+    """
+    Get the number of data points processed at once so that the working memory stays within the budget.
+
+    Parameters
+    ----------
+    memory_budget
+        Memory budget in bytes for the working memory, not counting the input data. If None, the memory is not limited.
+    num
+        Number of data points.
+
+    Returns
+    -------
+    int | None
+        Number of data points per chunk, or None if all data points can be processed at once.
+    """
+
+    if memory_budget is None:
+        return None
+
+    available = memory_budget - num * PERSISTENT_BYTES_PER_PIXEL
+    chunk_size = max(available // TEMPORARY_BYTES_PER_PIXEL, MIN_CHUNK_SIZE)
+    if chunk_size >= num:
+        return None
+    return int(chunk_size)
+
+
+def get_worker_num(
+    memory_budget: int | None, num: int, n_jobs: int | None
+) -> int | None:
+    """
+    Limit the number of parallel workers, each holding its own per-pixel arrays, to the memory budget.
+
+    Parameters
+    ----------
+    memory_budget
+        Memory budget in bytes for the working memory, not counting the input data. If None, the memory is not limited.
+    num
+        Number of data points.
+    n_jobs
+        Requested number of workers. If None, the default of ThreadPoolExecutor is used.
+
+    Returns
+    -------
+    int | None
+        The number of workers.
+    """
+
+    if memory_budget is None:
+        return n_jobs
+
+    worker_bytes = num * PERSISTENT_BYTES_PER_PIXEL + MIN_CHUNK_SIZE * (
+        TEMPORARY_BYTES_PER_PIXEL
+    )
+    max_workers = max(int(memory_budget // worker_bytes), 1)
+    return max_workers if n_jobs is None else min(n_jobs, max_workers)
+
+
+def get_coordinate_dtype(
+    width: int, height: int, memory_budget: int | None
+) -> type[np.signedinteger]:
+    """
+    Get the smallest integer type for the pixel coordinates under a memory budget.
+
+    Parameters
+    ----------
+    width
+        Width of the data array.
+    height
+        Height of the data array.
+    memory_budget
+        Memory budget in bytes. If None, the default integer type is used.
+
+    Returns
+    -------
+    type
+        The integer type of the coordinates.
+    """
+
+    if memory_budget is not None and max(width, height) <= MAX_INT32_COORDINATE:
+        return np.int32
+    return np.int64
+
+
+def iterate_chunks(num: int, chunk_size: int | None) -> Iterator[slice]:
+    """
+    Iterate over the slices of consecutive chunks of the data.
+
+    Parameters
+    ----------
+    num
+        Number of data points.
+    chunk_size
+        Number of data points per chunk. If None, a single slice covers all data points.
+
+    Yields
+    ------
+    slice
+        Slice of a chunk.
+    """
+
+    if chunk_size is None:
+        yield slice(0, num)
+        return
+
+    for start in range(0, num, chunk_size):
+        yield slice(start, min(start + chunk_size, num))
@@ -2,11 +2,16 @@ import math
 import numpy as np
 import numpy.typing as npt
 
+from .memory import iterate_chunks
+from .workspace import Workspace, get_buffer
+
 
 def method_of_moments(
     data: npt.NDArray[np.float64],
-    data_x: npt.NDArray[np.float64],
-    data_y: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
 ) -> list[float]:
     """
     Estimate parameters of 2D single Gaussian distribution using the method of moments.
@@ -19,6 +24,10 @@ def method_of_moments(
         X coordinates of data points.
     data_y
         Y coordinates of data points.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the buffers of the weighted coordinates. If None, the buffers are allocated.
 
     Returns
     -------
@@ -26,22 +35,350 @@ def method_of_moments(
         Estimated parameters: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
     """
 
-    m0 = data.sum()
-    mx = np.dot(data_x, data) / m0
-    my = np.dot(data_y, data) / m0
-    mxx = np.dot(np.square(data_x), data) / m0 - mx * mx
-    myy = np.dot(np.square(data_y), data) / m0 - my * my
-    mxy = np.dot(data_x * data_y, data) / m0 - mx * my
+    if chunk_size is None:
+        product = get_buffer(workspace, "weighted_product", len(data), np.float64)
+        moment_sums = np.array(
+            [
+                data.sum(),
+                np.dot(data_x, data),
+                np.dot(data_y, data),
+                np.dot(np.multiply(data_x, data_x, out=product), data),
+                np.dot(np.multiply(data_y, data_y, out=product), data),
+                np.dot(np.multiply(data_x, data_y, out=product), data),
+            ]
+        )
+    else:
+        moment_sums = grouped_moment_sums(
+            data,
+            data_x,
+            data_y,
+            np.zeros(len(data), dtype=np.int8),
+            1,
+            chunk_size,
+            workspace,
+        )[0]
+    estimates: list[float] = get_parameters_from_moment_sums(moment_sums).tolist()
+    return estimates
+
+
+def grouped_moment_sums(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.integer],
+    n: int,
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Accumulate the moment sums of every cluster in one pass over the data.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    data_cluster_index
+        Cluster indices for each data point. Data points with negative indices are ignored.
+    n
+        Number of clusters.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the buffers of the weighted coordinates. If None, the buffers are allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 6) with the sum of data, and the data weighted sum of x, y, x^2, y^2 and xy of each cluster.
+    """
+
+    if chunk_size is not None:
+        moment_sums = np.zeros((n, 6))
+        for chunk in iterate_chunks(len(data), chunk_size):
+            moment_sums += grouped_moment_sums(
+                data[chunk],
+                data_x[chunk],
+                data_y[chunk],
+                data_cluster_index[chunk],
+                n,
+                workspace=workspace,
+            )
+        return moment_sums
+
+    labels = np.asarray(data_cluster_index, dtype=np.intp)
+    if len(labels) and labels.min() < 0:
+        valid = labels >= 0
+        labels = labels[valid]
+        data = data[valid]
+        data_x = data_x[valid]
+        data_y = data_y[valid]
+
+    num = len(data)
+    weighted_x = np.multiply(
+        data_x, data, out=get_buffer(workspace, "weighted_x", num, np.float64)
+    )
+    weighted_y = np.multiply(
+        data_y, data, out=get_buffer(workspace, "weighted_y", num, np.float64)
+    )
+    product = get_buffer(workspace, "weighted_product", num, np.float64)
+
+    moment_sums = np.empty((n, 6))
+    moment_sums[:, 0] = np.bincount(labels, weights=data, minlength=n)[:n]
+    moment_sums[:, 1] = np.bincount(labels, weights=weighted_x, minlength=n)[:n]
+    moment_sums[:, 2] = np.bincount(labels, weights=weighted_y, minlength=n)[:n]
+    for i, (weighted, coordinate) in enumerate(
+        [(weighted_x, data_x), (weighted_y, data_y), (weighted_x, data_y)]
+    ):
+        np.multiply(weighted, coordinate, out=product)
+        moment_sums[:, 3 + i] = np.bincount(labels, weights=product, minlength=n)[:n]
+    return moment_sums
+
+
+def grouped_method_of_moments(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    data_cluster_index: npt.NDArray[np.integer],
+    n: int,
+    chunk_size: int | None = None,
+    workspace: Workspace | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Estimate parameters of a 2D Gaussian distribution for every cluster using the method of moments.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    data_cluster_index
+        Cluster indices for each data point. Data points with negative indices are ignored.
+    n
+        Number of clusters.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    workspace
+        Workspace providing the buffers of the weighted coordinates. If None, the buffers are allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (n, 6) with the estimated parameters of each cluster: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+    """
+
+    return get_parameters_from_moment_sums(
+        grouped_moment_sums(
+            data, data_x, data_y, data_cluster_index, n, chunk_size, workspace
+        )
+    )
+
+
+def get_parameters_from_moment_sums(
+    moment_sums: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """
+    Convert moment sums to the parameters of 2D Gaussian distributions.
+
+    Parameters
+    ----------
+    moment_sums
+        Array of shape (..., 6) with the sum of data, and the data weighted sum of x, y, x^2, y^2 and xy.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (..., 6) with the estimated parameters: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+    """
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m0 = moment_sums[..., 0]
+        mx = moment_sums[..., 1] / m0
+        my = moment_sums[..., 2] / m0
+        mxx = moment_sums[..., 3] / m0 - mx * mx
+        myy = moment_sums[..., 4] / m0 - my * my
+        mxy = moment_sums[..., 5] / m0 - mx * my
+
+        amp_estimate = m0 * 0.5 * (np.abs(mxx * myy - mxy * mxy) ** (-0.5)) / np.pi
+
+        SIGMA_TO_FWHM = (8 * math.log(2)) ** 0.5
+        tmp = ((mxx - myy) ** 2 + 4 * mxy * mxy) ** 0.5
+        sigma_x_estimate = (0.5 * (np.abs(mxx + myy + tmp))) ** 0.5
+        sigma_y_estimate = (0.5 * (np.abs(mxx + myy - tmp))) ** 0.5
+        fwhm_x_estimate = sigma_x_estimate * SIGMA_TO_FWHM
+        fwhm_y_estimate = sigma_y_estimate * SIGMA_TO_FWHM
+
+        theta_estimate = np.degrees(-0.5 * np.arctan2(2 * mxy, myy - mxx))
+
+    return np.stack(
+        [amp_estimate, mx, my, fwhm_x_estimate, fwhm_y_estimate, theta_estimate],
+        axis=-1,
+    )
+
+
+class MomentAccumulator:
+    """
+    Accumulates the moment sums of an image that is updated over time, such as an image built up by successive integrations.
+
+    The moment sums are linear in the data, so adding or subtracting a delta image or a set of changed pixels updates them in time proportional to the change, and the accumulators of parallel workers can be merged.
+
+    Attributes
+    ----------
+    width
+        Width of the image.
+    height
+        Height of the image.
+    moment_sums
+        Array with the sum of data, and the data weighted sum of x, y, x^2, y^2 and xy.
+
+    Examples
+    --------
+    >>> accumulator = MomentAccumulator(width, height)
+    >>> for exposure in exposures:
+    ...     accumulator.add(exposure)
+    ...     print(accumulator.get_parameters())
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        Initialize an accumulator of an empty image.
+
+        Parameters
+        ----------
+        width
+            Width of the image.
+        height
+            Height of the image.
+        """
+        self.width = width
+        self.height = height
+        self.moment_sums = np.zeros(6)
+
+    def add(self, delta: npt.NDArray[np.float64], sign: float = 1) -> None:
+        """
+        Add a delta image.
+
+        Parameters
+        ----------
+        delta
+            The delta image, as a data array of the image size.
+        sign
+            Multiplier of the delta image, -1 to subtract it.
+        """
+        delta = np.asarray(delta).reshape(self.height, self.width)
+        x = np.arange(self.width, dtype=np.float64)
+        y = np.arange(self.height, dtype=np.float64)
+
+        # the sums are separable, so only the row and column sums are weighted
+        row_sums = delta.sum(axis=1)
+        column_sums = delta.sum(axis=0)
+        self.moment_sums += sign * np.array(
+            [
+                row_sums.sum(),
+                np.dot(column_sums, x),
+                np.dot(row_sums, y),
+                np.dot(column_sums, np.square(x)),
+                np.dot(row_sums, np.square(y)),
+                np.dot(y, np.dot(delta, x)),
+            ]
+        )
+
+    def subtract(self, delta: npt.NDArray[np.float64]) -> None:
+        """
+        Subtract a delta image.
+
+        Parameters
+        ----------
+        delta
+            The delta image, as a data array of the image size.
+        """
+        self.add(delta, -1)
+
+    def add_pixels(
+        self,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        delta: npt.NDArray[np.float64],
+        sign: float = 1,
+    ) -> None:
+        """
+        Add the changes of a sparse set of pixels.
+
+        Parameters
+        ----------
+        data_x
+            X coordinates of the changed pixels.
+        data_y
+            Y coordinates of the changed pixels.
+        delta
+            Changes of the pixel values.
+        sign
+            Multiplier of the changes, -1 to subtract them.
+        """
+        data_x = np.asarray(data_x, dtype=np.float64)
+        data_y = np.asarray(data_y, dtype=np.float64)
+        weighted_x = data_x * delta
+        weighted_y = data_y * delta
+        self.moment_sums += sign * np.array(
+            [
+                np.sum(delta),
+                weighted_x.sum(),
+                weighted_y.sum(),
+                np.dot(weighted_x, data_x),
+                np.dot(weighted_y, data_y),
+                np.dot(weighted_x, data_y),
+            ]
+        )
+
+    def subtract_pixels(
+        self,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        delta: npt.NDArray[np.float64],
+    ) -> None:
+        """
+        Subtract the changes of a sparse set of pixels.
+
+        Parameters
+        ----------
+        data_x
+            X coordinates of the changed pixels.
+        data_y
+            Y coordinates of the changed pixels.
+        delta
+            Changes of the pixel values.
+        """
+        self.add_pixels(data_x, data_y, delta, -1)
 
-    amp_estimate = m0 * 0.5 * (abs(mxx * myy - mxy * mxy) ** (-0.5)) / np.pi
+    def merge(self, other: "MomentAccumulator") -> None:
+        """
+        Add the moment sums of another accumulator of the same image size, such as the accumulator of a parallel worker.
 
-    SIGMA_TO_FWHM = (8 * math.log(2)) ** 0.5
-    tmp = ((mxx - myy) ** 2 + 4 * mxy * mxy) ** 0.5
-    sigma_x_estimate = (0.5 * (abs(mxx + myy + tmp))) ** 0.5
-    sigma_y_estimate = (0.5 * (abs(mxx + myy - tmp))) ** 0.5
-    fwhm_x_estimate = sigma_x_estimate * SIGMA_TO_FWHM
-    fwhm_y_estimate = sigma_y_estimate * SIGMA_TO_FWHM
+        Parameters
+        ----------
+        other
+            The other accumulator.
+        """
+        if (other.width, other.height) != (self.width, self.height):
+            raise Exception("Can not merge accumulators of different image sizes.")
+        self.moment_sums += other.moment_sums
 
-    theta_estimate = np.degrees(-0.5 * np.arctan2(2 * mxy, myy - mxx))
+    def get_parameters(self) -> list[float]:
+        """
+        Estimate parameters of 2D single Gaussian distribution from the accumulated moment sums.
 
-    return [amp_estimate, mx, my, fwhm_x_estimate, fwhm_y_estimate, theta_estimate]
+        Returns
+        -------
+        list[float]
+            Estimated parameters: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+        """
+        estimates: list[float] = get_parameters_from_moment_sums(
+            self.moment_sums
+        ).tolist()
+        return estimates
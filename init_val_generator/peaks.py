@@ -0,0 +1,103 @@
+import numpy as np
+import numpy.typing as npt
+
+# box smoothing suppressing the noise peaks on the slopes of sources
+DEFAULT_SMOOTHING_RADIUS = 1
+# peaks closer than this number of pixels are merged into the brighter one
+DEFAULT_MIN_SEPARATION = 5.0
+
+
+def find_peaks(
+    data: npt.NDArray[np.float64],
+    width: int,
+    height: int,
+    mask: npt.NDArray[np.bool_] | None = None,
+    min_separation: float = DEFAULT_MIN_SEPARATION,
+    max_num: int | None = None,
+    smoothing_radius: int = DEFAULT_SMOOTHING_RADIUS,
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp], npt.NDArray[np.float64]]:
+    """
+    Find the local maxima of the absolute data values on the pixel grid.
+
+    The absolute values are smoothed by a box filter, and a pixel is a local maximum if its smoothed value is not smaller than any of its 8 neighbors. The peaks are ranked by the smoothed value, and a peak closer than the minimum separation to a brighter peak is merged into it.
+
+    Parameters
+    ----------
+    data
+        The input data array of the whole image.
+    width
+        Width of the data array.
+    height
+        Height of the data array.
+    mask
+        Boolean array of the same length as the data, True for the pixels that can be peaks, such as the pixels not excluded by filter_data. If None, all pixels can be peaks.
+    min_separation
+        Minimum distance in pixels between peaks.
+    max_num
+        Maximum number of peaks. If not None, only the brightest peaks are kept.
+    smoothing_radius
+        Radius in pixels of the box filter. If 0, the data is not smoothed.
+
+    Returns
+    -------
+    tuple
+        X coordinates, y coordinates and smoothed absolute values of the peaks, from the brightest peak.
+    """
+
+    image = _box_smooth(np.abs(data).reshape(height, width), smoothing_radius)
+    padded = np.full((height + 2, width + 2), -np.inf)
+    padded[1:-1, 1:-1] = image
+
+    is_peak = np.ones((height, width), dtype=bool) if mask is None else mask.copy()
+    is_peak = is_peak.reshape(height, width)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy != 0 or dx != 0:
+                is_peak &= (
+                    image >= padded[1 + dy : height + 1 + dy, 1 + dx : width + 1 + dx]
+                )
+
+    peak_y, peak_x = np.nonzero(is_peak)
+    amplitude = image[peak_y, peak_x]
+    order = np.argsort(-amplitude, kind="stable")
+    peak_x = peak_x[order]
+    peak_y = peak_y[order]
+    amplitude = amplitude[order]
+
+    kept = np.zeros(len(order), dtype=bool)
+    kept_x = np.empty(0)
+    kept_y = np.empty(0)
+    sq_separation = min_separation * min_separation
+    for i in range(len(order)):
+        if np.any(
+            np.square(kept_x - peak_x[i]) + np.square(kept_y - peak_y[i])
+            < sq_separation
+        ):
+            continue
+        kept[i] = True
+        kept_x = np.append(kept_x, peak_x[i])
+        kept_y = np.append(kept_y, peak_y[i])
+        if max_num is not None and len(kept_x) == max_num:
+            break
+
+    return peak_x[kept], peak_y[kept], amplitude[kept]
+
+
+def _box_smooth(image: npt.NDArray[np.float64], radius: int) -> npt.NDArray[np.float64]:
+    if radius == 0:
+        return image
+
+    # separable running sums from cumulative sums, with the window clipped at the edges
+    for axis in (0, 1):
+        length = image.shape[axis]
+        cumsum = np.cumsum(image, axis=axis)
+        cumsum = np.insert(cumsum, 0, 0, axis=axis)
+        index = np.arange(length)
+        upper = np.minimum(index + radius + 1, length)
+        lower = np.maximum(index - radius, 0)
+        count = (upper - lower).astype(np.float64)
+        if axis == 0:
+            image = (cumsum[upper] - cumsum[lower]) / count[:, None]
+        else:
+            image = (cumsum[:, upper] - cumsum[:, lower]) / count
+    return image
@@ -0,0 +1,79 @@
+from pathlib import Path
+import json
+from typing import Any
+
+Profile = dict[str, Any]
+
+
+def save_profile(profile: Profile, path: str | Path) -> None:
+    """
+    Save a tuning profile as a JSON file.
+
+    Parameters
+    ----------
+    profile
+        The tuning profile, with a list of size classes under "size_classes".
+    path
+        Path of the JSON file.
+    """
+    with open(path, "w") as file:
+        json.dump(profile, file, indent=4)
+
+
+def load_profile(path: str | Path) -> Profile:
+    """
+    Load a tuning profile from a JSON file.
+
+    Parameters
+    ----------
+    path
+        Path of the JSON file.
+
+    Returns
+    -------
+    dict
+        The tuning profile.
+    """
+    with open(path) as file:
+        profile: Profile = json.load(file)
+    if "size_classes" not in profile or len(profile["size_classes"]) == 0:
+        raise Exception("The tuning profile has no size classes.")
+    return profile
+
+
+def select_configuration(profile: Profile, width: int, height: int) -> Profile:
+    """
+    Select the configuration of the smallest size class that holds the image.
+
+    Each size class has a maximum pixel number "max_pixels", where None means unbounded. Images larger than every size class use the configuration of the largest size class.
+
+    Parameters
+    ----------
+    profile
+        The tuning profile.
+    width
+        Width of the image.
+    height
+        Height of the image.
+
+    Returns
+    -------
+    dict
+        The configuration of the selected size class, with the "data_selection", "clustering_data_selection", "criterion" and "component_search" settings.
+    """
+
+    size_classes = sorted(
+        profile["size_classes"],
+        key=lambda size_class: (
+            float("inf")
+            if size_class["max_pixels"] is None
+            else size_class["max_pixels"]
+        ),
+    )
+    for size_class in size_classes:
+        if (
+            size_class["max_pixels"] is None
+            or width * height <= size_class["max_pixels"]
+        ):
+            return size_class
+    return size_classes[-1]
@@ -0,0 +1,311 @@
+from concurrent.futures import ThreadPoolExecutor
+import math
+import numpy as np
+import numpy.typing as npt
+
+from .method_of_moments import get_parameters_from_moment_sums
+from .deadline import Deadline
+from .tools.gaussian_image import get_boxes, to_quadratic_parameters
+
+# half size of the bounding box of a component in standard deviations
+DEFAULT_N_SIGMA = 3.0
+DEFAULT_MAX_ITER = 10
+# initial damping of the Levenberg-Marquardt steps, and its factor after a step
+INITIAL_DAMPING = 1e-3
+DAMPING_FACTOR = 10.0
+# number of rejected steps with increasing damping before the iterations stop
+MAX_DAMPING_STEPS = 10
+# relative decrease of the squared residual sum below which the iterations stop
+TOLERANCE = 1e-8
+# number of fits with the bounding boxes of the refined components
+MAX_BOX_UPDATES = 3
+
+
+def refine(
+    data: npt.NDArray[np.float64],
+    width: int,
+    height: int,
+    estimates: list[list[float]],
+    n_sigma: float = DEFAULT_N_SIGMA,
+    max_iter: int = DEFAULT_MAX_ITER,
+    n_jobs: int | None = None,
+    deadline: Deadline | None = None,
+) -> list[list[float]]:
+    """
+    Refine estimated Gaussian components by a few Levenberg-Marquardt iterations of a least-squares fit.
+
+    Each component is evaluated with its analytic Jacobian only inside its bounding box of n_sigma standard deviations. Components with overlapping bounding boxes are fitted jointly, and the groups of components that do not overlap are fitted independently in a thread pool. When the fit changes the bounding boxes, the components are fitted again in the new boxes, up to 3 times, with the iterations left to them. The components are parametrized by amplitude, center and the coefficients of the quadratic form in the exponent, and a step is rejected if a component loses its positive definite quadratic form, or leaves its box with its center or standard deviations.
+
+    Parameters
+    ----------
+    data
+        The input data array of the whole image.
+    width
+        Width of the data array.
+    height
+        Height of the data array.
+    estimates
+        List of estimated parameters for the Gaussian components: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+    n_sigma
+        Half size of the bounding box of a component in standard deviations.
+    max_iter
+        Maximum number of Levenberg-Marquardt iterations of a component, in total over the fits in its updated bounding boxes.
+    n_jobs
+        Number of threads fitting the groups of components. If None, the default of ThreadPoolExecutor is used.
+    deadline
+        Deadline of the refinement, checked before each fit of a group and between the iterations. When it is reached, the components keep their last accepted parameters. If None, the refinement is not limited by time.
+
+    Returns
+    -------
+    list[list[float]]
+        The refined parameters. Components with non-finite parameters or without pixels in their bounding box are not changed.
+    """
+
+    image = data.reshape(height, width)
+    params = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+    refined = params.copy()
+
+    index = np.flatnonzero(
+        np.all(np.isfinite(params), axis=1) & (params[:, 3] > 0) & (params[:, 4] > 0)
+    )
+    theta = to_quadratic_parameters(params[index])
+
+    # the boxes follow the refined widths, so the fit is repeated until they are stable
+    boxes = None
+    remaining_iter = np.full(len(index), max_iter)
+    for _ in range(MAX_BOX_UPDATES + 1):
+        if deadline is not None and deadline.is_expired():
+            break
+        new_boxes = get_boxes(theta, width, height, n_sigma)
+        if boxes is not None and np.array_equal(new_boxes, boxes):
+            break
+        boxes = new_boxes
+        is_empty = (boxes[:, 1] <= boxes[:, 0]) | (boxes[:, 3] <= boxes[:, 2])
+        fitted = np.flatnonzero(~is_empty & (remaining_iter > 0))
+        if len(fitted) == 0:
+            break
+
+        def fit(group: npt.NDArray[np.intp]) -> tuple[npt.NDArray[np.float64], int]:
+            # a joint fit runs until one of its components has no iterations left
+            return _fit_group(
+                image,
+                theta[group],
+                boxes[group],
+                int(remaining_iter[group].min()),
+                deadline,
+            )
+
+        groups = [fitted[group] for group in _group_overlapping(boxes[fitted])]
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for group, (group_theta, iter_num) in zip(
+                groups, executor.map(fit, groups)
+            ):
+                theta[group] = group_theta
+                remaining_iter[group] -= iter_num
+
+    refined[index] = _from_quadratic_parameters(theta)
+    estimates = refined.tolist()
+    return estimates
+
+
+def _from_quadratic_parameters(
+    theta: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    # the covariance is half the inverse of the quadratic form, converted by the moments of the Gaussian
+    amp, center_x, center_y, a, dbl_b, c = theta.T
+    det = a * c - dbl_b * dbl_b / 4
+    var_x = 0.5 * c / det
+    var_y = 0.5 * a / det
+    cov_xy = -0.25 * dbl_b / det
+    m0 = amp * 2 * math.pi * np.sqrt(var_x * var_y - cov_xy * cov_xy)
+    moment_sums = np.stack(
+        [
+            m0,
+            m0 * center_x,
+            m0 * center_y,
+            m0 * (var_x + center_x * center_x),
+            m0 * (var_y + center_y * center_y),
+            m0 * (cov_xy + center_x * center_y),
+        ],
+        axis=-1,
+    )
+    return get_parameters_from_moment_sums(moment_sums)
+
+
+def _is_overlapping(
+    boxes: npt.NDArray[np.intp], other: npt.NDArray[np.intp]
+) -> npt.NDArray[np.bool_]:
+    return (
+        (boxes[:, None, 0] < other[None, :, 1])
+        & (other[None, :, 0] < boxes[:, None, 1])
+        & (boxes[:, None, 2] < other[None, :, 3])
+        & (other[None, :, 2] < boxes[:, None, 3])
+    )
+
+
+def _group_overlapping(boxes: npt.NDArray[np.intp]) -> list[npt.NDArray[np.intp]]:
+    is_overlapping = _is_overlapping(boxes, boxes)
+    group_index = np.full(len(boxes), -1)
+    groups: list[npt.NDArray[np.intp]] = []
+    for start in range(len(boxes)):
+        if group_index[start] >= 0:
+            continue
+        group_index[start] = len(groups)
+        members = [start]
+        stack = [start]
+        while stack:
+            neighbors = np.flatnonzero(is_overlapping[stack.pop()] & (group_index < 0))
+            group_index[neighbors] = len(groups)
+            members.extend(neighbors)
+            stack.extend(neighbors)
+        groups.append(np.sort(np.array(members, dtype=np.intp)))
+    return groups
+
+
+def _fit_group(
+    image: npt.NDArray[np.float64],
+    theta: npt.NDArray[np.float64],
+    boxes: npt.NDArray[np.intp],
+    max_iter: int,
+    deadline: Deadline | None = None,
+) -> tuple[npt.NDArray[np.float64], int]:
+    # the fitted parameters and the number of iterations run
+    x0 = int(boxes[:, 0].min())
+    y0 = int(boxes[:, 2].min())
+    region = image[y0 : int(boxes[:, 3].max()), x0 : int(boxes[:, 1].max())]
+    is_valid = np.isfinite(region)
+    region = np.where(is_valid, region, 0)
+    pairs = np.argwhere(np.triu(_is_overlapping(boxes, boxes)))
+    # the boxes index the region from here, the centers stay in image coordinates
+    image_boxes = boxes
+    boxes = boxes - np.array([x0, x0, y0, y0])
+
+    model, jacobians = _evaluate(theta, boxes, (x0, y0), region.shape, is_valid)
+    residual = (region - model) * is_valid
+    cost = float(np.sum(np.square(residual)))
+    damping = INITIAL_DAMPING
+    iter_num = 0
+    while iter_num < max_iter:
+        if deadline is not None and deadline.is_expired():
+            break
+        iter_num += 1
+        jtj, jtr = _get_normal_equations(jacobians, residual, boxes, pairs)
+        scale = np.diag(jtj).copy()
+        scale[scale <= 0] = 1
+
+        for _ in range(MAX_DAMPING_STEPS):
+            try:
+                step = np.linalg.solve(jtj + damping * np.diag(scale), jtr)
+            except np.linalg.LinAlgError:
+                damping *= DAMPING_FACTOR
+                continue
+            new_theta = theta + step.reshape(-1, 6)
+            if _is_inside_boxes(new_theta, image_boxes):
+                new_model, new_jacobians = _evaluate(
+                    new_theta, boxes, (x0, y0), region.shape, is_valid
+                )
+                new_residual = (region - new_model) * is_valid
+                new_cost = float(np.sum(np.square(new_residual)))
+                if new_cost < cost:
+                    break
+            damping *= DAMPING_FACTOR
+        else:
+            break
+
+        is_converged = cost - new_cost <= TOLERANCE * cost
+        theta, jacobians, residual, cost = (
+            new_theta,
+            new_jacobians,
+            new_residual,
+            new_cost,
+        )
+        damping /= DAMPING_FACTOR
+        if is_converged:
+            break
+
+    return theta, iter_num
+
+
+def _is_inside_boxes(
+    theta: npt.NDArray[np.float64], boxes: npt.NDArray[np.intp]
+) -> bool:
+    # a component keeps a positive definite quadratic form, its center in its box, and
+    # a standard deviation below the box size, so that the box constrains the fit
+    _, center_x, center_y, a, dbl_b, c = theta.T
+    det = a * c - dbl_b * dbl_b / 4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        is_inside = (
+            (a > 0)
+            & (det > 0)
+            & (boxes[:, 0] <= center_x)
+            & (center_x < boxes[:, 1])
+            & (boxes[:, 2] <= center_y)
+            & (center_y < boxes[:, 3])
+            & (0.5 * c / det <= np.square(boxes[:, 1] - boxes[:, 0]))
+            & (0.5 * a / det <= np.square(boxes[:, 3] - boxes[:, 2]))
+        )
+    return bool(np.all(is_inside))
+
+
+def _evaluate(
+    theta: npt.NDArray[np.float64],
+    boxes: npt.NDArray[np.intp],
+    origin: tuple[int, int],
+    shape: tuple[int, ...],
+    is_valid: npt.NDArray[np.bool_],
+) -> tuple[npt.NDArray[np.float64], list[npt.NDArray[np.float64]]]:
+    # model of the group, and the Jacobian of each component inside its box
+    model = np.zeros(shape)
+    jacobians = []
+    for (amp, center_x, center_y, a, dbl_b, c), (x0, x1, y0, y1) in zip(theta, boxes):
+        dx = np.arange(x0, x1) + origin[0] - center_x
+        dy = (np.arange(y0, y1) + origin[1] - center_y)[:, None]
+        with np.errstate(over="ignore", invalid="ignore"):
+            exp = np.exp(-(a * dx * dx + dbl_b * dx * dy + c * dy * dy))
+        component = amp * exp
+        model[y0:y1, x0:x1] += component
+
+        jacobian = np.stack(
+            [
+                exp,
+                component * (2 * a * dx + dbl_b * dy),
+                component * (dbl_b * dx + 2 * c * dy),
+                -component * dx * dx,
+                -component * dx * dy,
+                -component * dy * dy,
+            ]
+        )
+        jacobians.append(jacobian * is_valid[y0:y1, x0:x1])
+    return model, jacobians
+
+
+def _get_normal_equations(
+    jacobians: list[npt.NDArray[np.float64]],
+    residual: npt.NDArray[np.float64],
+    boxes: npt.NDArray[np.intp],
+    pairs: npt.NDArray[np.intp],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    num = len(jacobians)
+    jtj = np.zeros((6 * num, 6 * num))
+    jtr = np.zeros(6 * num)
+    for i, (jacobian, (x0, x1, y0, y1)) in enumerate(zip(jacobians, boxes)):
+        jtr[6 * i : 6 * i + 6] = (
+            jacobian.reshape(6, -1) @ residual[y0:y1, x0:x1].ravel()
+        )
+
+    # only components with overlapping boxes have cross terms
+    for i, j in pairs:
+        x0 = max(boxes[i, 0], boxes[j, 0])
+        x1 = min(boxes[i, 1], boxes[j, 1])
+        y0 = max(boxes[i, 2], boxes[j, 2])
+        y1 = min(boxes[i, 3], boxes[j, 3])
+        block_i = jacobians[i][
+            :, y0 - boxes[i, 2] : y1 - boxes[i, 2], x0 - boxes[i, 0] : x1 - boxes[i, 0]
+        ].reshape(6, -1)
+        block_j = jacobians[j][
+            :, y0 - boxes[j, 2] : y1 - boxes[j, 2], x0 - boxes[j, 0] : x1 - boxes[j, 0]
+        ].reshape(6, -1)
+        block = block_i @ block_j.T
+        jtj[6 * i : 6 * i + 6, 6 * j : 6 * j + 6] = block
+        jtj[6 * j : 6 * j + 6, 6 * i : 6 * i + 6] = block.T
+    return jtj, jtr
@@ -0,0 +1,183 @@
+from pathlib import Path
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+PARAMETER_FIELDS = ("amp", "center_x", "center_y", "fwhm_x", "fwhm_y", "pa")
+RESULT_DTYPE = np.dtype(
+    [(name, np.float64) for name in PARAMETER_FIELDS]
+    + [("pixel_num", np.int64), ("weight", np.float64)]
+)
+# column of ResultTable telling which appended result a row comes from
+IMAGE_INDEX_FIELD = "image_index"
+
+
+def to_records(
+    estimates: list[list[float]] | npt.NDArray[np.float64],
+    pixel_num: npt.NDArray[np.integer] | None = None,
+    weight: npt.NDArray[np.float64] | None = None,
+) -> npt.NDArray[np.void]:
+    """
+    Convert estimated parameters to a structured array with one record per component.
+
+    Parameters
+    ----------
+    estimates
+        List or array of shape (component number, 6) of estimated parameters for the Gaussian components: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+    pixel_num
+        Number of pixels of the cluster of each component. If None, the field is 0.
+    weight
+        Sum of the absolute data values of the cluster of each component. If None, the field is NaN.
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array of RESULT_DTYPE.
+    """
+
+    parameters = np.asarray(estimates, dtype=np.float64).reshape(-1, 6)
+    records = np.empty(len(parameters), dtype=RESULT_DTYPE)
+    for i, name in enumerate(PARAMETER_FIELDS):
+        records[name] = parameters[:, i]
+    records["pixel_num"] = 0 if pixel_num is None else pixel_num
+    records["weight"] = np.nan if weight is None else weight
+    return records
+
+
+class ResultTable:
+    """
+    Columnar table accumulating the estimates of many images.
+
+    Each field of RESULT_DTYPE and the image index are stored in a contiguous column that grows by doubling, so appending is amortized constant time per component and the columns can be exported to Arrow without copying.
+
+    Examples
+    --------
+    >>> table = ResultTable()
+    >>> for image in images:
+    ...     table.append(generator.estimate(image, 256, 256, None))
+    >>> table.write_parquet("estimates.parquet")
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """
+        Initialize an empty table.
+
+        Parameters
+        ----------
+        capacity
+            Number of rows allocated up front.
+        """
+        self.__num = 0
+        self.__image_num = 0
+        self.__columns: dict[str, npt.NDArray[Any]] = {
+            name: np.empty(capacity, dtype=RESULT_DTYPE[name])
+            for name in RESULT_DTYPE.names or ()
+        }
+        self.__columns[IMAGE_INDEX_FIELD] = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.__num
+
+    def append(self, estimates: list[list[float]] | npt.NDArray[np.void]) -> None:
+        """
+        Append the estimates of one image.
+
+        Parameters
+        ----------
+        estimates
+            Estimates from InitValGenerator.estimate, or a structured array of RESULT_DTYPE.
+        """
+
+        if not isinstance(estimates, np.ndarray):
+            estimates = to_records(
+                estimates,
+                getattr(estimates, "pixel_num", None),
+                getattr(estimates, "weight", None),
+            )
+
+        start = self.__num
+        stop = start + len(estimates)
+        capacity = len(self.__columns[IMAGE_INDEX_FIELD])
+        if stop > capacity:
+            capacity = max(stop, 2 * capacity)
+            for name, column in self.__columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:start] = column[:start]
+                self.__columns[name] = grown
+
+        for name in RESULT_DTYPE.names or ():
+            self.__columns[name][start:stop] = estimates[name]
+        self.__columns[IMAGE_INDEX_FIELD][start:stop] = self.__image_num
+        self.__num = stop
+        self.__image_num += 1
+
+    def get_column(self, name: str) -> npt.NDArray[Any]:
+        """
+        Get a column of the table.
+
+        Parameters
+        ----------
+        name
+            A field of RESULT_DTYPE, or "image_index".
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only view of the column, without the rows of later appends.
+        """
+
+        column = self.__columns[name][: self.__num]
+        column.flags.writeable = False
+        return column
+
+    def to_records(self) -> npt.NDArray[np.void]:
+        """
+        Copy the table to a structured array.
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array of RESULT_DTYPE with an additional image_index field.
+        """
+
+        dtype = np.dtype(RESULT_DTYPE.descr + [(IMAGE_INDEX_FIELD, np.int64)])
+        records = np.empty(self.__num, dtype=dtype)
+        for name in dtype.names or ():
+            records[name] = self.__columns[name][: self.__num]
+        return records
+
+    def to_arrow(self) -> Any:
+        """
+        Export the table to an Arrow table sharing the memory of the columns. Needs pyarrow.
+
+        Returns
+        -------
+        pyarrow.Table
+            The table, without the rows of later appends.
+        """
+
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise Exception("Exporting to Arrow needs pyarrow.")
+
+        return pa.table(
+            {name: pa.array(self.get_column(name)) for name in self.__columns}
+        )
+
+    def write_parquet(self, path: str | Path) -> None:
+        """
+        Write the table to a Parquet file. Needs pyarrow.
+
+        Parameters
+        ----------
+        path
+            Path of the Parquet file.
+        """
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Writing Parquet files needs pyarrow.")
+
+        pq.write_table(self.to_arrow(), path)
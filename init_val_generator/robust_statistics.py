@@ -0,0 +1,261 @@
+from typing import Callable, Sequence
+import math
+import numpy as np
+import numpy.typing as npt
+
+from .memory import iterate_chunks
+
+BIN_NUM = 1024
+# values gathered for an exact selection once the search range holds this few
+MAX_EXACT_NUM = 65536
+# chunks of this size keep the temporaries of a pass in cache
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+ChunkedData = npt.NDArray[np.float64] | Sequence[npt.NDArray[np.float64]]
+Transform = Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]]
+
+
+def _get_chunks(
+    data: ChunkedData, chunk_size: int | None
+) -> list[npt.NDArray[np.float64]]:
+    if isinstance(data, np.ndarray):
+        data = data.ravel()
+        return [
+            data[chunk]
+            for chunk in iterate_chunks(len(data), chunk_size or DEFAULT_CHUNK_SIZE)
+        ]
+    return [np.asarray(chunk).ravel() for chunk in data]
+
+
+def _get_values(
+    chunk: npt.NDArray[np.float64], transform: Transform | None
+) -> npt.NDArray[np.float64]:
+    return chunk if transform is None else transform(chunk)
+
+
+def _select_ranks(
+    chunks: list[npt.NDArray[np.float64]],
+    rank: int,
+    precision: float | None,
+    transform: Transform | None,
+) -> tuple[float, float]:
+    """
+    Select the values of rank and rank + 1 in ascending order.
+    """
+
+    low = min(
+        float(np.min(_get_values(chunk, transform))) for chunk in chunks if len(chunk)
+    )
+    high = max(
+        float(np.max(_get_values(chunk, transform))) for chunk in chunks if len(chunk)
+    )
+    if math.isnan(low) or math.isnan(high):
+        # NaN values propagate to the median, as in np.median
+        return math.nan, math.nan
+    if math.isinf(low) or math.isinf(high):
+        # the histogram needs a finite range, so infinite values are selected exactly
+        values = np.concatenate([_get_values(chunk, transform) for chunk in chunks])
+        values = np.partition(values, (rank, min(rank + 1, len(values) - 1)))
+        return float(values[rank]), float(values[min(rank + 1, len(values) - 1)])
+    high = math.nextafter(high, math.inf)
+
+    while True:
+        edges = np.linspace(low, high, BIN_NUM + 1)
+        # too narrow ranges have repeated edges, which are binned by search
+        scale = BIN_NUM / (high - low)
+        is_regular = math.isfinite(scale) and bool(np.all(edges[1:] > edges[:-1]))
+        below = 0
+        hist = np.zeros(BIN_NUM, dtype=np.int64)
+        for chunk in chunks:
+            values = _get_values(chunk, transform)
+            below += int(np.count_nonzero(values < low))
+            inside = values[(values >= low) & (values < high)]
+            if is_regular:
+                bin_index = np.minimum(
+                    ((inside - low) * scale).astype(np.intp), BIN_NUM - 1
+                )
+                # the bins are defined by the edges, so the next range holds exactly the counted values
+                bin_index -= inside < edges[bin_index]
+                bin_index += inside >= edges[bin_index + 1]
+            else:
+                bin_index = np.searchsorted(edges, inside, side="right") - 1
+            hist += np.bincount(bin_index, minlength=BIN_NUM)[:BIN_NUM]
+
+        cumsum = np.cumsum(hist)
+        if cumsum[-1] <= MAX_EXACT_NUM:
+            inside = np.concatenate(
+                [
+                    values[(values >= low) & (values < high)]
+                    for values in (_get_values(chunk, transform) for chunk in chunks)
+                ]
+            )
+            index = rank - below
+            if index + 1 < len(inside):
+                inside = np.partition(inside, (index, index + 1))
+                return float(inside[index]), float(inside[index + 1])
+            value = float(np.partition(inside, index)[index])
+            return value, _get_next_value(chunks, high, transform)
+
+        index = int(np.searchsorted(cumsum, rank - below, side="right"))
+        new_low = float(edges[index])
+        new_high = float(edges[index + 1])
+        if precision is not None and new_high - new_low <= precision:
+            value = (new_low + new_high) / 2
+            if rank + 1 - below < cumsum[index]:
+                return value, value
+            return value, _get_next_value(chunks, new_high, transform)
+        if new_low == low and new_high == high:
+            # the range can not be split further, so all values in it are equal
+            return low, _get_next_value(chunks, low, transform, rank + 1 - below)
+        low, high = new_low, new_high
+
+
+def _get_next_value(
+    chunks: list[npt.NDArray[np.float64]],
+    value: float,
+    transform: Transform | None,
+    equal_rank: int = 0,
+) -> float:
+    """
+    Get the value if more than equal_rank data points are equal to it, otherwise the smallest value above it.
+    """
+
+    equal_num = 0
+    next_value = math.inf
+    for chunk in chunks:
+        values = _get_values(chunk, transform)
+        equal_num += int(np.count_nonzero(values == value))
+        values = values[values > value]
+        if len(values):
+            next_value = min(next_value, float(np.min(values)))
+    return value if equal_num > equal_rank else next_value
+
+
+def approximate_median(
+    data: ChunkedData,
+    precision: float | None = None,
+    chunk_size: int | None = None,
+) -> float:
+    """
+    Calculate the median by narrowing down histograms of the data, in O(N) time with bounded memory.
+
+    Each pass over the data narrows the search range by the number of histogram bins. The search stops once the range is narrower than the precision, or holds few enough values to select the median exactly.
+
+    Parameters
+    ----------
+    data
+        The input data array, or a sequence of data chunks.
+    precision
+        Maximum width of the range containing the median. If None, the exact median is calculated.
+    chunk_size
+        Number of data points processed at once if the data is an array. If None, a default chunk size is used.
+
+    Returns
+    -------
+    float
+        The median of the data, or NaN if the data contains NaN values as with np.median.
+    """
+
+    return _get_median(_get_chunks(data, chunk_size), precision)
+
+
+def approximate_mad(
+    data: ChunkedData,
+    precision: float | None = None,
+    chunk_size: int | None = None,
+) -> float:
+    """
+    Calculate the median absolute deviation (MAD) by narrowing down histograms of the data, in O(N) time with bounded memory.
+
+    Parameters
+    ----------
+    data
+        The input data array, or a sequence of data chunks.
+    precision
+        Maximum width of the ranges containing the median and the MAD. If None, the exact MAD is calculated.
+    chunk_size
+        Number of data points processed at once if the data is an array. If None, a default chunk size is used.
+
+    Returns
+    -------
+    float
+        The median absolute deviation of the data, without scaling to the standard deviation, or NaN if the data contains NaN values.
+    """
+
+    chunks = _get_chunks(data, chunk_size)
+    median = _get_median(chunks, precision)
+
+    def get_deviation(chunk: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return np.abs(chunk - median)
+
+    return _get_median(chunks, precision, get_deviation)
+
+
+def _get_median(
+    chunks: list[npt.NDArray[np.float64]],
+    precision: float | None,
+    transform: Transform | None = None,
+) -> float:
+    num = sum(len(chunk) for chunk in chunks)
+    if num == 0:
+        return math.nan
+
+    median, next_value = _select_ranks(chunks, (num - 1) // 2, precision, transform)
+    if num % 2 == 0:
+        median = (median + next_value) / 2
+    return median
+
+
+def sigma_clipped_stats(
+    data: ChunkedData,
+    sigma: float = 3,
+    max_iter: int = 10,
+    chunk_size: int | None = None,
+) -> tuple[float, float]:
+    """
+    Estimate the background level and noise by iteratively excluding data points beyond sigma standard deviations.
+
+    Each iteration is one pass over the data accumulating the count, sum and sum of squares of the kept data points.
+
+    Parameters
+    ----------
+    data
+        The input data array, or a sequence of data chunks.
+    sigma
+        Number of standard deviations beyond which data points are excluded.
+    max_iter
+        Maximum number of iterations.
+    chunk_size
+        Number of data points processed at once if the data is an array. If None, a default chunk size is used.
+
+    Returns
+    -------
+    tuple
+        The mean and the standard deviation of the kept data points.
+    """
+
+    chunks = _get_chunks(data, chunk_size)
+    center = _get_median(chunks, None)
+    std = math.inf
+    prev_num = -1
+    for iter in range(max_iter):
+        num = 0
+        total = 0.0
+        sq_total = 0.0
+        for chunk in chunks:
+            # sums relative to the previous center avoid cancellation in the variance
+            deviation = chunk - center
+            kept = deviation[np.abs(deviation) <= sigma * std]
+            num += len(kept)
+            total += float(kept.sum())
+            sq_total += float(np.dot(kept, kept))
+
+        if num == 0:
+            break
+        mean = total / num
+        center, std = center + mean, math.sqrt(max(sq_total / num - mean * mean, 0))
+        if num == prev_num:
+            break
+        prev_num = num
+
+    return center, std
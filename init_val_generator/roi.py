@@ -0,0 +1,99 @@
+import numpy as np
+import numpy.typing as npt
+
+# bounding box as x start, y start, x stop and y stop, with exclusive stops
+Box = tuple[int, int, int, int]
+
+
+def get_region(
+    roi: Box | npt.ArrayLike, width: int, height: int
+) -> tuple[Box, npt.NDArray[np.bool_] | None]:
+    """
+    Get the bounding box and the pixel mask of a region of interest.
+
+    Parameters
+    ----------
+    roi
+        The region of interest: a bounding box (x start, y start, x stop, y stop) with exclusive stops, a polygon as an array of shape (vertex number, 2) with the x and y coordinates of its vertices, or a boolean mask of the image size.
+    width
+        Width of the image.
+    height
+        Height of the image.
+
+    Returns
+    -------
+    tuple
+        The bounding box of the region clipped to the image, and the mask of the pixels of the region inside the bounding box, or None if the region is the whole bounding box.
+    """
+
+    if isinstance(roi, np.ndarray) and roi.dtype == np.bool_:
+        mask = roi.reshape(height, width)
+        rows = np.flatnonzero(mask.any(axis=1))
+        columns = np.flatnonzero(mask.any(axis=0))
+        if len(rows) == 0:
+            raise Exception("The region of interest is empty.")
+        box = (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+        return box, mask[box[1] : box[3], box[0] : box[2]]
+
+    vertices = np.asarray(roi, dtype=np.float64)
+    if vertices.shape == (4,):
+        x0, y0, x1, y1 = vertices
+        box = _clip_box(int(x0), int(y0), int(x1), int(y1), width, height)
+        return box, None
+    elif vertices.ndim == 2 and vertices.shape[1] == 2 and len(vertices) >= 3:
+        # pixels are inside the polygon by their centers at integer coordinates
+        x0, y0 = np.ceil(vertices.min(axis=0))
+        x1, y1 = np.floor(vertices.max(axis=0)) + 1
+        box = _clip_box(int(x0), int(y0), int(x1), int(y1), width, height)
+        mask = rasterize_polygon(vertices, box)
+        if not mask.any():
+            raise Exception("The region of interest is empty.")
+        return box, mask
+    raise Exception("Invalid region of interest.")
+
+
+def rasterize_polygon(
+    vertices: npt.NDArray[np.float64], box: Box
+) -> npt.NDArray[np.bool_]:
+    """
+    Rasterize a polygon by the even-odd rule within a bounding box, one scanline per pixel row.
+
+    The crossings of all edges with all scanlines are computed at once, and each row is filled by counting the crossings left of each pixel, so the cost grows with the box area and the vertex number rather than with the image size.
+
+    Parameters
+    ----------
+    vertices
+        Array of shape (vertex number, 2) with the x and y coordinates of the vertices.
+    box
+        Bounding box (x start, y start, x stop, y stop) of the rasterized pixels.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask of shape (y stop - y start, x stop - x start) of the pixels whose centers are inside the polygon.
+    """
+
+    x0, y0, x1, y1 = box
+    start_x, start_y = vertices[:, 0], vertices[:, 1]
+    stop_x, stop_y = np.roll(start_x, -1), np.roll(start_y, -1)
+
+    y = np.arange(y0, y1, dtype=np.float64)[:, None]
+    # half-open in y, so a scanline through a vertex crosses only one of its edges
+    is_crossed = (start_y <= y) != (stop_y <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing_x = start_x + (y - start_y) * (stop_x - start_x) / (stop_y - start_y)
+    crossing_x = np.where(is_crossed, crossing_x, np.inf)
+    crossing_x.sort(axis=1)
+
+    x = np.arange(x0, x1, dtype=np.float64)
+    mask = np.empty((y1 - y0, x1 - x0), dtype=np.bool_)
+    for i, row_crossing_x in enumerate(crossing_x):
+        mask[i] = np.searchsorted(row_crossing_x, x, side="right") % 2 == 1
+    return mask
+
+
+def _clip_box(x0: int, y0: int, x1: int, y1: int, width: int, height: int) -> Box:
+    box = (max(x0, 0), max(y0, 0), min(x1, width), min(y1, height))
+    if box[2] <= box[0] or box[3] <= box[1]:
+        raise Exception("The region of interest is empty.")
+    return box
@@ -0,0 +1,189 @@
+import numpy as np
+import numpy.typing as npt
+
+# regions with fewer pixels are treated as noise
+MIN_REGION_SIZE = 5
+
+
+def label_points(
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    width: int,
+    connectivity: int = 8,
+) -> tuple[npt.NDArray[np.intp], int]:
+    """
+    Label the connected regions of a set of pixels without building a mask of the image.
+
+    The pixels are sorted by their raster index, the neighbors of each pixel are looked up by binary search, and the neighboring pixels are merged by a vectorized union-find with pointer jumping, so the cost grows with the number of pixels rather than with the image size.
+
+    Parameters
+    ----------
+    data_x
+        X coordinates of the pixels.
+    data_y
+        Y coordinates of the pixels.
+    width
+        Width of the image.
+    connectivity
+        4 to connect the horizontal and vertical neighbors, 8 to also connect the diagonal neighbors.
+
+    Returns
+    -------
+    tuple
+        Region labels of the pixels in raster order of the first pixel of each region, and the number of regions.
+    """
+
+    if connectivity not in (4, 8):
+        raise Exception("Invalid connectivity.")
+
+    x = np.asarray(data_x, dtype=np.int64)
+    key = np.asarray(data_y, dtype=np.int64) * width + x
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    x = x[order]
+    num = len(key)
+    if num == 0:
+        return np.empty(0, dtype=np.intp), 0
+
+    # repeated pixels are linked to each other, then each pixel to its neighbors in the next positions of the raster order
+    links_a = [np.flatnonzero(key[1:] == key[:-1])]
+    links_b = [links_a[0] + 1]
+    offsets = [(1, 0), (0, 1)]
+    if connectivity == 8:
+        offsets += [(-1, 1), (1, 1)]
+    for dx, dy in offsets:
+        neighbor_key = key + dy * width + dx
+        neighbor = np.minimum(np.searchsorted(key, neighbor_key), num - 1)
+        is_linked = (key[neighbor] == neighbor_key) & (x + dx >= 0) & (x + dx < width)
+        links_a.append(np.flatnonzero(is_linked))
+        links_b.append(neighbor[is_linked])
+    parent = _merge_links(num, np.concatenate(links_a), np.concatenate(links_b))
+
+    _, sorted_labels = np.unique(parent, return_inverse=True)
+    labels = np.empty(num, dtype=np.intp)
+    labels[order] = sorted_labels
+    return labels, int(sorted_labels.max()) + 1
+
+
+def lookup_labels(
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    labels: npt.NDArray[np.intp],
+    width: int,
+    query_x: npt.NDArray[np.signedinteger],
+    query_y: npt.NDArray[np.signedinteger],
+) -> npt.NDArray[np.intp]:
+    """
+    Look up the labels of pixels in a labeled set of pixels, such as the pixels of another data selection in the regions of segment.
+
+    Parameters
+    ----------
+    data_x
+        X coordinates of the labeled pixels.
+    data_y
+        Y coordinates of the labeled pixels.
+    labels
+        Labels of the labeled pixels.
+    width
+        Width of the image.
+    query_x
+        X coordinates of the looked up pixels.
+    query_y
+        Y coordinates of the looked up pixels.
+
+    Returns
+    -------
+    numpy.ndarray
+        Labels of the looked up pixels, -1 for pixels not in the labeled set.
+    """
+
+    key = np.asarray(data_y, dtype=np.int64) * width + data_x
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    query_labels = np.full(len(query_x), -1, dtype=np.intp)
+    if len(key) == 0:
+        return query_labels
+
+    query_key = np.asarray(query_y, dtype=np.int64) * width + query_x
+    position = np.minimum(np.searchsorted(key, query_key), len(key) - 1)
+    is_found = key[position] == query_key
+    query_labels[is_found] = labels[order[position[is_found]]]
+    return query_labels
+
+
+def _merge_links(
+    num: int, a: npt.NDArray[np.intp], b: npt.NDArray[np.intp]
+) -> npt.NDArray[np.intp]:
+    # every element points to an element of smaller index, so hooking never creates cycles
+    parent = np.arange(num)
+    while True:
+        root_a = parent[a]
+        root_b = parent[b]
+        unmerged = root_a != root_b
+        if not np.any(unmerged):
+            break
+        root_a = root_a[unmerged]
+        root_b = root_b[unmerged]
+        low = np.minimum(root_a, root_b)
+        np.minimum.at(parent, root_a, low)
+        np.minimum.at(parent, root_b, low)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return parent
+
+
+def segment(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    width: int,
+    height: int,
+    max_num: int | None = None,
+    min_size: int = MIN_REGION_SIZE,
+    connectivity: int = 8,
+) -> tuple[npt.NDArray[np.intp], int]:
+    """
+    Segment the selected data points into connected regions.
+
+    Parameters
+    ----------
+    data
+        The selected data points, such as the data points not excluded by filter_data.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    width
+        Width of the data array.
+    height
+        Height of the data array.
+    max_num
+        Maximum number of regions. If not None, only the regions with the largest absolute flux are kept.
+    min_size
+        Minimum number of pixels of a region.
+    connectivity
+        4 or 8 connected neighbors.
+
+    Returns
+    -------
+    tuple
+        Region indices of the data points, ordered by decreasing absolute flux, -1 for data points not in a region, and the number of regions.
+    """
+
+    labels, num = label_points(data_x, data_y, width, connectivity)
+    if num == 0:
+        return labels, 0
+
+    size = np.bincount(labels, minlength=num)
+    flux = np.bincount(labels, weights=np.abs(data), minlength=num)
+    order = np.argsort(-flux, kind="stable")
+    order = order[size[order] >= min_size]
+    if max_num is not None:
+        order = order[:max_num]
+
+    region_index = np.full(num, -1, dtype=np.intp)
+    region_index[order] = np.arange(len(order))
+    return region_index[labels], len(order)
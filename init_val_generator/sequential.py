@@ -0,0 +1,290 @@
+import threading
+import numpy as np
+import numpy.typing as npt
+
+from .init_val_generator import Estimates, InitValGenerator
+from .cluster_validity import (
+    ClusteringCriterion,
+    get_criterion_score,
+    is_score_accepted,
+)
+from .deadline import Deadline
+from .workspace import Workspace
+
+
+class SequentialEstimator:
+    """
+    Estimates Gaussian components of consecutive image planes, such as the channels of a spectral cube or the steps of a time series.
+
+    Each plane is clustered starting from the component centers of the previous plane instead of the k-means++ initialization, and the search for the number of components is skipped while the previous number is still accepted by the rule of the search. A single component stays warm started only while a split into two components is rejected. A full estimation is done for the first plane, after a change of the plane size, and whenever a center moves by more than the maximum shift or the number of components is not accepted.
+
+    Attributes
+    ----------
+    generator
+        The generator providing the data selection and the clustering criterion. Refinement, the residual threshold and bootstrap are not supported.
+    n
+        Number of components. If None, the optimal number is estimated.
+    max_shift
+        Maximum center shift in pixels between consecutive planes for a warm start.
+    warm_started
+        Whether the last estimated plane was warm started from the previous plane.
+    plane_num
+        Number of planes estimated since the initialization or the last reset.
+    warm_start_num
+        Number of these planes that were warm started from the previous plane.
+
+    Examples
+    --------
+    >>> estimator = SequentialEstimator(InitValGenerator("3-sigma", "3-sigma"), n=None)
+    >>> estimates = [estimator.estimate(plane, width, height) for plane in cube]
+    """
+
+    def __init__(
+        self,
+        generator: InitValGenerator | None = None,
+        n: int | None = None,
+        max_shift: float = 2.0,
+    ) -> None:
+        """
+        Initialize the SequentialEstimator.
+
+        Parameters
+        ----------
+        generator
+            The generator providing the data selection and the clustering criterion. If None, a generator with default settings is used.
+        n
+            Number of components. If None, the optimal number is estimated.
+        max_shift
+            Maximum center shift in pixels between consecutive planes for a warm start.
+        """
+        self.generator = generator if generator is not None else InitValGenerator()
+        self.n = n
+        self.max_shift = max_shift
+        if (
+            self.generator.refine_iterations > 0
+            or self.generator.residual_threshold is not None
+            or self.generator.bootstrap_replicates
+        ):
+            raise Exception(
+                "Refinement, the residual threshold and bootstrap are not supported for sequential estimation."
+            )
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget the previous planes, so the next plane is fully estimated and the plane counts start from zero.
+        """
+        self.__center_x: npt.NDArray[np.float64] | None = None
+        self.__center_y: npt.NDArray[np.float64] | None = None
+        self.__shape: tuple[int, int] | None = None
+        self.warm_started = False
+        self.plane_num = 0
+        self.warm_start_num = 0
+
+    def estimate(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        workspace: Workspace | None = None,
+        time_budget: float | None = None,
+        cancel_event: threading.Event | None = None,
+    ) -> Estimates:
+        """
+        Estimates Gaussian components of the next plane.
+
+        Parameters
+        ----------
+        data
+            The input data array of the plane.
+        width
+            Width of the data array.
+        height
+            Height of the data array.
+        workspace
+            Workspace of the plane size providing preallocated buffers to the stages. If None, the buffers are allocated for each plane.
+        time_budget
+            Time budget of the plane in seconds, shared by the warm start and the full estimation it falls back to. If None, the time is not limited.
+        cancel_event
+            Event that cancels the estimation in the same way as a used up time budget when set from another thread.
+
+        Returns
+        -------
+        Estimates
+            List of estimated parameters for the Gaussian components. The estimated parameters are: amplitude, center x, center y, FWHM x, FWHM y, and position angle. Its truncated attribute tells if the estimation was cut short.
+        """
+
+        if workspace is not None and (workspace.width, workspace.height) != (
+            width,
+            height,
+        ):
+            raise Exception("The workspace does not match the image size.")
+
+        deadline = None
+        if time_budget is not None or cancel_event is not None:
+            deadline = Deadline(time_budget, cancel_event)
+        with self.generator._estimation_context(workspace, deadline) as context:
+            data_x, data_y = self.generator._get_coordinates(width, height)
+
+            estimates = None
+            if (
+                self.__center_x is not None
+                and self.__center_y is not None
+                and self.__shape == (width, height)
+            ):
+                estimates = self.__warm_estimate(
+                    data,
+                    width,
+                    height,
+                    data_x,
+                    data_y,
+                    self.__center_x,
+                    self.__center_y,
+                )
+
+            self.warm_started = estimates is not None
+            self.plane_num += 1
+            self.warm_start_num += self.warm_started
+            if estimates is None:
+                estimates = self.generator._estimate_components(
+                    data, width, height, self.n, data_x, data_y, True
+                )
+
+        centers = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+        self.__center_x = centers[:, 1]
+        self.__center_y = centers[:, 2]
+        self.__shape = (width, height)
+        estimates.truncated = deadline is not None and deadline.truncated
+        estimates.restarts = context.restarts.get(len(estimates))
+        return estimates
+
+    def __warm_estimate(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        prev_center_x: npt.NDArray[np.float64],
+        prev_center_y: npt.NDArray[np.float64],
+    ) -> Estimates | None:
+        generator = self.generator
+
+        if len(prev_center_x) == 1:
+            if self.n is None and self.__is_split_found(
+                data, width, height, data_x, data_y
+            ):
+                return None
+            estimates = generator._estimate_single_component(
+                data, width, height, data_x, data_y
+            )
+        else:
+            clustering_data, clustering_data_x, clustering_data_y = (
+                generator._select_clustering_data(data, width, height, data_x, data_y)
+            )
+            data_cluster_index, centroid_x, centroid_y = generator._cluster(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                len(prev_center_x),
+                prev_center_x,
+                prev_center_y,
+            )
+            if self.n is None and not self.__is_accepted(
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                data_cluster_index,
+                centroid_x,
+                centroid_y,
+            ):
+                return None
+            estimates = generator._estimate_from_centroids(
+                data, width, height, data_x, data_y, centroid_x, centroid_y
+            )
+
+        centers = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+        if len(centers) != len(prev_center_x):
+            return None
+        shift = np.sqrt(
+            np.square(centers[:, 1] - prev_center_x)
+            + np.square(centers[:, 2] - prev_center_y)
+        )
+        if not np.all(shift <= self.max_shift):
+            return None
+        return estimates
+
+    def __is_split_found(
+        self,
+        data: npt.NDArray[np.float64],
+        width: int,
+        height: int,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+    ) -> bool:
+        # a new component of a single-component plane shows as an accepted split into two
+        clustering_data, clustering_data_x, clustering_data_y = (
+            self.generator._select_clustering_data(data, width, height, data_x, data_y)
+        )
+        if len(clustering_data) < 2 or self.generator.max_components < 2:
+            return False
+        data_cluster_index, centroid_x, centroid_y = self.generator._cluster(
+            clustering_data, clustering_data_x, clustering_data_y, 2
+        )
+        return self.__is_accepted(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            data_cluster_index,
+            centroid_x,
+            centroid_y,
+        )
+
+    def __is_accepted(
+        self,
+        clustering_data: npt.NDArray[np.float64],
+        clustering_data_x: npt.NDArray[np.signedinteger],
+        clustering_data_y: npt.NDArray[np.signedinteger],
+        data_cluster_index: npt.NDArray[np.intp],
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+    ) -> bool:
+        # the acceptance rule of the component search over a single component
+        generator = self.generator
+        chunk_size = generator._get_chunk_size(len(clustering_data))
+        score = get_criterion_score(
+            generator.criterion,
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            centroid_x,
+            centroid_y,
+            data_cluster_index,
+            chunk_size,
+            workspace=generator._get_workspace(),
+        )
+        single_component_score = None
+        if generator.criterion == ClusteringCriterion.BIC:
+            single_component_score = get_criterion_score(
+                generator.criterion,
+                clustering_data,
+                clustering_data_x,
+                clustering_data_y,
+                centroid_x[:1],
+                centroid_y[:1],
+                np.zeros(len(clustering_data), dtype=np.intp),
+                chunk_size,
+                workspace=generator._get_workspace(),
+            )
+        return is_score_accepted(
+            generator.criterion,
+            score,
+            generator.criterion_threshold,
+            single_component_score,
+        ) and generator._is_split_accepted(
+            clustering_data,
+            clustering_data_x,
+            clustering_data_y,
+            centroid_x,
+            centroid_y,
+        )
@@ -0,0 +1,172 @@
+import numpy as np
+import numpy.typing as npt
+
+from .memory import iterate_chunks
+
+# slack of the candidate test against rounding of the cell distances
+CANDIDATE_TOLERANCE = 1e-9
+
+
+class CentroidGrid:
+    """
+    Uniform grid over the data points listing the centroids that can be the nearest centroid of a point in each cell.
+
+    The cell size is chosen so that a cell holds about one centroid. A centroid is a candidate of a cell if its smallest distance to the cell is not larger than the largest distance from the cell to the centroid closest to it, so the nearest centroid of every point in the cell is a candidate. Assigning the points then costs a few distance evaluations per point instead of one per centroid.
+
+    Attributes
+    ----------
+    candidates
+        Array of shape (cell number, maximum candidate number) with the candidate centroid indices of each cell in ascending order, padded with -1.
+    """
+
+    def __init__(
+        self,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+        centroid_x: npt.NDArray[np.float64],
+        centroid_y: npt.NDArray[np.float64],
+    ) -> None:
+        """
+        Build the grid.
+
+        Parameters
+        ----------
+        data_x
+            X coordinates of data points.
+        data_y
+            Y coordinates of data points.
+        centroid_x
+            X coordinates of centroids, all finite.
+        centroid_y
+            Y coordinates of centroids, all finite.
+        """
+        self.__x0 = float(np.min(data_x))
+        self.__y0 = float(np.min(data_y))
+        extent_x = float(np.max(data_x)) - self.__x0 + 1
+        extent_y = float(np.max(data_y)) - self.__y0 + 1
+        self.__cell_size = max(np.sqrt(extent_x * extent_y / len(centroid_x)), 1.0)
+        self.__grid_width = int(np.ceil(extent_x / self.__cell_size))
+        grid_height = int(np.ceil(extent_y / self.__cell_size))
+
+        cell_x0 = self.__x0 + self.__cell_size * np.tile(
+            np.arange(self.__grid_width), grid_height
+        )
+        cell_y0 = self.__y0 + self.__cell_size * np.repeat(
+            np.arange(grid_height), self.__grid_width
+        )
+        cell_x1 = cell_x0 + self.__cell_size
+        cell_y1 = cell_y0 + self.__cell_size
+
+        # smallest and largest distance between each cell and each centroid
+        near_x = np.maximum(
+            np.maximum(cell_x0[:, None] - centroid_x, centroid_x - cell_x1[:, None]), 0
+        )
+        near_y = np.maximum(
+            np.maximum(cell_y0[:, None] - centroid_y, centroid_y - cell_y1[:, None]), 0
+        )
+        far_x = np.maximum(
+            np.abs(cell_x0[:, None] - centroid_x), np.abs(centroid_x - cell_x1[:, None])
+        )
+        far_y = np.maximum(
+            np.abs(cell_y0[:, None] - centroid_y), np.abs(centroid_y - cell_y1[:, None])
+        )
+        min_dist = np.sqrt(np.square(near_x) + np.square(near_y))
+        upper = np.sqrt(np.square(far_x) + np.square(far_y)).min(axis=1)
+        is_candidate = min_dist <= upper[:, None] * (1 + CANDIDATE_TOLERANCE)
+
+        # the stable sort keeps the candidates in ascending order of the centroid index
+        candidate_num = int(is_candidate.sum(axis=1).max())
+        order = np.argsort(~is_candidate, axis=1, kind="stable")[:, :candidate_num]
+        self.candidates = np.where(
+            np.take_along_axis(is_candidate, order, axis=1), order, -1
+        )
+
+    def get_cell_index(
+        self,
+        data_x: npt.NDArray[np.signedinteger],
+        data_y: npt.NDArray[np.signedinteger],
+    ) -> npt.NDArray[np.intp]:
+        """
+        Get the cell of each data point.
+
+        Parameters
+        ----------
+        data_x
+            X coordinates of data points.
+        data_y
+            Y coordinates of data points.
+
+        Returns
+        -------
+        numpy.ndarray
+            Cell indices for each data point.
+        """
+
+        cell_x = ((data_x - self.__x0) // self.__cell_size).astype(np.intp)
+        cell_y = ((data_y - self.__y0) // self.__cell_size).astype(np.intp)
+        return cell_y * self.__grid_width + cell_x
+
+
+def assign_clusters_with_grid(
+    data: npt.NDArray[np.float64],
+    data_x: npt.NDArray[np.signedinteger],
+    data_y: npt.NDArray[np.signedinteger],
+    centroid_x: npt.NDArray[np.float64],
+    centroid_y: npt.NDArray[np.float64],
+    chunk_size: int | None = None,
+    out: npt.NDArray[np.intp] | None = None,
+) -> npt.NDArray[np.intp]:
+    """
+    Assign each data point to the nearest centroid, weighted by the absolute data value, using a centroid grid.
+
+    The labels are the same as from assign_clusters for finite centroids: only the candidates of the cell of a data point are compared, with the same weighted distance and the first minimum winning. Data points with zero or NaN weight are assigned to the first centroid.
+
+    Parameters
+    ----------
+    data
+        The input data array.
+    data_x
+        X coordinates of data points.
+    data_y
+        Y coordinates of data points.
+    centroid_x
+        X coordinates of centroids, all finite.
+    centroid_y
+        Y coordinates of centroids, all finite.
+    chunk_size
+        Number of data points processed at once. If None, all data points are processed at once.
+    out
+        Array receiving the cluster indices. If None, a new array is allocated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Cluster indices for each data point.
+    """
+
+    data_cluster_index = np.empty(len(data), dtype=np.intp) if out is None else out
+    if len(data) == 0:
+        return data_cluster_index
+
+    grid = CentroidGrid(data_x, data_y, centroid_x, centroid_y)
+    for chunk in iterate_chunks(len(data), chunk_size):
+        candidates = grid.candidates[grid.get_cell_index(data_x[chunk], data_y[chunk])]
+        is_padding = candidates < 0
+        candidates[is_padding] = 0
+
+        weight = np.abs(data[chunk])
+        dist = np.sqrt(
+            np.square(data_x[chunk, None] - centroid_x[candidates])
+            + np.square(data_y[chunk, None] - centroid_y[candidates])
+        )
+        dist = np.multiply(weight[:, None], dist, out=dist)
+        dist[is_padding] = np.inf
+
+        nearest = np.take_along_axis(
+            candidates, np.argmin(dist, axis=1)[:, None], axis=1
+        )[:, 0]
+        # every distance ties at zero weight and is NaN at NaN weight
+        nearest[~(weight > 0)] = 0
+        data_cluster_index[chunk] = nearest
+
+    return data_cluster_index
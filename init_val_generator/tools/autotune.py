@@ -0,0 +1,294 @@
+from dataclasses import dataclass
+import itertools
+import time
+import numpy as np
+import numpy.typing as npt
+
+from ..init_val_generator import ComponentSearch, InitValGenerator
+from ..data_selection import SelectionMethod
+from ..cluster_validity import ClusteringCriterion
+from ..profile import Profile
+from .dataset_factory import generate_dataset
+
+
+@dataclass
+class TuningResult:
+    """
+    Accuracy and runtime of a configuration on the images of a size class.
+
+    Attributes
+    ----------
+    size_class
+        Name of the size class, "<width>x<height>".
+    data_selection
+        Method for selecting data for parameter estimation, or None for no selection.
+    clustering_data_selection
+        Method for selecting data for clustering, or None for no selection.
+    criterion
+        Cluster validity criterion for estimating the number of components.
+    error
+        Mean parameter error over the images, see get_parameter_error.
+    runtime
+        Mean runtime of an estimation in seconds.
+    component_search
+        Method for searching the number of components.
+    """
+
+    size_class: str
+    data_selection: SelectionMethod | None
+    clustering_data_selection: SelectionMethod | None
+    criterion: ClusteringCriterion
+    error: float
+    runtime: float
+    component_search: ComponentSearch = ComponentSearch.SWEEP
+
+
+def get_parameter_error(
+    estimates: list[list[float]], model_components: list[list[float]]
+) -> float:
+    """
+    Measure the error of estimated Gaussian components against the ground truth.
+
+    Each model component is matched with the nearest estimated center. The center error is the distance in units of the geometric mean FWHM of the model component, capped at 1 for a missed component. A component with a center error below 1 also adds its amplitude error relative to the model amplitude, the mean relative error of its major and minor FWHM, and the difference of the position angles of the major axes modulo 180 degrees in units of 90 degrees, weighted by the ellipticity of the model component since the position angle of a round component is arbitrary. Each of these terms is capped at 1. Every extra or missing estimated component adds 1.
+
+    Parameters
+    ----------
+    estimates
+        List of estimated parameters for the Gaussian components.
+    model_components
+        List of ground-truth parameters for the Gaussian components.
+
+    Returns
+    -------
+    float
+        The error per model component.
+    """
+
+    model = np.array(model_components, dtype=np.float64).reshape(-1, 6)
+    estimated = np.array(estimates, dtype=np.float64).reshape(-1, 6)
+    if len(estimated) == 0:
+        return float(len(model))
+
+    distance = np.sqrt(
+        np.square(model[:, 1, None] - estimated[None, :, 1])
+        + np.square(model[:, 2, None] - estimated[None, :, 2])
+    )
+    nearest = np.argmin(np.nan_to_num(distance, nan=np.inf), axis=1)
+    scale = np.sqrt(np.abs(model[:, 3] * model[:, 4]))
+    center_error = np.minimum(
+        np.nan_to_num(distance[np.arange(len(model)), nearest] / scale, nan=1), 1
+    )
+
+    matched = estimated[nearest]
+    model_major, model_minor, model_pa = _get_axes(model)
+    major, minor, pa = _get_axes(matched)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amp_error = np.abs(matched[:, 0] - model[:, 0]) / np.abs(model[:, 0])
+        fwhm_error = (
+            np.abs(major - model_major) / model_major
+            + np.abs(minor - model_minor) / model_minor
+        ) / 2
+        pa_error = (
+            np.abs((pa - model_pa + 90) % 180 - 90)
+            / 90
+            * (1 - model_minor / model_major)
+        )
+    shape_error = sum(
+        np.minimum(np.nan_to_num(error, nan=1), 1)
+        for error in (amp_error, fwhm_error, pa_error)
+    )
+    component_error = center_error + np.where(center_error < 1, shape_error, 0)
+    return float(
+        (component_error.sum() + abs(len(estimated) - len(model))) / len(model)
+    )
+
+
+def _get_axes(
+    params: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    # the major FWHM, the minor FWHM and the position angle of the major axis
+    fwhm_x = np.abs(params[:, 3])
+    fwhm_y = np.abs(params[:, 4])
+    is_x_major = fwhm_x >= fwhm_y
+    major = np.where(is_x_major, fwhm_x, fwhm_y)
+    minor = np.where(is_x_major, fwhm_y, fwhm_x)
+    pa = np.where(is_x_major, params[:, 5], params[:, 5] + 90)
+    return major, minor, pa
+
+
+def get_pareto_front(results: list[TuningResult]) -> list[TuningResult]:
+    """
+    Get the results not dominated by a faster and more accurate result.
+
+    Parameters
+    ----------
+    results
+        Tuning results of one size class.
+
+    Returns
+    -------
+    list[TuningResult]
+        The Pareto front, sorted by runtime.
+    """
+
+    front: list[TuningResult] = []
+    for result in sorted(results, key=lambda result: (result.runtime, result.error)):
+        if len(front) == 0 or result.error < front[-1].error:
+            front.append(result)
+    return front
+
+
+def recommend(
+    results: list[TuningResult], error_tolerance: float = 0.1
+) -> TuningResult:
+    """
+    Recommend the fastest result whose error is within the tolerance of the smallest error.
+
+    Parameters
+    ----------
+    results
+        Tuning results of one size class.
+    error_tolerance
+        Accepted error above the smallest error, in the units of get_parameter_error.
+
+    Returns
+    -------
+    TuningResult
+        The recommended result.
+    """
+
+    front = get_pareto_front(results)
+    min_error = min(result.error for result in front)
+    return next(
+        result for result in front if result.error <= min_error + error_tolerance
+    )
+
+
+def autotune(
+    sizes: list[tuple[int, int]],
+    image_num: int = 8,
+    n: int | None = None,
+    noise: float | None = 0.1,
+    random_seed: int | None = 0,
+    data_selections: list[SelectionMethod | None] | None = None,
+    clustering_data_selections: list[SelectionMethod | None] | None = None,
+    criteria: list[ClusteringCriterion] | None = None,
+    component_searches: list[ComponentSearch] | None = None,
+    error_tolerance: float = 0.1,
+    plot_mode: str = "none",
+) -> tuple[dict[str, list[TuningResult]], Profile]:
+    """
+    Benchmark candidate configurations on seeded synthetic images and recommend a configuration per image size.
+
+    Every combination of the data selection methods, clustering criteria and component searches is run with an estimated component number on the same images, generated by the dataset factory. Each image size is a size class holding the images up to its pixel number, the largest size class holds all larger images.
+
+    Parameters
+    ----------
+    sizes
+        Widths and heights of the benchmark images.
+    image_num
+        Number of images per size.
+    n
+        Number of Gaussian components per image. If None, a random value between 1 and 5 is used for each image.
+    noise
+        The standard deviation of the noise distribution.
+    random_seed
+        Seed of the synthetic images.
+    data_selections
+        Candidate methods for selecting data for parameter estimation, where None is no selection. If None, all methods and no selection are tried.
+    clustering_data_selections
+        Candidate methods for selecting data for clustering, where None is no selection. If None, all methods and no selection are tried.
+    criteria
+        Candidate cluster validity criteria. If None, all criteria are tried.
+    component_searches
+        Candidate methods for searching the number of components. If None, all methods are tried.
+    error_tolerance
+        Accepted error above the smallest error of a size class for the recommendation.
+    plot_mode
+        Plotting mode. 'none' for no output, 'all' for printing the progress.
+
+    Returns
+    -------
+    tuple
+        The tuning results per size class, and the tuning profile with the recommended configuration of each size class.
+    """
+
+    data_selections = data_selections or [None, *SelectionMethod]
+    clustering_data_selections = clustering_data_selections or [
+        None,
+        *SelectionMethod,
+    ]
+    criteria = criteria or list(ClusteringCriterion)
+    component_searches = component_searches or list(ComponentSearch)
+
+    results: dict[str, list[TuningResult]] = {}
+    size_classes = []
+    sizes = sorted(sizes, key=lambda size: size[0] * size[1])
+    for i, (width, height) in enumerate(sizes):
+        size_class = "{}x{}".format(width, height)
+        dataset = generate_dataset(
+            None, image_num, width, height, n, noise, random_seed
+        )
+
+        results[size_class] = []
+        for (
+            data_selection,
+            clustering_data_selection,
+            criterion,
+            component_search,
+        ) in itertools.product(
+            data_selections, clustering_data_selections, criteria, component_searches
+        ):
+            generator = InitValGenerator(
+                data_selection,
+                clustering_data_selection,
+                criterion=criterion,
+                component_search=component_search,
+            )
+            errors = []
+            runtime = 0.0
+            for j in range(image_num):
+                start = time.perf_counter()
+                estimates = generator.estimate(
+                    dataset.get_image(j), width, height, None
+                )
+                runtime += time.perf_counter() - start
+                errors.append(
+                    get_parameter_error(estimates, dataset.get_model_components(j))
+                )
+
+            result = TuningResult(
+                size_class,
+                data_selection,
+                clustering_data_selection,
+                criterion,
+                float(np.mean(errors)),
+                runtime / image_num,
+                component_search,
+            )
+            results[size_class].append(result)
+            if plot_mode == "all":
+                print(result)
+
+        best = recommend(results[size_class], error_tolerance)
+        size_classes.append(
+            {
+                "name": size_class,
+                "max_pixels": width * height if i < len(sizes) - 1 else None,
+                "data_selection": _to_setting(best.data_selection),
+                "clustering_data_selection": _to_setting(
+                    best.clustering_data_selection
+                ),
+                "criterion": str(best.criterion),
+                "component_search": str(best.component_search),
+                "error": best.error,
+                "runtime": best.runtime,
+            }
+        )
+
+    return results, {"size_classes": size_classes}
+
+
+def _to_setting(selection: SelectionMethod | None) -> str | None:
+    # no selection is stored as null in the JSON profile
+    return None if selection is None else str(selection)
@@ -0,0 +1,256 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+import numpy as np
+import numpy.typing as npt
+
+from .gaussian_image import get_gaussian_component
+
+# columns of the ground-truth table: image index and the Gaussian parameters
+COMPONENT_COLUMN_NUM = 7
+COMPONENT_SUFFIX = ".components.npy"
+
+
+@dataclass
+class SyntheticDataset:
+    """
+    Synthetic images with the ground truth of their Gaussian components.
+
+    Attributes
+    ----------
+    data
+        Array of shape (image number, height, width), memory mapped if loaded from a .npy file.
+    components
+        Array of shape (component number, 7) with the image index, amplitude, center x, center y, FWHM x, FWHM y, and position angle of each component.
+    """
+
+    data: npt.NDArray[np.float64]
+    components: npt.NDArray[np.float64]
+
+    @property
+    def width(self) -> int:
+        return self.data.shape[2]
+
+    @property
+    def height(self) -> int:
+        return self.data.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get_image(self, index: int) -> npt.NDArray[np.float64]:
+        """
+        Get the flattened data array of an image, as expected by InitValGenerator.estimate.
+
+        Parameters
+        ----------
+        index
+            Index of the image.
+
+        Returns
+        -------
+        numpy.ndarray
+            The data array of the image.
+        """
+        return self.data[index].ravel()
+
+    def get_model_components(self, index: int) -> list[list[float]]:
+        """
+        Get the ground-truth Gaussian parameters of an image.
+
+        Parameters
+        ----------
+        index
+            Index of the image.
+
+        Returns
+        -------
+        list[list[float]]
+            List of Gaussian parameters in the same format as GaussianImage.model_components.
+        """
+        rows = self.components[self.components[:, 0] == index]
+        return rows[:, 1:].tolist()
+
+
+def get_random_parameters(
+    rng: np.random.Generator, width: int, height: int
+) -> list[float]:
+    """
+    Draw the parameters of a Gaussian component from the same distributions as GaussianImage.
+
+    Parameters
+    ----------
+    rng
+        The random number generator.
+    width
+        Width of the image.
+    height
+        Height of the image.
+
+    Returns
+    -------
+    list
+        List of random parameters for a Gaussian component.
+    """
+    amp = rng.uniform(0.4, 1) * rng.choice([1, 1, -1])
+    center_x = rng.uniform(width * 0.25, width * 0.75)
+    center_y = rng.uniform(height * 0.25, height * 0.75)
+    fwhm_x = rng.uniform(width * 0.01, width * 0.2)
+    fwhm_y = rng.uniform(height * 0.01, height * 0.2)
+    pa = rng.uniform(0, 360)
+    return [float(amp), center_x, center_y, fwhm_x, fwhm_y, pa]
+
+
+def generate_image(
+    out: npt.NDArray[np.float64],
+    rng: np.random.Generator,
+    n: int | None = None,
+    noise: float | None = 0.1,
+) -> list[list[float]]:
+    """
+    Generate a synthetic image with random Gaussian components in place.
+
+    Parameters
+    ----------
+    out
+        Array of shape (height, width) receiving the image.
+    rng
+        The random number generator of the image.
+    n
+        Number of Gaussian components. If None, a random value between 1 and 5 is used.
+    noise
+        The standard deviation of the noise distribution. If None or 0, no noise is added.
+
+    Returns
+    -------
+    list[list[float]]
+        List of Gaussian parameters of the components.
+    """
+    height, width = out.shape
+    x = np.arange(width)
+    y = np.arange(height)
+
+    component_num = int(rng.integers(1, 6)) if n is None else n
+    params = [get_random_parameters(rng, width, height) for _ in range(component_num)]
+
+    image = np.zeros(width * height)
+    for param in params:
+        image += get_gaussian_component(x, y, param)
+    if noise:
+        image += rng.normal(0.0, noise, width * height)
+
+    out[:] = image.reshape(height, width)
+    return params
+
+
+def generate_dataset(
+    path: str | Path | None,
+    num: int,
+    width: int,
+    height: int,
+    n: int | None = None,
+    noise: float | None = 0.1,
+    random_seed: int | None = None,
+    n_jobs: int | None = None,
+) -> SyntheticDataset:
+    """
+    Generate synthetic images in parallel, each from an independent random stream.
+
+    The streams are spawned from one seed sequence, so the dataset is reproducible for a seed regardless of the number of workers. A .npy path is written as a memory-mapped array with the ground truth in a .components.npy file next to it, an .npz path as an archive with "data" and "components" arrays.
+
+    Parameters
+    ----------
+    path
+        Path of the .npy or .npz output file. If None, the dataset is kept in memory.
+    num
+        Number of images.
+    width
+        Width of the images.
+    height
+        Height of the images.
+    n
+        Number of Gaussian components per image. If None, a random value between 1 and 5 is used for each image.
+    noise
+        The standard deviation of the noise distribution. If None or 0, no noise is added.
+    random_seed
+        Seed of the random streams.
+    n_jobs
+        Number of parallel workers. If None, the default of ThreadPoolExecutor is used.
+
+    Returns
+    -------
+    SyntheticDataset
+        The generated dataset.
+    """
+
+    path = Path(path) if path is not None else None
+    if path is not None and path.suffix not in (".npy", ".npz"):
+        raise Exception("Dataset files must be .npy or .npz files.")
+
+    shape = (num, height, width)
+    data: np.memmap | npt.NDArray[np.float64]
+    if path is not None and path.suffix == ".npy":
+        data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=shape)
+    else:
+        data = np.empty(shape)
+
+    rngs = [
+        np.random.default_rng(seed)
+        for seed in np.random.SeedSequence(random_seed).spawn(num)
+    ]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        params = list(
+            executor.map(
+                lambda i: generate_image(data[i], rngs[i], n, noise), range(num)
+            )
+        )
+
+    components = np.array(
+        [[i, *param] for i in range(num) for param in params[i]]
+    ).reshape(-1, COMPONENT_COLUMN_NUM)
+
+    if isinstance(data, np.memmap):
+        data.flush()
+    if path is not None and path.suffix == ".npy":
+        np.save(_get_components_path(path), components)
+    elif path is not None:
+        np.savez(path, data=data, components=components)
+
+    return SyntheticDataset(data, components)
+
+
+def load_dataset(
+    path: str | Path, mmap_mode: Literal["r", "r+", "c"] | None = "r"
+) -> SyntheticDataset:
+    """
+    Load a dataset written by generate_dataset.
+
+    Parameters
+    ----------
+    path
+        Path of the .npy or .npz file.
+    mmap_mode
+        Memory-map mode of a .npy file, see numpy.load. Archives are always loaded into memory.
+
+    Returns
+    -------
+    SyntheticDataset
+        The loaded dataset.
+    """
+
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as archive:
+            return SyntheticDataset(archive["data"], archive["components"])
+    elif path.suffix == ".npy":
+        return SyntheticDataset(
+            np.load(path, mmap_mode=mmap_mode),
+            np.load(_get_components_path(path)),
+        )
+    else:
+        raise Exception("Dataset files must be .npy or .npz files.")
+
+
+def _get_components_path(path: Path) -> Path:
+    return path.with_name(path.stem + COMPONENT_SUFFIX)
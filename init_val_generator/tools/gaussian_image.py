@@ -112,71 +112,10 @@ class GaussianImage:
         """
         self.data = np.zeros(self.__width * self.__height)
         for i in range(self.__n):
-            self.data += self.__get_gaussian_component(
+            self.data += get_gaussian_component(
                 self.__x, self.__y, self.model_components[i]
             )
 
-    def __get_gaussian_component(
-        self,
-        x: npt.NDArray[np.signedinteger[typing.Any]],
-        y: npt.NDArray[np.signedinteger[typing.Any]],
-        params: list[float],
-    ) -> npt.NDArray[np.float64]:
-        """
-        Calculate the values of a Gaussian component for given parameters.
-
-        Parameters
-        ----------
-        x
-            x-coordinate values.
-        y
-            y-coordinate values.
-        params
-            Parameters of the Gaussian component.
-
-        Returns
-        -------
-        numpy.ndarray
-            Calculated values of the Gaussian component.
-        """
-        SQ_FWHM_TO_SIGMA = 1 / 8 / math.log(2)
-        DEG_TO_RAD = math.pi / 180.0
-
-        amp = params[0]
-        center_x = params[1]
-        center_y = params[2]
-        fwhm_x = params[3]
-        fwhm_y = params[4]
-        pa = params[5]
-
-        dbl_sq_std_x = 2 * fwhm_x * fwhm_x * SQ_FWHM_TO_SIGMA
-        dbl_sq_std_y = 2 * fwhm_y * fwhm_y * SQ_FWHM_TO_SIGMA
-        theta_radian = (pa - 90.0) * DEG_TO_RAD  # counterclockwise rotation
-        a = (
-            math.cos(theta_radian) * math.cos(theta_radian) / dbl_sq_std_x
-            + math.sin(theta_radian) * math.sin(theta_radian) / dbl_sq_std_y
-        )
-        dbl_b = 2 * (
-            math.sin(2 * theta_radian) / (2 * dbl_sq_std_x)
-            - math.sin(2 * theta_radian) / (2 * dbl_sq_std_y)
-        )
-        c = (
-            math.sin(theta_radian) * math.sin(theta_radian) / dbl_sq_std_x
-            + math.cos(theta_radian) * math.cos(theta_radian) / dbl_sq_std_y
-        )
-
-        data = []
-
-        for j in y:
-            for i in x:
-                dx = i - center_x
-                dy = j - center_y
-                data.append(
-                    amp * math.exp(-(a * dx * dx + dbl_b * dx * dy + c * dy * dy))
-                )
-
-        return np.array(data)
-
     def __add_noise(self, noise_std: float) -> None:
         """
         Add random noise to the generated image.
@@ -198,3 +137,141 @@ class GaussianImage:
             Title of the plot.
         """
         plot_data(self.data, self.__width, self.__height, title)
+
+
+def get_gaussian_component(
+    x: npt.NDArray[np.signedinteger[typing.Any]],
+    y: npt.NDArray[np.signedinteger[typing.Any]],
+    params: list[float],
+) -> npt.NDArray[np.float64]:
+    """
+    Calculate the values of a Gaussian component for given parameters on the grid of x and y coordinates.
+
+    Parameters
+    ----------
+    x
+        x-coordinate values of the grid columns.
+    y
+        y-coordinate values of the grid rows.
+    params
+        Parameters of the Gaussian component: amplitude, center x, center y, FWHM x, FWHM y, and position angle.
+
+    Returns
+    -------
+    numpy.ndarray
+        Calculated values of the Gaussian component, flattened row by row.
+    """
+    amp = params[0]
+    center_x = params[1]
+    center_y = params[2]
+    a, dbl_b, c = get_quadratic_coefficients(params[3], params[4], params[5])
+
+    dx = x - center_x
+    dy = (y - center_y)[:, None]
+    return (amp * np.exp(-(a * dx * dx + dbl_b * dx * dy + c * dy * dy))).ravel()
+
+
+def get_quadratic_coefficients(
+    fwhm_x: float, fwhm_y: float, pa: float
+) -> tuple[float, float, float]:
+    """
+    Calculate the coefficients of the quadratic form in the exponent of a Gaussian component.
+
+    The Gaussian component is amp * exp(-(a * dx^2 + 2b * dx * dy + c * dy^2)) with dx and dy the offsets from the center.
+
+    Parameters
+    ----------
+    fwhm_x
+        FWHM along the x axis before the rotation.
+    fwhm_y
+        FWHM along the y axis before the rotation.
+    pa
+        Position angle in degrees.
+
+    Returns
+    -------
+    tuple
+        The coefficients a, 2b and c.
+    """
+    SQ_FWHM_TO_SIGMA = 1 / 8 / math.log(2)
+    DEG_TO_RAD = math.pi / 180.0
+
+    dbl_sq_std_x = 2 * fwhm_x * fwhm_x * SQ_FWHM_TO_SIGMA
+    dbl_sq_std_y = 2 * fwhm_y * fwhm_y * SQ_FWHM_TO_SIGMA
+    theta_radian = (pa - 90.0) * DEG_TO_RAD  # counterclockwise rotation
+    a = (
+        math.cos(theta_radian) * math.cos(theta_radian) / dbl_sq_std_x
+        + math.sin(theta_radian) * math.sin(theta_radian) / dbl_sq_std_y
+    )
+    dbl_b = 2 * (
+        math.sin(2 * theta_radian) / (2 * dbl_sq_std_x)
+        - math.sin(2 * theta_radian) / (2 * dbl_sq_std_y)
+    )
+    c = (
+        math.sin(theta_radian) * math.sin(theta_radian) / dbl_sq_std_x
+        + math.cos(theta_radian) * math.cos(theta_radian) / dbl_sq_std_y
+    )
+    return a, dbl_b, c
+
+
+def to_quadratic_parameters(
+    params: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """
+    Convert the parameters of Gaussian components to the quadratic form in their exponent.
+
+    Parameters
+    ----------
+    params
+        Array of shape (component number, 6) with the amplitude, center x, center y, FWHM x, FWHM y, and position angle of each component.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (component number, 6) with the amplitude, center x, center y, and the coefficients a, 2b and c from get_quadratic_coefficients of each component.
+    """
+    theta = np.empty((len(params), 6))
+    theta[:, :3] = params[:, :3]
+    for i, (fwhm_x, fwhm_y, pa) in enumerate(params[:, 3:]):
+        theta[i, 3:] = get_quadratic_coefficients(fwhm_x, fwhm_y, pa)
+    return theta
+
+
+def get_boxes(
+    theta: npt.NDArray[np.float64], width: int, height: int, n_sigma: float
+) -> npt.NDArray[np.intp]:
+    """
+    Calculate the bounding boxes of Gaussian components, clipped to the image.
+
+    Parameters
+    ----------
+    theta
+        Array of shape (component number, 6) with the parameters of each component from to_quadratic_parameters.
+    width
+        Width of the image.
+    height
+        Height of the image.
+    n_sigma
+        Half size of the bounding box of a component in standard deviations.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (component number, 4) with the start x, stop x, start y and stop y of each bounding box, with exclusive stops. Empty boxes have a stop not above their start.
+    """
+    _, center_x, center_y, a, dbl_b, c = theta.T
+    det = a * c - dbl_b * dbl_b / 4
+    half_x = n_sigma * np.sqrt(0.5 * c / det)
+    half_y = n_sigma * np.sqrt(0.5 * a / det)
+    boxes = np.stack(
+        [
+            np.floor(center_x - half_x),
+            np.ceil(center_x + half_x) + 1,
+            np.floor(center_y - half_y),
+            np.ceil(center_y + half_y) + 1,
+        ],
+        axis=-1,
+    )
+    boxes = np.nan_to_num(boxes, nan=0, posinf=max(width, height), neginf=0)
+    limit = np.array([width, width, height, height])
+    return np.clip(boxes, 0, limit).astype(np.intp)
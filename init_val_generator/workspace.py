@@ -0,0 +1,147 @@
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+
+class Workspace:
+    """
+    Preallocated scratch buffers for estimating many images of the same size.
+
+    The coordinate grids and the per-pixel temporaries of the data selections, the K-means initialization and iterations, the cluster assignment, the moment sums, the cluster statistics, the silhouette score and the model of the residual check are allocated once and reused by every estimation with the workspace, which avoids the allocation and page-fault cost in loops over many same-shape images. The other stages, such as the peak and region searches, the refinement and the bootstrap, still allocate their own arrays. A workspace must not be used by several threads at the same time, so each thread needs its own workspace. Arrays returned by a stage may be backed by the workspace and are only valid until the next estimation with it.
+
+    Attributes
+    ----------
+    width
+        Width of the images.
+    height
+        Height of the images.
+    dtype
+        Floating-point type of the scratch buffers.
+    data_x
+        X coordinates of the pixels, of the coordinate type given at initialization.
+    data_y
+        Y coordinates of the pixels, of the coordinate type given at initialization.
+
+    Examples
+    --------
+    >>> workspace = Workspace(256, 256)
+    >>> generator = InitValGenerator("3-sigma", "3-sigma")
+    >>> estimates = [generator.estimate(image, 256, 256, workspace=workspace) for image in images]
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        dtype: npt.DTypeLike = np.float64,
+        coordinate_dtype: npt.DTypeLike = np.int64,
+    ) -> None:
+        """
+        Initialize the workspace.
+
+        Parameters
+        ----------
+        width
+            Width of the images.
+        height
+            Height of the images.
+        dtype
+            Floating-point type of the scratch buffers.
+        coordinate_dtype
+            Integer type of the coordinate grids created at initialization. Grids of other types are created by get_coordinates on request.
+        """
+        self.width = width
+        self.height = height
+        self.dtype = np.dtype(dtype)
+
+        self.__coordinates: dict[
+            np.dtype[Any],
+            tuple[npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger]],
+        ] = {}
+        self.data_x, self.data_y = self.get_coordinates(coordinate_dtype)
+
+        self.__buffers: dict[str, npt.NDArray[np.generic]] = {}
+
+    def get_coordinates(
+        self, dtype: npt.DTypeLike
+    ) -> tuple[npt.NDArray[np.signedinteger], npt.NDArray[np.signedinteger]]:
+        """
+        Get the read-only coordinate grids of an integer type, created on the first request and reused afterwards.
+
+        Parameters
+        ----------
+        dtype
+            Integer type of the coordinates, such as the type from get_coordinate_dtype under the memory budget of the generator.
+
+        Returns
+        -------
+        tuple
+            X coordinates and Y coordinates of the pixels in row-major order.
+        """
+        dtype = np.dtype(dtype)
+        coordinates = self.__coordinates.get(dtype)
+        if coordinates is None:
+            data_x = np.tile(np.arange(self.width, dtype=dtype), self.height)
+            data_y = np.repeat(np.arange(self.height, dtype=dtype), self.width)
+            data_x.flags.writeable = False
+            data_y.flags.writeable = False
+            coordinates = (data_x, data_y)
+            self.__coordinates[dtype] = coordinates
+        return coordinates
+
+    def get_buffer(
+        self, name: str, num: int, dtype: npt.DTypeLike | None = None
+    ) -> npt.NDArray[Any]:
+        """
+        Get a scratch buffer, allocated on the first request and reused afterwards.
+
+        Parameters
+        ----------
+        name
+            Name of the buffer. Buffers used at the same time need different names.
+        num
+            Number of elements.
+        dtype
+            Type of the elements. If None, the floating-point type of the workspace is used.
+
+        Returns
+        -------
+        numpy.ndarray
+            The buffer with uninitialized values.
+        """
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        buffer = self.__buffers.get(name)
+        if buffer is None or len(buffer) < num or buffer.dtype != dtype:
+            buffer = np.empty(max(num, self.width * self.height), dtype=dtype)
+            self.__buffers[name] = buffer
+        return buffer[:num]
+
+
+def get_buffer(
+    workspace: Workspace | None,
+    name: str,
+    num: int,
+    dtype: npt.DTypeLike | None = None,
+) -> npt.NDArray[Any]:
+    """
+    Get a scratch buffer from the workspace, or a new array without a workspace.
+
+    Parameters
+    ----------
+    workspace
+        The workspace, or None.
+    name
+        Name of the buffer.
+    num
+        Number of elements.
+    dtype
+        Type of the elements. If None, the floating-point type of the workspace is used, or float64 without a workspace.
+
+    Returns
+    -------
+    numpy.ndarray
+        The buffer with uninitialized values.
+    """
+    if workspace is None:
+        return np.empty(num, dtype=np.float64 if dtype is None else dtype)
+    return workspace.get_buffer(name, num, dtype)
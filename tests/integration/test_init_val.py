@@ -1,5 +1,9 @@
+import pytest
 import numpy as np
 from init_val_generator import InitValGenerator
+from init_val_generator.data_selection import SelectionMethod, filter_data
+from init_val_generator.method_of_moments import grouped_method_of_moments
+from init_val_generator.segmentation import segment
 from init_val_generator.tools.gaussian_image import GaussianImage
 
 
@@ -72,3 +76,221 @@ def test_multiple_gaussian_unknown_num():
         ),
         atol=1e-4,
     )
+
+
+@pytest.mark.parametrize("component_search", ["sweep", "golden-section", "split-merge"])
+@pytest.mark.parametrize("criterion", ["calinski-harabasz", "davies-bouldin", "bic"])
+def test_single_gaussian_unknown_num(criterion, component_search):
+    width = 256
+    height = 256
+    image = GaussianImage(width, height, n=1, random_seed=0, noise=None)
+
+    guesser = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        criterion=criterion,
+        component_search=component_search,
+    )
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    np.testing.assert_array_equal(
+        estimates, guesser.estimate(image.data, width, height, 1)
+    )
+
+
+@pytest.mark.parametrize("n_init", [1, 3])
+def test_multiple_gaussian_hamerly(n_init):
+    width = 256
+    height = 256
+    image = GaussianImage(width, height, random_seed=0)
+
+    lloyd = InitValGenerator("3-sigma", "3-sigma", n_init=n_init, random_seed=0)
+    hamerly = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        n_init=n_init,
+        random_seed=0,
+        k_means_algorithm="hamerly",
+    )
+
+    np.testing.assert_array_equal(
+        hamerly.estimate(image.data, width, height, 5),
+        lloyd.estimate(image.data, width, height, 5),
+    )
+
+
+def test_k_means_restarts_on_estimates():
+    width = 128
+    height = 128
+    image = GaussianImage(width, height, random_seed=0)
+
+    generator = InitValGenerator("3-sigma", "3-sigma", n_init=3, random_seed=0)
+    estimates = generator.estimate(image.data, width, height, 3)
+
+    assert [restart.index for restart in estimates.restarts] == [0, 1, 2]
+    assert all(restart.inertia > 0 for restart in estimates.restarts)
+    assert generator._contexts == {}
+    assert InitValGenerator().estimate(image.data, width, height, 3).restarts is None
+
+
+def test_multiple_gaussian_segmentation():
+    width = 128
+    height = 128
+    image = GaussianImage(
+        width,
+        height,
+        [[1, 30, 30, 8, 6, 0], [0.8, 90, 40, 10, 7, 45], [-0.7, 60, 100, 9, 9, 0]],
+        noise=0.05,
+        random_seed=0,
+    )
+
+    guesser = InitValGenerator("3-sigma", "3-sigma", component_search="segmentation")
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    centers = sorted((round(estimate[1]), round(estimate[2])) for estimate in estimates)
+    assert centers == [(30, 30), (60, 100), (90, 40)]
+
+
+def test_segmentation_estimates_by_region():
+    width = 128
+    height = 96
+    image = GaussianImage(
+        width,
+        height,
+        [[1, 40, 40, 40, 8, 0], [1, 40, 72, 4, 4, 0], [-0.8, 100, 20, 9, 6, 0]],
+        noise=None,
+    )
+    data_x = np.tile(np.arange(width), height)
+    data_y = np.repeat(np.arange(height), width)
+    data, data_x, data_y = filter_data(
+        SelectionMethod.THREE_SIGMA, image.data, width, height, data_x, data_y
+    )
+    region_index, region_num = segment(data, data_x, data_y, width, height)
+
+    guesser = InitValGenerator("3-sigma", "3-sigma", component_search="segmentation")
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    np.testing.assert_allclose(
+        estimates,
+        grouped_method_of_moments(data, data_x, data_y, region_index, region_num),
+    )
+
+
+def test_multiple_gaussian_peaks():
+    width = 128
+    height = 128
+    image = GaussianImage(
+        width,
+        height,
+        [
+            [1, 30, 30, 8, 6, 0],
+            [0.9, 75, 40, 8, 8, 0],
+            [0.8, 90, 40, 10, 7, 45],
+            [-0.7, 60, 100, 9, 9, 0],
+        ],
+        noise=0.05,
+        random_seed=0,
+    )
+
+    guesser = InitValGenerator("3-sigma", "3-sigma", component_search="peaks")
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    centers = sorted((round(estimate[1]), round(estimate[2])) for estimate in estimates)
+    assert centers == [(30, 30), (60, 100), (75, 40), (90, 40)]
+
+
+def test_multiple_gaussian_unknown_num_parallel_sweep():
+    width = 256
+    height = 256
+    image = GaussianImage(width, height, random_seed=0)
+
+    sequential = InitValGenerator("3-sigma", "3-sigma")
+    parallel = InitValGenerator("3-sigma", "3-sigma", n_jobs=4, parallel_sweep=True)
+
+    np.testing.assert_array_equal(
+        parallel.estimate(image.data, width, height, None),
+        sequential.estimate(image.data, width, height, None),
+    )
+    assert parallel._contexts == {}
+
+
+@pytest.mark.parametrize("max_components", [4, 5, 6, 7, 10])
+def test_golden_section_small_range(max_components):
+    width = 128
+    height = 128
+    image = GaussianImage(
+        width,
+        height,
+        [[1, 40, 40, 8, 6, 30], [0.8, 90, 80, 9, 7, 120]],
+        noise=None,
+    )
+
+    estimates = {
+        search: InitValGenerator(
+            "3-sigma",
+            "3-sigma",
+            criterion="calinski-harabasz",
+            component_search=search,
+            max_components=max_components,
+        ).estimate(image.data, width, height, None)
+        for search in ["sweep", "golden-section"]
+    }
+
+    assert len(estimates["golden-section"]) == 2
+    np.testing.assert_array_equal(estimates["golden-section"], estimates["sweep"])
+
+
+def test_crowded_field_golden_section():
+    width = 256
+    height = 256
+    rng = np.random.default_rng(0)
+    components = [
+        [1, 16 + 32 * i + rng.uniform(-3, 3), 16 + 32 * j + rng.uniform(-3, 3), 5, 5, 0]
+        for i in range(8)
+        for j in range(8)
+    ]
+    image = GaussianImage(width, height, components, noise=0.02, random_seed=0)
+
+    guesser = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        criterion="calinski-harabasz",
+        component_search="golden-section",
+        max_components=200,
+    )
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    assert len(estimates) == 64
+    np.testing.assert_allclose(
+        sorted((round(e[1]), round(e[2])) for e in estimates),
+        sorted((round(c[1]), round(c[2])) for c in components),
+        atol=1,
+    )
+
+
+def test_crowded_field_split_merge():
+    width = 256
+    height = 256
+    rng = np.random.default_rng(0)
+    components = [
+        [1, 16 + 32 * i + rng.uniform(-3, 3), 16 + 32 * j + rng.uniform(-3, 3), 5, 5, 0]
+        for i in range(8)
+        for j in range(8)
+    ]
+    image = GaussianImage(width, height, components, noise=0.02, random_seed=0)
+
+    guesser = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        criterion="bic",
+        component_search="split-merge",
+        max_components=150,
+    )
+    estimates = guesser.estimate(image.data, width, height, None)
+
+    assert len(estimates) == 64
+
+
+def test_split_merge_needs_statistics_criterion():
+    with pytest.raises(Exception):
+        InitValGenerator("3-sigma", "3-sigma", component_search="split-merge")
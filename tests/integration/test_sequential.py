@@ -0,0 +1,111 @@
+import threading
+import pytest
+import numpy as np
+from init_val_generator import InitValGenerator, SequentialEstimator
+from init_val_generator.tools.gaussian_image import GaussianImage
+from init_val_generator.workspace import Workspace
+
+
+def get_planes(shifts, component_nums=None):
+    width = 64
+    height = 64
+    planes = []
+    for i, shift in enumerate(shifts):
+        parameters = [
+            [1, 20 + shift, 20, 8, 6, 30],
+            [0.8, 44 + shift, 40, 7, 5, 120],
+        ]
+        if component_nums is not None:
+            parameters = parameters[: component_nums[i]]
+        image = GaussianImage(width, height, parameters, noise=None)
+        planes.append(image.data)
+    return planes, width, height
+
+
+def test_warm_start_matches_full_estimate():
+    planes, width, height = get_planes([0, 0.5, 1.0])
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    estimator = SequentialEstimator(generator, n=2)
+
+    for plane in planes:
+        estimates = estimator.estimate(plane, width, height)
+        np.testing.assert_allclose(
+            estimates, generator.estimate(plane, width, height, 2), atol=1e-2
+        )
+
+    assert estimator.warm_started
+    assert estimator.plane_num == 3
+    assert estimator.warm_start_num == 2
+
+    estimator.reset()
+    estimator.estimate(planes[0], width, height)
+    assert not estimator.warm_started
+    assert estimator.plane_num == 1
+    assert estimator.warm_start_num == 0
+
+
+def test_large_change_falls_back_to_full_estimate():
+    planes, width, height = get_planes([0, 10])
+    estimator = SequentialEstimator(
+        InitValGenerator("3-sigma", "3-sigma", criterion="calinski-harabasz"),
+        max_shift=2.0,
+    )
+
+    for plane in planes:
+        estimator.estimate(plane, width, height)
+
+    assert not estimator.warm_started
+    assert estimator.plane_num == 2
+    assert estimator.warm_start_num == 0
+
+
+@pytest.mark.parametrize("criterion", ["bic", "calinski-harabasz"])
+def test_new_component_falls_back_to_full_estimate(criterion):
+    planes, width, height = get_planes([0, 0, 0], [1, 1, 2])
+    generator = InitValGenerator("3-sigma", "3-sigma", criterion=criterion)
+    estimator = SequentialEstimator(generator)
+
+    assert len(estimator.estimate(planes[0], width, height)) == 1
+    assert len(estimator.estimate(planes[1], width, height)) == 1
+    assert estimator.warm_started
+    estimates = estimator.estimate(planes[2], width, height)
+
+    assert not estimator.warm_started
+    assert len(estimates) == len(generator.estimate(planes[2], width, height, None))
+
+
+def test_time_budget_and_workspace():
+    planes, width, height = get_planes([0, 0.5])
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    estimator = SequentialEstimator(generator, n=2)
+    workspace = Workspace(width, height)
+
+    for plane in planes:
+        estimates = estimator.estimate(plane, width, height, workspace, 60.0)
+        assert not estimates.truncated
+        np.testing.assert_allclose(
+            estimates, generator.estimate(plane, width, height, 2), atol=1e-2
+        )
+
+    estimator.reset()
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert estimator.estimate(
+        planes[0], width, height, cancel_event=cancel_event
+    ).truncated
+
+    with pytest.raises(Exception):
+        estimator.estimate(planes[0], width, height, Workspace(width, height + 1))
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"refine_iterations": 5},
+        {"residual_threshold": 0.1},
+        {"bootstrap_replicates": 10},
+    ],
+)
+def test_unsupported_options(options):
+    with pytest.raises(Exception):
+        SequentialEstimator(InitValGenerator(**options))
@@ -0,0 +1,113 @@
+import pytest
+
+from init_val_generator import InitValGenerator
+from init_val_generator.init_val_generator import ComponentSearch
+from init_val_generator.cluster_validity import ClusteringCriterion
+from init_val_generator.data_selection import SelectionMethod
+from init_val_generator.profile import load_profile, save_profile, select_configuration
+from init_val_generator.tools.autotune import (
+    TuningResult,
+    autotune,
+    get_parameter_error,
+    get_pareto_front,
+    recommend,
+)
+
+
+def get_result(error, runtime):
+    return TuningResult(
+        "64x64",
+        SelectionMethod.THREE_SIGMA,
+        SelectionMethod.THREE_SIGMA,
+        ClusteringCriterion.SILHOUETTE,
+        error,
+        runtime,
+    )
+
+
+def test_get_parameter_error():
+    model = [[1, 10, 10, 4, 4, 0], [1, 30, 30, 4, 4, 0]]
+    assert (
+        get_parameter_error([[1, 10, 12, 4, 4, 0], [1, 30, 30, 4, 4, 0]], model) == 0.25
+    )
+    assert get_parameter_error([[1, 10, 10, 4, 4, 0]], model) == 1.0
+    assert get_parameter_error([], model) == 2.0
+
+
+def test_get_parameter_error_shape_terms():
+    model = [[2, 10, 10, 8, 4, 30]]
+    assert get_parameter_error([[2, 10, 10, 8, 4, 30]], model) == 0.0
+    # the same ellipse with the axes swapped and the position angle off by 180
+    assert get_parameter_error([[2, 10, 10, 4, 8, -60]], model) == pytest.approx(0.0)
+
+    assert get_parameter_error([[1, 10, 10, 8, 4, 30]], model) == pytest.approx(0.5)
+    assert get_parameter_error([[2, 10, 10, 12, 2, 30]], model) == pytest.approx(0.5)
+    # 45 degrees off on a component with axis ratio 2
+    assert get_parameter_error([[2, 10, 10, 8, 4, 75]], model) == pytest.approx(0.25)
+    assert get_parameter_error([[2, 10, 10, 4, 4, 75]], [[2, 10, 10, 4, 4, 30]]) == 0.0
+    # the shape of a missed component does not count
+    assert get_parameter_error([[5, 40, 40, 1, 1, 0]], model) == 1.0
+
+
+def test_pareto_front():
+    results = [
+        get_result(0.5, 1.0),
+        get_result(0.2, 2.0),
+        get_result(0.3, 3.0),
+        get_result(0.1, 4.0),
+        get_result(0.6, 0.5),
+    ]
+    front = get_pareto_front(results)
+
+    assert [(result.error, result.runtime) for result in front] == [
+        (0.6, 0.5),
+        (0.5, 1.0),
+        (0.2, 2.0),
+        (0.1, 4.0),
+    ]
+    assert recommend(results, 0.15) is results[1]
+    assert recommend(results, 0.0) is results[3]
+
+
+def test_autotune_profile(tmp_path):
+    results, profile = autotune(
+        [(48, 48), (32, 32)],
+        image_num=2,
+        n=1,
+        data_selections=[None, SelectionMethod.THREE_SIGMA, SelectionMethod.SIGMA_CLIP],
+        clustering_data_selections=[SelectionMethod.THREE_SIGMA],
+        criteria=[ClusteringCriterion.BIC],
+        component_searches=[ComponentSearch.SWEEP, ComponentSearch.SEGMENTATION],
+    )
+    assert list(results) == ["32x32", "48x48"]
+    assert all(len(size_results) == 6 for size_results in results.values())
+    assert {
+        (result.data_selection, result.component_search) for result in results["32x32"]
+    } == {
+        (data_selection, component_search)
+        for data_selection in (None, "3-sigma", "sigma-clip")
+        for component_search in ("sweep", "segmentation")
+    }
+    assert [size_class["max_pixels"] for size_class in profile["size_classes"]] == [
+        1024,
+        None,
+    ]
+
+    path = tmp_path / "profile.json"
+    save_profile(profile, path)
+    loaded = load_profile(path)
+    assert select_configuration(loaded, 16, 16)["name"] == "32x32"
+    assert select_configuration(loaded, 1000, 1000)["name"] == "48x48"
+
+    generator = InitValGenerator.from_profile(path, 32, 32, memory_budget=10**6)
+    configuration = profile["size_classes"][0]
+    assert generator.data_selection == configuration["data_selection"]
+    assert generator.criterion == ClusteringCriterion.BIC
+    assert generator.component_search == configuration["component_search"]
+    assert generator.memory_budget == 10**6
+
+    # profiles without a component search use the sweep
+    for size_class in loaded["size_classes"]:
+        del size_class["component_search"]
+    generator = InitValGenerator.from_profile(loaded, 32, 32)
+    assert generator.component_search == ComponentSearch.SWEEP
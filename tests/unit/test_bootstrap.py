@@ -0,0 +1,117 @@
+import pytest
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator import init_val_generator
+from init_val_generator.bootstrap import bootstrap_standard_errors
+from init_val_generator.method_of_moments import get_parameters_from_moment_sums
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [[1, 25, 30, 10, 6, 30], [-0.8, 70, 50, 12, 8, 120]]
+
+
+def get_image_data():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    data_x = np.tile(np.arange(WIDTH), HEIGHT)
+    data_y = np.repeat(np.arange(HEIGHT), WIDTH)
+    data_cluster_index = np.where(
+        np.abs(image.data) > 0.15, (data_x > WIDTH // 2).astype(int), -1
+    )
+    return image.data, data_x, data_y, data_cluster_index
+
+
+def test_bootstrap_standard_errors():
+    data, data_x, data_y, data_cluster_index = get_image_data()
+
+    standard_errors = bootstrap_standard_errors(
+        data, data_x, data_y, data_cluster_index, 2, 50, random_seed=0
+    )
+
+    # the same replicates drawn one at a time
+    seeds = np.random.SeedSequence(0).spawn(2)
+    for i in range(2):
+        rng = np.random.default_rng(seeds[i])
+        is_cluster = data_cluster_index == i
+        x = data_x[is_cluster]
+        y = data_y[is_cluster]
+        basis = data[is_cluster] * np.stack([x**0, x, y, x * x, y * y, x * y])
+        estimate = get_parameters_from_moment_sums(basis.sum(axis=1))
+        replicates = np.array(
+            [
+                get_parameters_from_moment_sums(
+                    basis @ rng.poisson(1.0, is_cluster.sum())
+                )
+                for _ in range(50)
+            ]
+        )
+        replicates[:, 5] = (replicates[:, 5] - estimate[5] + 90) % 180 - 90
+        np.testing.assert_allclose(
+            standard_errors[i], np.std(replicates, axis=0, ddof=1), rtol=1e-6
+        )
+
+
+def test_bootstrap_standard_errors_in_chunks():
+    data, data_x, data_y, data_cluster_index = get_image_data()
+
+    standard_errors = bootstrap_standard_errors(
+        data, data_x, data_y, data_cluster_index, 3, 50, random_seed=0
+    )
+    chunked_standard_errors = bootstrap_standard_errors(
+        data,
+        data_x,
+        data_y,
+        data_cluster_index,
+        3,
+        50,
+        chunk_size=1000,
+        random_seed=0,
+        n_jobs=1,
+    )
+
+    np.testing.assert_allclose(chunked_standard_errors, standard_errors, rtol=1e-9)
+    assert np.all(np.isnan(standard_errors[2]))
+
+
+def test_estimate_with_bootstrap():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+
+    estimates = InitValGenerator(
+        "3-sigma", "3-sigma", bootstrap_replicates=100, random_seed=0
+    ).estimate(image.data, WIDTH, HEIGHT, 2)
+
+    assert estimates.standard_errors is not None
+    assert estimates.standard_errors.shape == (2, 6)
+    assert np.all(estimates.standard_errors > 0)
+    assert (
+        InitValGenerator("3-sigma", "3-sigma")
+        .estimate(image.data, WIDTH, HEIGHT, 2)
+        .standard_errors
+        is None
+    )
+
+
+@pytest.mark.parametrize("residual_threshold, num", [(0.1, 2), (0.99, 1)])
+def test_bootstrap_only_returned_estimates(monkeypatch, residual_threshold, num):
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    calls = []
+
+    def counted_bootstrap(*args, **kwargs):
+        calls.append(args[4])
+        return bootstrap_standard_errors(*args, **kwargs)
+
+    monkeypatch.setattr(
+        init_val_generator, "bootstrap_standard_errors", counted_bootstrap
+    )
+    estimates = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        bootstrap_replicates=20,
+        random_seed=0,
+        residual_threshold=residual_threshold,
+    ).estimate(image.data, WIDTH, HEIGHT, None)
+
+    assert len(estimates) == num
+    assert calls == [num]
+    assert estimates.standard_errors.shape == (num, 6)
@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+
+from init_val_generator.cluster_validity import (
+    ClusteringCriterion,
+    bic_score,
+    calinski_harabasz_score,
+    davies_bouldin_score,
+    get_cluster_statistics,
+    is_bic_decreased,
+    merge_clusters,
+    select_component_number,
+)
+
+
+def get_blobs(offsets):
+    rng = np.random.default_rng(0)
+    data_x = np.concatenate([rng.normal(x, 1, 200) for x, _ in offsets])
+    data_y = np.concatenate([rng.normal(y, 1, 200) for _, y in offsets])
+    data = np.ones(len(data_x))
+    return data, data_x, data_y
+
+
+def test_get_cluster_statistics():
+    data = np.array([1.0, -2.0, 3.0])
+    data_x = np.array([0.0, 1.0, 2.0])
+    data_y = np.array([1.0, 1.0, 0.0])
+    data_cluster_index = np.array([0, 0, 1])
+
+    cluster_stats = get_cluster_statistics(data, data_x, data_y, data_cluster_index, 2)
+
+    np.testing.assert_allclose(
+        cluster_stats,
+        np.array([[3.0, 2.0, 3.0, 2.0, 3.0, 2.0], [3.0, 6.0, 0.0, 12.0, 0.0, 0.0]]),
+    )
+
+
+def test_criteria_prefer_true_cluster_number():
+    offsets = [(0, 0), (20, 0), (10, 20)]
+    data, data_x, data_y = get_blobs(offsets)
+    num = len(data)
+
+    true_labels = np.repeat(np.arange(3), 200)
+    merged_labels = np.minimum(true_labels, 1)
+    true_stats = get_cluster_statistics(data, data_x, data_y, true_labels, 3)
+    merged_stats = get_cluster_statistics(data, data_x, data_y, merged_labels, 2)
+    single_stats = get_cluster_statistics(data, data_x, data_y, true_labels * 0, 1)
+
+    assert calinski_harabasz_score(true_stats, num) > calinski_harabasz_score(
+        merged_stats, num
+    )
+    assert davies_bouldin_score(true_stats) < davies_bouldin_score(merged_stats)
+    assert bic_score(true_stats, num) < bic_score(merged_stats, num)
+    assert bic_score(merged_stats, num) < bic_score(single_stats, num)
+
+
+def test_is_bic_decreased():
+    data, data_x, data_y = get_blobs([(0, 0), (20, 0)])
+    true_labels = np.repeat(np.arange(2), 200)
+    true_stats = get_cluster_statistics(data, data_x, data_y, true_labels, 2)
+    assert is_bic_decreased(true_stats, len(data))
+
+    data, data_x, data_y = get_blobs([(0, 0)])
+    split_labels = (data_x > 0).astype(np.intp)
+    split_stats = get_cluster_statistics(data, data_x, data_y, split_labels, 2)
+    assert not is_bic_decreased(split_stats, len(data))
+
+
+@pytest.mark.parametrize(
+    "criterion, scores, threshold, single_component_score, expected",
+    [
+        (ClusteringCriterion.SILHOUETTE, [0.4, 0.7, 0.5], 0.6, None, 3),
+        (ClusteringCriterion.SILHOUETTE, [0.4, 0.5, 0.3], 0.6, None, 1),
+        (ClusteringCriterion.CALINSKI_HARABASZ, [10.0, 30.0, 20.0], None, None, 3),
+        (ClusteringCriterion.DAVIES_BOULDIN, [0.9, 0.3, 0.5], 0.2, None, 1),
+        (ClusteringCriterion.BIC, [90.0, 80.0, 85.0], 0.0, 100.0, 3),
+        (ClusteringCriterion.BIC, [110.0, 105.0, 120.0], 0.0, 100.0, 1),
+    ],
+)
+def test_select_component_number(
+    criterion, scores, threshold, single_component_score, expected
+):
+    assert (
+        select_component_number(criterion, scores, threshold, single_component_score)
+        == expected
+    )
+
+
+def test_merge_clusters():
+    offsets = [(0, 0), (3, 0), (30, 0), (0, 40)]
+    data, data_x, data_y = get_blobs(offsets)
+    data_cluster_index = np.repeat(np.arange(4), 200)
+    cluster_stats = get_cluster_statistics(data, data_x, data_y, data_cluster_index, 5)
+
+    levels = merge_clusters(cluster_stats)
+
+    assert [len(level) for level in levels] == [4, 3, 2, 1]
+    np.testing.assert_allclose(levels[1][0], cluster_stats[0] + cluster_stats[1])
+    np.testing.assert_allclose(levels[-1][0], cluster_stats.sum(axis=0))
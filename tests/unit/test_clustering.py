@@ -1,6 +1,13 @@
 import pytest
 import numpy as np
-from init_val_generator.clustering import k_means, k_means_plus_plus
+from init_val_generator.clustering import (
+    assign_clusters,
+    get_inertia,
+    k_means,
+    k_means_hamerly,
+    k_means_plus_plus,
+    k_means_restarts,
+)
 
 
 @pytest.mark.parametrize(
@@ -41,3 +48,69 @@ def test_k_means():
     np.testing.assert_array_equal(data_cluster_index, np.array([0, 0, 1, 1]))
     np.testing.assert_array_equal(centroid_x, np.array([0, 2.2]))
     np.testing.assert_array_equal(centroid_y, np.array([0, 2.2]))
+
+
+def test_assign_clusters():
+    data = np.array([1.0, -2.0, 0.5, 3.0])
+    data_x = np.array([0.0, 4.0, 1.0, 9.0])
+    data_y = np.array([0.0, 4.0, 2.0, 9.0])
+    centroid_x = np.array([0.0, 5.0, 9.0])
+    centroid_y = np.array([0.0, 5.0, 8.0])
+
+    data_cluster_index = assign_clusters(data, data_x, data_y, centroid_x, centroid_y)
+
+    np.testing.assert_array_equal(data_cluster_index, np.array([0, 1, 0, 2]))
+
+
+def test_k_means_restarts():
+    rng = np.random.default_rng(1)
+    data_x = np.concatenate([rng.normal(cx, 2, 100) for cx in [10, 40, 70]])
+    data_y = np.concatenate([rng.normal(cy, 2, 100) for cy in [10, 60, 20]])
+    data = rng.uniform(0.5, 1, 300)
+
+    data_cluster_index, centroid_x, centroid_y, restarts = k_means_restarts(
+        data, data_x, data_y, 3, n_init=4, random_seed=0, n_jobs=2
+    )
+
+    assert [restart.index for restart in restarts] == [0, 1, 2, 3]
+    best_inertia = min(restart.inertia for restart in restarts)
+    assert get_inertia(
+        data, data_x, data_y, centroid_x, centroid_y, data_cluster_index
+    ) == pytest.approx(best_inertia)
+    np.testing.assert_allclose(np.sort(centroid_x), [10, 40, 70], atol=1)
+
+    _, same_centroid_x, _, _ = k_means_restarts(
+        data, data_x, data_y, 3, n_init=4, random_seed=0
+    )
+    np.testing.assert_array_equal(centroid_x, same_centroid_x)
+    assert all(restart.skipped is None for restart in restarts)
+
+    _, hamerly_centroid_x, _, hamerly_restarts = k_means_restarts(
+        data, data_x, data_y, 3, n_init=4, random_seed=0, algorithm="hamerly"
+    )
+    np.testing.assert_array_equal(centroid_x, hamerly_centroid_x)
+    assert all(restart.skipped > 0 for restart in hamerly_restarts)
+
+
+@pytest.mark.parametrize("n, chunk_size", [(1, None), (3, None), (12, 100)])
+def test_k_means_hamerly(n, chunk_size):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 60, (6, 2))
+    data_x = np.concatenate([rng.normal(cx, 3, 150) for cx, _ in centers])
+    data_y = np.concatenate([rng.normal(cy, 3, 150) for _, cy in centers])
+    data = rng.uniform(0.1, 1.0, len(data_x))
+    data[:3] = 0
+    init_x, init_y = k_means_plus_plus(data, data_x, data_y, n)
+
+    expected = k_means(data, data_x, data_y, init_x, init_y, chunk_size)
+    data_cluster_index, centroid_x, centroid_y, skipped = k_means_hamerly(
+        data, data_x, data_y, init_x, init_y, chunk_size
+    )
+
+    np.testing.assert_array_equal(data_cluster_index, expected[0])
+    np.testing.assert_array_equal(centroid_x, expected[1])
+    np.testing.assert_array_equal(centroid_y, expected[2])
+    if n == 1:
+        assert skipped == 0
+    else:
+        assert 0 < skipped < 1
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from init_val_generator import InitValGenerator
+from init_val_generator.dask_estimation import DaskEstimator
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+da = pytest.importorskip("dask.array")
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [
+    [1, 25, 30, 10, 6, 30],
+    [-0.8, 70, 50, 12, 8, 120],
+    [0.6, 40, 60, 8, 8, 0],
+]
+
+
+@pytest.mark.parametrize("selection", ["3-sigma", None])
+@pytest.mark.parametrize("n", [1, 3])
+def test_dask_estimate(selection, n):
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    generator = InitValGenerator(selection, selection)
+    chunked_image = da.from_array(image.data.reshape(HEIGHT, WIDTH), chunks=(23, 31))
+
+    estimates = DaskEstimator(generator, "synchronous").estimate(chunked_image, n)
+
+    expected = generator.estimate(image.data, WIDTH, HEIGHT, n)
+    np.testing.assert_allclose(estimates, expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(estimates.pixel_num, expected.pixel_num)
+
+
+def test_dask_estimate_needs_supported_selection():
+    with pytest.raises(Exception):
+        DaskEstimator(InitValGenerator("mad", "3-sigma"))
@@ -1,6 +1,13 @@
+import pytest
 import numpy as np
 
-from init_val_generator.data_selection import SelectionMethod, filter_data
+from init_val_generator.data_selection import (
+    SelectionMethod,
+    filter_data,
+    filter_fwhm,
+    get_aperture_indices,
+    select_aperture,
+)
 
 
 def test_filter_data():
@@ -14,3 +21,81 @@ def test_filter_data():
     np.testing.assert_array_equal(data, np.array([7.0, 8.0]))
     np.testing.assert_array_equal(data_x, np.array([6.0, 7.0]))
     np.testing.assert_array_equal(data_y, np.array([6.0, 7.0]))
+
+
+@pytest.mark.parametrize(
+    "center_x, center_y, radius",
+    [(5.3, 4.7, 3.2), (0.0, 0.0, 4.0), (11.5, 9.5, 20.0), (30.0, 30.0, 2.0)],
+)
+def test_select_aperture(center_x, center_y, radius):
+    width = 12
+    height = 10
+    data_x = np.tile(np.arange(width), height)
+    data_y = np.repeat(np.arange(height), width)
+
+    indices = get_aperture_indices(
+        *select_aperture(center_x, center_y, radius, width, height)
+    )
+
+    expected = np.where(
+        np.sqrt((data_x - center_x) ** 2 + (data_y - center_y) ** 2) <= radius
+    )[0]
+    np.testing.assert_array_equal(indices, expected)
+
+
+def test_filter_fwhm_on_grid():
+    width = 40
+    height = 30
+    data_x = np.tile(np.arange(width), height)
+    data_y = np.repeat(np.arange(height), width)
+    data = np.exp(-((data_x - 15.2) ** 2 + (data_y - 12.7) ** 2) / 20)
+
+    np.testing.assert_array_equal(
+        filter_fwhm(data, data_x, data_y, 2, grid=(width, height)),
+        filter_fwhm(data, data_x, data_y, 2),
+    )
+
+
+@pytest.mark.parametrize(
+    "method", [SelectionMethod.TWO_MAD, SelectionMethod.SIGMA_CLIP]
+)
+def test_filter_data_robust_chunked(method):
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 1, 10000)
+    data[:100] += 20
+    data_x = np.arange(10000)
+    data_y = np.zeros(10000)
+
+    expected = filter_data(method, data, 10000, 1, data_x, data_y)
+    chunked = filter_data(method, data, 10000, 1, data_x, data_y, chunk_size=1000)
+
+    for expected_array, chunked_array in zip(expected, chunked):
+        np.testing.assert_array_equal(chunked_array, expected_array)
+    assert np.all(np.isin(np.arange(100), expected[1]))
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1000])
+def test_filter_data_mad_precision(chunk_size):
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 1, 10000)
+    data[:100] += 20
+    data_x = np.arange(10000)
+    data_y = np.zeros(10000)
+
+    expected = filter_data(SelectionMethod.TWO_MAD, data, 10000, 1, data_x, data_y)
+    approximated = filter_data(
+        SelectionMethod.TWO_MAD,
+        data,
+        10000,
+        1,
+        data_x,
+        data_y,
+        chunk_size=chunk_size,
+        precision=1e-4,
+    )
+
+    assert np.all(np.isin(np.arange(100), approximated[1]))
+    assert abs(len(approximated[1]) - len(expected[1])) <= 5
+
+    data[5000] = np.nan
+    filter_data(SelectionMethod.TWO_MAD, data, 10000, 1, data_x, data_y, chunk_size)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator.tools.dataset_factory import generate_dataset, load_dataset
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+
+def test_generate_dataset_reproducible():
+    serial = generate_dataset(None, 8, 32, 24, random_seed=3, n_jobs=1)
+    parallel = generate_dataset(None, 8, 32, 24, random_seed=3, n_jobs=4)
+
+    np.testing.assert_array_equal(serial.data, parallel.data)
+    np.testing.assert_array_equal(serial.components, parallel.components)
+    assert serial.data.shape == (8, 24, 32)
+    assert not np.array_equal(serial.data[0], serial.data[1])
+
+
+def test_generate_dataset_matches_gaussian_image():
+    dataset = generate_dataset(None, 3, 40, 30, n=2, noise=None, random_seed=0)
+
+    for i in range(len(dataset)):
+        params = dataset.get_model_components(i)
+        image = GaussianImage(40, 30, params, noise=None)
+        assert len(params) == 2
+        np.testing.assert_allclose(dataset.get_image(i), image.data, rtol=1e-12)
+
+
+def test_dataset_files(tmp_path):
+    for suffix in [".npy", ".npz"]:
+        path = tmp_path / ("dataset" + suffix)
+        dataset = generate_dataset(path, 4, 32, 32, n=1, random_seed=1)
+        loaded = load_dataset(path)
+
+        np.testing.assert_array_equal(loaded.data, dataset.data)
+        np.testing.assert_array_equal(loaded.components, dataset.components)
+        assert (loaded.width, loaded.height) == (32, 32)
+
+        estimates = InitValGenerator().estimate(loaded.get_image(0), 32, 32)
+        assert len(estimates) == len(loaded.get_model_components(0))
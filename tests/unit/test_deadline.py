@@ -0,0 +1,111 @@
+import threading
+import numpy as np
+
+from init_val_generator import InitValGenerator, guess
+from init_val_generator.clustering import assign_clusters, k_means
+from init_val_generator.deadline import Deadline
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 96
+
+
+def get_image():
+    return GaussianImage(
+        WIDTH,
+        HEIGHT,
+        [[1, 25, 30, 10, 8, 0], [0.8, 70, 60, 12, 9, 45]],
+        noise=0.05,
+        random_seed=0,
+    ).data
+
+
+def test_deadline():
+    assert not Deadline().is_expired()
+    assert not Deadline(60).is_expired()
+
+    deadline = Deadline(0)
+    assert not deadline.truncated
+    assert deadline.is_expired()
+    assert deadline.truncated
+
+    cancel_event = threading.Event()
+    deadline = Deadline(None, cancel_event)
+    assert not deadline.is_expired()
+    cancel_event.set()
+    assert deadline.is_expired()
+
+
+def test_deadline_parent():
+    parent_event = threading.Event()
+    parent = Deadline(None, parent_event)
+    cancel_event = threading.Event()
+    deadline = Deadline(None, cancel_event, parent)
+    assert not deadline.is_expired()
+
+    cancel_event.set()
+    assert deadline.is_expired()
+    assert not parent.truncated
+
+    deadline = Deadline(None, None, parent)
+    parent_event.set()
+    assert deadline.is_expired()
+    assert deadline.truncated
+    assert parent.truncated
+
+
+def test_k_means_deadline():
+    rng = np.random.default_rng(0)
+    data = rng.uniform(0.5, 1.0, 500)
+    data_x = rng.uniform(0, 50, 500)
+    data_y = rng.uniform(0, 50, 500)
+    init_x = np.array([5.0, 25.0, 45.0])
+    init_y = np.array([5.0, 25.0, 45.0])
+
+    deadline = Deadline(0)
+    data_cluster_index, centroid_x, centroid_y = k_means(
+        data, data_x, data_y, init_x, init_y, deadline=deadline
+    )
+
+    assert deadline.truncated
+    np.testing.assert_array_equal(centroid_x, init_x)
+    np.testing.assert_array_equal(
+        data_cluster_index,
+        assign_clusters(data, data_x, data_y, centroid_x, centroid_y),
+    )
+
+
+def test_estimate_time_budget():
+    data = get_image()
+    generator = InitValGenerator("3-sigma", "3-sigma")
+
+    expected = generator.estimate(data, WIDTH, HEIGHT, None)
+    estimates = generator.estimate(data, WIDTH, HEIGHT, None, time_budget=600)
+    assert not expected.truncated
+    assert not estimates.truncated
+    np.testing.assert_array_equal(estimates, expected)
+
+    estimates = generator.estimate(data, WIDTH, HEIGHT, None, time_budget=0)
+    assert estimates.truncated
+    np.testing.assert_array_equal(estimates, generator.estimate(data, WIDTH, HEIGHT, 1))
+    assert generator._contexts == {}
+
+    estimates = guess(data, WIDTH, HEIGHT, 2, time_budget=0)
+    assert estimates.truncated
+    assert len(estimates) == 1
+
+
+def test_estimate_cancel():
+    data = get_image()
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    estimates = generator.estimate(data, WIDTH, HEIGHT, None, cancel_event=cancel_event)
+
+    assert estimates.truncated
+    assert len(estimates) == 1
+
+    estimates = guess(data, WIDTH, HEIGHT, 2, cancel_event=cancel_event)
+    assert estimates.truncated
+    assert len(estimates) == 1
@@ -0,0 +1,70 @@
+import math
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator.evaluation import evaluate_fit, render_model
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [[1, 25, 30, 10, 6, 30], [-0.8, 70, 50, 12, 8, 120]]
+
+
+def test_render_model():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=None)
+    out = np.full(WIDTH * HEIGHT, np.nan)
+
+    model = render_model(COMPONENTS, WIDTH, HEIGHT, n_sigma=6, out=out)
+
+    assert model is out
+    np.testing.assert_allclose(model, image.data, atol=1e-6)
+
+
+def test_render_model_skips_invalid_components():
+    model = render_model(
+        [COMPONENTS[0], [np.nan, np.nan, np.nan, 0, 0, 0]], WIDTH, HEIGHT
+    )
+
+    np.testing.assert_array_equal(model, render_model(COMPONENTS[:1], WIDTH, HEIGHT))
+
+
+def test_evaluate_fit():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+
+    statistics = evaluate_fit(image.data, WIDTH, HEIGHT, COMPONENTS, n_sigma=6)
+
+    assert math.isclose(statistics.residual_rms, 0.05, rel_tol=0.05)
+    assert math.isclose(statistics.noise, 0.05, rel_tol=0.1)
+    assert math.isclose(statistics.reduced_chi_square, 1, rel_tol=0.2)
+    expected_flux = [
+        amp * 2 * math.pi * fwhm_x * fwhm_y / (8 * math.log(2))
+        for amp, _, _, fwhm_x, fwhm_y, _ in COMPONENTS
+    ]
+    np.testing.assert_allclose(statistics.model_flux, expected_flux)
+    np.testing.assert_allclose(statistics.recovered_flux, expected_flux, rtol=0.05)
+
+
+def test_evaluate_fit_with_given_noise():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=None)
+
+    statistics = evaluate_fit(image.data, WIDTH, HEIGHT, COMPONENTS[:1], noise=0.1)
+
+    assert statistics.noise == 0.1
+    assert math.isclose(
+        statistics.chi_square,
+        WIDTH * HEIGHT * statistics.residual_rms**2 / 0.01,
+    )
+
+
+def test_estimate_with_residual_threshold():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+
+    accepted = InitValGenerator("3-sigma", "3-sigma", residual_threshold=0.1).estimate(
+        image.data, WIDTH, HEIGHT, None
+    )
+    rejected = InitValGenerator("3-sigma", "3-sigma", residual_threshold=0.99).estimate(
+        image.data, WIDTH, HEIGHT, None
+    )
+
+    assert len(accepted) == 2
+    assert len(rejected) == 1
@@ -0,0 +1,103 @@
+import tracemalloc
+import pytest
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator.clustering import assign_clusters, k_means, k_means_plus_plus
+from init_val_generator.data_selection import filter_data
+from init_val_generator.memory import MIN_CHUNK_SIZE, get_chunk_size, iterate_chunks
+from init_val_generator.method_of_moments import (
+    grouped_method_of_moments,
+    method_of_moments,
+)
+
+WIDTH = 256
+HEIGHT = 256
+CHUNK_SIZE = 4096
+
+
+def get_image():
+    rng = np.random.default_rng(0)
+    data_x = np.tile(np.arange(WIDTH, dtype=np.int32), HEIGHT)
+    data_y = np.repeat(np.arange(HEIGHT, dtype=np.int32), WIDTH)
+    data = (
+        np.exp(-((data_x - 80) ** 2 + (data_y - 100) ** 2) / 200)
+        + np.exp(-((data_x - 170) ** 2 + (data_y - 150) ** 2) / 150)
+        + rng.normal(0, 0.05, WIDTH * HEIGHT)
+    )
+    return data, data_x, data_y
+
+
+def get_peak_ratio(func, data, *args):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(data, *args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / data.nbytes
+
+
+def test_get_chunk_size():
+    assert get_chunk_size(None, 1000) is None
+    assert get_chunk_size(10**9, 1000) is None
+    assert get_chunk_size(0, 10**6) == MIN_CHUNK_SIZE
+    slices = list(iterate_chunks(10, 4))
+    assert [(chunk.start, chunk.stop) for chunk in slices] == [(0, 4), (4, 8), (8, 10)]
+
+
+@pytest.mark.parametrize(
+    "stage, max_ratio",
+    [
+        ("assign_clusters", 1.5),
+        ("k_means", 2.5),
+        ("k_means_plus_plus", 1.5),
+        ("grouped_method_of_moments", 0.5),
+        ("method_of_moments", 0.5),
+        ("filter_data", 0.5),
+    ],
+)
+def test_stage_peak_memory(stage, max_ratio):
+    data, data_x, data_y = get_image()
+    centroid_x = np.array([80.0, 170.0, 30.0])
+    centroid_y = np.array([100.0, 150.0, 30.0])
+    labels = np.zeros(len(data), dtype=np.intp)
+
+    stages = {
+        "assign_clusters": lambda: assign_clusters(
+            data, data_x, data_y, centroid_x, centroid_y, CHUNK_SIZE
+        ),
+        "k_means": lambda: k_means(
+            data, data_x, data_y, centroid_x, centroid_y, CHUNK_SIZE
+        ),
+        "k_means_plus_plus": lambda: k_means_plus_plus(
+            data, data_x, data_y, 3, chunk_size=CHUNK_SIZE
+        ),
+        "grouped_method_of_moments": lambda: grouped_method_of_moments(
+            data, data_x, data_y, labels, 1, CHUNK_SIZE
+        ),
+        "method_of_moments": lambda: method_of_moments(
+            data, data_x, data_y, CHUNK_SIZE
+        ),
+        "filter_data": lambda: filter_data(
+            "3-sigma", data, WIDTH, HEIGHT, data_x, data_y, "none", CHUNK_SIZE
+        ),
+    }
+
+    assert get_peak_ratio(lambda _: stages[stage](), data) <= max_ratio
+
+
+def test_estimate_within_memory_budget():
+    data, _, _ = get_image()
+    memory_budget = 8 * data.nbytes
+    guesser = InitValGenerator(memory_budget=memory_budget)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    estimates = guesser.estimate(data, WIDTH, HEIGHT, 2)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert peak <= memory_budget
+    np.testing.assert_allclose(
+        estimates, InitValGenerator().estimate(data, WIDTH, HEIGHT, 2), rtol=1e-8
+    )
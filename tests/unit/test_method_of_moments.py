@@ -1,7 +1,11 @@
 import pytest
 import numpy as np
 
-from init_val_generator.method_of_moments import method_of_moments
+from init_val_generator.method_of_moments import (
+    MomentAccumulator,
+    grouped_method_of_moments,
+    method_of_moments,
+)
 from init_val_generator.tools.gaussian_image import GaussianImage
 
 
@@ -21,3 +25,62 @@ def test_method_of_moments(pa):
         estimates[5] += 180
 
     np.testing.assert_allclose([estimates], image.model_components, atol=1e-10)
+
+
+def test_grouped_method_of_moments():
+    rng = np.random.default_rng(0)
+    data = rng.uniform(0.5, 1.0, 300)
+    data_x = rng.uniform(0, 50, 300)
+    data_y = rng.uniform(0, 50, 300)
+    data_cluster_index = rng.integers(-1, 3, 300)
+
+    estimates = grouped_method_of_moments(data, data_x, data_y, data_cluster_index, 3)
+
+    assert estimates.shape == (3, 6)
+    for i in range(3):
+        indices = data_cluster_index == i
+        np.testing.assert_allclose(
+            estimates[i],
+            method_of_moments(data[indices], data_x[indices], data_y[indices]),
+        )
+
+
+def test_moment_accumulator():
+    width = 40
+    height = 30
+    rng = np.random.default_rng(0)
+    image = GaussianImage(width, height, [[1, 18, 12, 10, 6, 30]], noise=None)
+    data_x = np.tile(np.arange(width), height)
+    data_y = np.repeat(np.arange(height), width)
+
+    accumulator = MomentAccumulator(width, height)
+    accumulator.add(image.data)
+    np.testing.assert_allclose(
+        accumulator.get_parameters(),
+        method_of_moments(image.data, data_x, data_y),
+        rtol=1e-12,
+    )
+
+    delta = np.zeros(width * height)
+    changed = rng.choice(width * height, 50, replace=False)
+    delta[changed] = rng.uniform(0, 0.2, 50)
+    accumulator.add_pixels(data_x[changed], data_y[changed], delta[changed])
+    np.testing.assert_allclose(
+        accumulator.get_parameters(),
+        method_of_moments(image.data + delta, data_x, data_y),
+        rtol=1e-12,
+    )
+
+    accumulator.subtract(delta)
+    worker = MomentAccumulator(width, height)
+    worker.add_pixels(data_x[changed], data_y[changed], delta[changed])
+    worker.subtract_pixels(data_x[changed], data_y[changed], delta[changed])
+    accumulator.merge(worker)
+    np.testing.assert_allclose(
+        accumulator.get_parameters(),
+        method_of_moments(image.data, data_x, data_y),
+        rtol=1e-12,
+    )
+
+    with pytest.raises(Exception):
+        accumulator.merge(MomentAccumulator(height, width))
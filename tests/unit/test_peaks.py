@@ -0,0 +1,48 @@
+import numpy as np
+
+from init_val_generator.peaks import find_peaks
+
+
+def get_image(width, height, sources):
+    x = np.arange(width)
+    y = np.arange(height)[:, None]
+    image = np.zeros((height, width))
+    for amp, center_x, center_y, sigma in sources:
+        image += amp * np.exp(
+            -((x - center_x) ** 2 + (y - center_y) ** 2) / (2 * sigma**2)
+        )
+    return image.ravel()
+
+
+def test_find_peaks():
+    data = get_image(40, 30, [(1.0, 10, 10, 1), (-2.0, 30, 20, 1), (0.5, 13, 10, 1)])
+
+    peak_x, peak_y, amplitude = find_peaks(data, 40, 30, smoothing_radius=0)
+
+    np.testing.assert_array_equal(peak_x, [30, 10])
+    np.testing.assert_array_equal(peak_y, [20, 10])
+    assert amplitude[0] > amplitude[1]
+
+
+def test_find_peaks_mask_and_max_num():
+    data = get_image(40, 30, [(1.0, 10, 10, 2), (2.0, 30, 20, 2)])
+    mask = np.abs(data) > 0.1
+    mask[20 * 40 + 30] = False
+
+    peak_x, peak_y, _ = find_peaks(data, 40, 30, mask)
+    np.testing.assert_array_equal(peak_x, [10])
+    np.testing.assert_array_equal(peak_y, [10])
+
+    peak_x, _, _ = find_peaks(data, 40, 30, np.abs(data) > 0.1, max_num=1)
+    np.testing.assert_array_equal(peak_x, [30])
+
+
+def test_find_peaks_noise():
+    rng = np.random.default_rng(0)
+    data = get_image(64, 64, [(1.0, 20, 20, 4), (0.8, 44, 40, 4)])
+    data += rng.normal(0, 0.05, 64 * 64)
+
+    peak_x, peak_y, _ = find_peaks(data, 64, 64, np.abs(data) > 0.2)
+
+    np.testing.assert_array_equal(peak_x, [20, 44])
+    np.testing.assert_array_equal(peak_y, [20, 40])
@@ -0,0 +1,83 @@
+import threading
+import pytest
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator import refinement
+from init_val_generator.deadline import Deadline
+from init_val_generator.refinement import refine
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [[1, 25, 30, 10, 6, 30], [-0.8, 70, 50, 12, 8, 120]]
+
+
+def test_refine():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=None)
+    initial = [[0.8, 27, 28, 8, 7, 20], [-1.0, 68, 51, 10, 9, 100]]
+
+    refined = refine(image.data, WIDTH, HEIGHT, initial, max_iter=20)
+
+    for estimate, component in zip(refined, COMPONENTS):
+        np.testing.assert_allclose(estimate[:5], component[:5], atol=1e-3)
+        np.testing.assert_allclose(
+            (estimate[5] - component[5] + 90) % 180 - 90, 0, atol=1e-2
+        )
+
+
+@pytest.mark.parametrize("max_iter", [1, 2, 5])
+def test_refine_iterations_in_total(monkeypatch, max_iter):
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS[:1], noise=None)
+    # a small initial width moves the box on every refit
+    initial = [[0.8, 27, 28, 4, 3, 20]]
+    calls = []
+    get_normal_equations = refinement._get_normal_equations
+
+    def counted(*args):
+        calls.append(1)
+        return get_normal_equations(*args)
+
+    monkeypatch.setattr(refinement, "_get_normal_equations", counted)
+    refine(image.data, WIDTH, HEIGHT, initial, max_iter=max_iter)
+
+    assert 0 < len(calls) <= max_iter
+
+
+def test_refine_stops_at_deadline():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=None)
+    initial = [[0.8, 27, 28, 8, 7, 20], [-1.0, 68, 51, 10, 9, 100]]
+    cancel_event = threading.Event()
+    cancel_event.set()
+    deadline = Deadline(cancel_event=cancel_event)
+
+    refined = refine(image.data, WIDTH, HEIGHT, initial, deadline=deadline)
+
+    for estimate, initial_estimate in zip(refined, initial):
+        np.testing.assert_allclose(estimate[:5], initial_estimate[:5])
+        np.testing.assert_allclose(
+            (estimate[5] - initial_estimate[5] + 90) % 180 - 90, 0, atol=1e-8
+        )
+    assert deadline.truncated
+
+
+def test_refine_keeps_invalid_components():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS[:1], noise=None)
+    initial = [[0.8, 27, 28, 8, 7, 20], [np.nan, np.nan, np.nan, 0, 0, 0]]
+
+    refined = refine(image.data, WIDTH, HEIGHT, initial)
+
+    np.testing.assert_allclose(refined[0][:5], COMPONENTS[0][:5], atol=1e-3)
+    np.testing.assert_array_equal(refined[1], initial[1])
+
+
+def test_estimate_with_refinement():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+
+    estimates = InitValGenerator("3-sigma", "3-sigma", refine_iterations=10).estimate(
+        image.data, WIDTH, HEIGHT, 2
+    )
+
+    centers = sorted((round(e[1]), round(e[2])) for e in estimates)
+    assert centers == [(25, 30), (70, 50)]
+    assert sorted(round(e[0], 1) for e in estimates) == [-0.8, 1.0]
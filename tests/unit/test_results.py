@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+
+from init_val_generator import InitValGenerator, ResultTable
+from init_val_generator.results import RESULT_DTYPE, to_records
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+
+def test_to_records():
+    records = to_records(
+        [[1.0, 2.0, 3.0, 4.0, 5.0, 6.0], [7.0, 8.0, 9.0, 10.0, 11.0, 12.0]],
+        np.array([10, 20]),
+        np.array([0.5, 1.5]),
+    )
+
+    assert records.dtype == RESULT_DTYPE
+    np.testing.assert_array_equal(records["center_y"], [3.0, 9.0])
+    np.testing.assert_array_equal(records["pixel_num"], [10, 20])
+    np.testing.assert_array_equal(records["weight"], [0.5, 1.5])
+
+
+def test_estimates_to_records():
+    width = 64
+    height = 64
+    image = GaussianImage(width, height, [[1, 20, 30, 8, 6, 0], [0.8, 45, 30, 8, 6, 0]])
+
+    estimates = InitValGenerator(None).estimate(image.data, width, height, 2)
+    records = estimates.to_records()
+
+    np.testing.assert_array_equal(records["amp"], [e[0] for e in estimates])
+    assert records["pixel_num"].sum() == width * height
+    np.testing.assert_allclose(records["weight"].sum(), np.abs(image.data).sum())
+
+
+@pytest.mark.parametrize(
+    "n, kwargs",
+    [(1, {}), (2, {}), (2, {"refine_iterations": 3}), (2, {"roi": (5, 10, 60, 50)})],
+)
+def test_estimates_parameters(n, kwargs):
+    width = 64
+    height = 64
+    image = GaussianImage(width, height, [[1, 20, 30, 8, 6, 0], [0.8, 45, 30, 8, 6, 0]])
+    roi = kwargs.pop("roi", None)
+
+    estimates = InitValGenerator(None, **kwargs).estimate(
+        image.data, width, height, n, roi=roi
+    )
+
+    assert estimates.parameters.shape == (n, 6)
+    np.testing.assert_array_equal(estimates.parameters, estimates)
+    # the records follow changes of the list
+    estimates[0][0] = 5.0
+    assert estimates.parameters[0, 0] == 5.0
+    assert estimates.to_records()["amp"][0] == 5.0
+    table = ResultTable()
+    table.append(estimates)
+    assert table.get_column("amp")[0] == 5.0
+
+
+def test_result_table():
+    table = ResultTable(capacity=2)
+    for i in range(3):
+        table.append(to_records(np.full((i + 1, 6), i)))
+
+    assert len(table) == 6
+    np.testing.assert_array_equal(table.get_column("image_index"), [0, 1, 1, 2, 2, 2])
+    np.testing.assert_array_equal(table.get_column("amp"), [0, 1, 1, 2, 2, 2])
+    records = table.to_records()
+    np.testing.assert_array_equal(records["fwhm_x"], [0, 1, 1, 2, 2, 2])
+
+
+def test_result_table_to_arrow(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = ResultTable()
+    table.append(to_records([[1.0, 2.0, 3.0, 4.0, 5.0, 6.0]], np.array([3])))
+
+    arrow_table = table.to_arrow()
+    table.write_parquet(tmp_path / "estimates.parquet")
+
+    assert arrow_table.column("pixel_num").type == pa.int64()
+    assert pq.read_table(tmp_path / "estimates.parquet").num_rows == 1
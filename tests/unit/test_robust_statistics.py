@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+
+from init_val_generator.robust_statistics import (
+    approximate_mad,
+    approximate_median,
+    sigma_clipped_stats,
+)
+
+
+@pytest.mark.parametrize("num", [1, 2, 5, 1000, 200001])
+@pytest.mark.parametrize("chunk_size", [None, 777])
+def test_approximate_median_exact(num, chunk_size):
+    rng = np.random.default_rng(num)
+    data = rng.normal(0.3, 1, num)
+    data[: num // 50] += rng.uniform(0, 20, num // 50)
+
+    median = np.median(data)
+    assert approximate_median(data, chunk_size=chunk_size) == median
+    assert approximate_mad(data, chunk_size=chunk_size) == np.median(
+        np.abs(data - median)
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        np.ones(100000),
+        np.r_[np.zeros(100001), np.ones(99999)],
+        np.round(np.random.default_rng(0).normal(0, 3, 300000)),
+        np.r_[np.ones(100000), np.full(100000, np.nextafter(1, 2))],
+    ],
+)
+def test_approximate_median_repeated_values(data):
+    median = np.median(data)
+    assert approximate_median(data) == median
+    assert approximate_mad(data) == np.median(np.abs(data - median))
+
+
+def test_approximate_median_precision():
+    data = np.random.default_rng(0).normal(0, 1, 300000)
+
+    median = np.median(data)
+    assert abs(approximate_median(data, precision=1e-3) - median) <= 1e-3
+    assert (
+        abs(approximate_mad(data, precision=1e-3) - np.median(np.abs(data - median)))
+        <= 2e-3
+    )
+
+
+def test_approximate_median_chunk_list():
+    data = np.random.default_rng(0).normal(0, 1, 10001)
+    chunks = [data[:3000], data[3000:3001], data[3001:]]
+
+    assert approximate_median(chunks) == np.median(data)
+    assert np.isnan(approximate_median(np.array([])))
+
+
+@pytest.mark.parametrize("chunk_size", [None, 777])
+def test_approximate_median_non_finite(chunk_size):
+    data = np.random.default_rng(0).normal(0, 1, 10001)
+    data[5] = np.inf
+    data[10] = -np.inf
+
+    median = np.median(data)
+    assert approximate_median(data, chunk_size=chunk_size) == median
+    assert approximate_mad(data, chunk_size=chunk_size) == np.median(
+        np.abs(data - median)
+    )
+
+    data[20] = np.nan
+    assert np.isnan(approximate_median(data, chunk_size=chunk_size))
+    assert np.isnan(approximate_mad(data, precision=1e-3, chunk_size=chunk_size))
+
+
+def test_sigma_clipped_stats():
+    rng = np.random.default_rng(0)
+    data = rng.normal(2.0, 0.5, 100000)
+    data[:1000] += 50
+
+    background, std = sigma_clipped_stats(data)
+    chunked_background, chunked_std = sigma_clipped_stats(data, chunk_size=4096)
+
+    np.testing.assert_allclose(background, 2.0, atol=0.01)
+    np.testing.assert_allclose(std, 0.5, atol=0.01)
+    np.testing.assert_allclose(chunked_background, background, rtol=1e-12)
+    np.testing.assert_allclose(chunked_std, std, rtol=1e-12)
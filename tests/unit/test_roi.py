@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from init_val_generator import InitValGenerator
+from init_val_generator.roi import get_region, rasterize_polygon
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [[1, 25, 30, 10, 6, 30], [-0.8, 70, 50, 12, 8, 120]]
+
+
+def test_rasterize_polygon():
+    vertices = np.array(
+        [[3.5, 2.2], [40.3, 10.7], [20.1, 15.5], [30.8, 37.4], [5.2, 30.1]]
+    )
+    box = (0, 0, 45, 40)
+
+    mask = rasterize_polygon(vertices, box)
+
+    x, y = np.meshgrid(np.arange(45), np.arange(40))
+    expected = Path(vertices).contains_points(np.stack([x.ravel(), y.ravel()], axis=1))
+    np.testing.assert_array_equal(mask.ravel(), expected)
+
+
+def test_get_region():
+    assert get_region((-5, 10, 20, 200), WIDTH, HEIGHT) == ((0, 10, 20, HEIGHT), None)
+
+    box, mask = get_region([[10, 10], [20.5, 10], [10, 30.5]], WIDTH, HEIGHT)
+    assert box == (10, 10, 21, 31)
+    assert mask.shape == (21, 11)
+
+    roi = np.zeros(WIDTH * HEIGHT, dtype=np.bool_)
+    roi[5 * WIDTH + 7] = roi[9 * WIDTH + 3] = True
+    box, mask = get_region(roi, WIDTH, HEIGHT)
+    assert box == (3, 5, 8, 10)
+    assert mask.sum() == 2
+
+    with pytest.raises(Exception):
+        get_region((100, 0, 120, 10), WIDTH, HEIGHT)
+
+
+def test_estimate_in_roi():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    generator = InitValGenerator("3-sigma", "3-sigma")
+
+    estimates = generator.estimate(image.data, WIDTH, HEIGHT, roi=(45, 25, WIDTH, 75))
+
+    region = image.data.reshape(HEIGHT, WIDTH)[25:75, 45:].ravel()
+    expected = generator.estimate(region, WIDTH - 45, 50)
+    expected[0][1] += 45
+    expected[0][2] += 25
+    np.testing.assert_array_equal(estimates, expected)
+    assert (round(estimates[0][1]), round(estimates[0][2])) == (70, 50)
+
+
+def test_estimate_in_polygon_and_mask():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    vertices = np.array([[5, 5], [50, 10], [40, 55], [3, 50]])
+    x, y = np.meshgrid(np.arange(WIDTH), np.arange(HEIGHT))
+    mask = Path(vertices).contains_points(np.stack([x.ravel(), y.ravel()], axis=1))
+
+    polygon_estimates = generator.estimate(image.data, WIDTH, HEIGHT, roi=vertices)
+    mask_estimates = generator.estimate(image.data, WIDTH, HEIGHT, roi=mask)
+
+    np.testing.assert_allclose(polygon_estimates, mask_estimates)
+    assert (round(polygon_estimates[0][1]), round(polygon_estimates[0][2])) == (25, 30)
+
+
+@pytest.mark.parametrize("n", [1, None])
+def test_estimate_in_mask_only_uses_region_pixels(n):
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    generator = InitValGenerator("3-sigma", "3-sigma", criterion="bic")
+    vertices = np.array([[5, 5], [60, 10], [55, 60], [3, 50]])
+    mask = get_region(vertices, WIDTH, HEIGHT)[1]
+    data_y, data_x = np.nonzero(mask)
+    data_x += 3
+    data_y += 5
+
+    estimates = generator.estimate(image.data, WIDTH, HEIGHT, n, roi=vertices)
+
+    expected = generator.estimate_pixels(
+        data_x, data_y, image.data[data_y * WIDTH + data_x], WIDTH, HEIGHT, n
+    )
+    np.testing.assert_allclose(estimates, expected)
+
+
+def test_estimate_in_polygon_with_peaks():
+    components = COMPONENTS + [[0.7, 40, 40, 8, 8, 0]]
+    image = GaussianImage(WIDTH, HEIGHT, components, noise=0.05, random_seed=0)
+    generator = InitValGenerator(
+        "3-sigma",
+        "3-sigma",
+        component_search="peaks",
+        residual_threshold=0.1,
+        refine_iterations=5,
+    )
+    vertices = np.array([[5, 5], [60, 10], [55, 60], [3, 50]])
+
+    estimates = generator.estimate(image.data, WIDTH, HEIGHT, None, roi=vertices)
+
+    centers = sorted((round(e[1]), round(e[2])) for e in estimates)
+    assert centers == [(25, 30), (40, 40)]
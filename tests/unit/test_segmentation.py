@@ -0,0 +1,103 @@
+import pytest
+import numpy as np
+
+from init_val_generator.segmentation import (
+    label_points,
+    lookup_labels,
+    segment,
+)
+
+
+def flood_fill_labels(mask, connectivity):
+    height, width = mask.shape
+    neighbors = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        neighbors += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+    labels = np.full(mask.shape, -1)
+    num = 0
+    for y in range(height):
+        for x in range(width):
+            if not mask[y, x] or labels[y, x] >= 0:
+                continue
+            labels[y, x] = num
+            stack = [(y, x)]
+            while stack:
+                cy, cx = stack.pop()
+                for dy, dx in neighbors:
+                    ny, nx = cy + dy, cx + dx
+                    if (
+                        0 <= ny < height
+                        and 0 <= nx < width
+                        and mask[ny, nx]
+                        and labels[ny, nx] < 0
+                    ):
+                        labels[ny, nx] = num
+                        stack.append((ny, nx))
+            num += 1
+    return labels, num
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+@pytest.mark.parametrize("fraction", [0.3, 0.55, 0.6])
+def test_label_points(connectivity, fraction):
+    mask = np.random.default_rng(0).random((40, 50)) < fraction
+    data_y, data_x = np.nonzero(mask)
+    order = np.random.default_rng(1).permutation(len(data_x))
+
+    labels, num = label_points(data_x[order], data_y[order], 50, connectivity)
+
+    expected_labels, expected_num = flood_fill_labels(mask, connectivity)
+    assert num == expected_num
+    np.testing.assert_array_equal(labels, expected_labels[data_y, data_x][order])
+
+
+def test_label_points_serpentine():
+    mask = np.zeros((99, 99), dtype=bool)
+    mask[::2] = True
+    mask[1::4, -1] = True
+    mask[3::4, 0] = True
+    data_y, data_x = np.nonzero(mask)
+
+    labels, num = label_points(data_x, data_y, 99)
+
+    assert num == 1
+    assert np.all(labels == 0)
+    assert label_points(np.empty(0, dtype=int), np.empty(0, dtype=int), 3)[1] == 0
+
+
+def test_segment():
+    width = 12
+    height = 8
+    image = np.zeros((height, width))
+    image[1:4, 1:4] = 1.0
+    image[5:8, 6:11] = -2.0
+    image[0, 10] = 5.0
+    data_y, data_x = np.nonzero(image)
+    data = image[data_y, data_x]
+
+    region_index, num = segment(data, data_x, data_y, width, height)
+
+    assert num == 2
+    np.testing.assert_array_equal(region_index[data == -2.0], 0)
+    np.testing.assert_array_equal(region_index[data == 1.0], 1)
+    np.testing.assert_array_equal(region_index[data == 5.0], -1)
+
+    region_index, num = segment(data, data_x, data_y, width, height, max_num=1)
+    assert num == 1
+    np.testing.assert_array_equal(region_index[data == 1.0], -1)
+
+
+def test_lookup_labels():
+    data_x = np.array([3, 0, 5, 2])
+    data_y = np.array([1, 0, 4, 1])
+    labels = np.array([0, 1, 2, 0])
+
+    query_labels = lookup_labels(
+        data_x, data_y, labels, 6, np.array([2, 5, 1, 3, 0]), np.array([1, 4, 0, 1, 0])
+    )
+
+    np.testing.assert_array_equal(query_labels, [0, 2, -1, 0, 1])
+    np.testing.assert_array_equal(
+        lookup_labels(data_x[:0], data_y[:0], labels[:0], 6, data_x, data_y), -1
+    )
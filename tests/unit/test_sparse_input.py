@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from init_val_generator import InitValGenerator
+from init_val_generator.tools.gaussian_image import GaussianImage
+
+WIDTH = 96
+HEIGHT = 80
+COMPONENTS = [[1, 25, 30, 10, 6, 30], [-0.8, 70, 50, 12, 8, 120]]
+
+
+def get_sparse_image():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    return np.where(np.abs(image.data) > 0.15, image.data, 0)
+
+
+def test_estimate_pixels():
+    data = get_sparse_image()
+    index = np.flatnonzero(data)
+    generator = InitValGenerator()
+
+    estimates = generator.estimate_pixels(
+        index % WIDTH, index // WIDTH, data[index], WIDTH, HEIGHT, 2
+    )
+
+    # the zero pixels have no weight in the clustering and the moments
+    np.testing.assert_allclose(estimates, generator.estimate(data, WIDTH, HEIGHT, 2))
+    np.testing.assert_array_equal(estimates.pixel_num.sum(), len(index))
+
+
+def test_estimate_pixels_narrow_coordinates():
+    width = 600
+    height = 600
+    image = GaussianImage(width, height, [[1, 300, 320, 18, 14, 30]], noise=None)
+    index = np.flatnonzero(image.data > 0.01)
+    generator = InitValGenerator()
+
+    estimates = generator.estimate_pixels(
+        (index % width).astype(np.int16),
+        (index // width).astype(np.int16),
+        image.data[index],
+        width,
+        height,
+    )
+
+    np.testing.assert_allclose(
+        estimates,
+        generator.estimate_pixels(
+            index % width, index // width, image.data[index], width, height
+        ),
+    )
+
+
+def test_estimate_pixels_component_number():
+    data = get_sparse_image()
+    index = np.flatnonzero(data)
+
+    estimates = InitValGenerator().estimate_pixels(
+        index % WIDTH, index // WIDTH, data[index], WIDTH, HEIGHT, None
+    )
+
+    centers = sorted((round(e[1]), round(e[2])) for e in estimates)
+    assert centers == [(25, 30), (70, 50)]
+
+
+def test_estimate_pixels_in_any_order():
+    image = GaussianImage(WIDTH, HEIGHT, COMPONENTS, noise=0.05, random_seed=0)
+    data_x = np.tile(np.arange(WIDTH), HEIGHT)
+    data_y = np.repeat(np.arange(HEIGHT), WIDTH)
+    order = np.random.default_rng(1).permutation(WIDTH * HEIGHT)
+    generator = InitValGenerator("fwhm-estimate", "3-sigma")
+
+    # all pixels of the image are listed, but not in row-major order
+    estimates = generator.estimate_pixels(
+        data_x[order], data_y[order], image.data[order], WIDTH, HEIGHT, 2
+    )
+
+    np.testing.assert_allclose(
+        estimates,
+        generator.estimate_pixels(data_x, data_y, image.data, WIDTH, HEIGHT, 2),
+    )
+    centers = sorted((e[1], e[2]) for e in estimates)
+    np.testing.assert_allclose(centers, [(25, 30), (70, 50)], atol=1)
+
+
+def test_estimate_pixels_segmentation():
+    data = get_sparse_image()
+    index = np.flatnonzero(data)
+
+    estimates = InitValGenerator(component_search="segmentation").estimate_pixels(
+        index % WIDTH, index // WIDTH, data[index], WIDTH, HEIGHT, None
+    )
+
+    centers = sorted((round(e[1]), round(e[2])) for e in estimates)
+    assert centers == [(25, 30), (70, 50)]
+
+
+def test_estimate_pixels_outside_image():
+    with pytest.raises(Exception):
+        InitValGenerator().estimate_pixels(
+            np.array([-1]), np.zeros(1, dtype=int), np.ones(1), WIDTH, HEIGHT
+        )
+
+
+def test_estimate_pixels_needs_whole_image_for_peaks():
+    with pytest.raises(Exception):
+        InitValGenerator(
+            "3-sigma", "3-sigma", component_search="peaks"
+        ).estimate_pixels(np.zeros(1), np.zeros(1), np.ones(1), WIDTH, HEIGHT)
+
+
+def test_estimate_sparse():
+    sparse = pytest.importorskip("scipy.sparse")
+    data = get_sparse_image()
+    index = np.flatnonzero(data)
+    generator = InitValGenerator()
+
+    estimates = generator.estimate_sparse(
+        sparse.csr_array(data.reshape(HEIGHT, WIDTH)), None
+    )
+
+    np.testing.assert_array_equal(
+        estimates,
+        generator.estimate_pixels(
+            index % WIDTH, index // WIDTH, data[index], WIDTH, HEIGHT, None
+        ),
+    )
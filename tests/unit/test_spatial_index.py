@@ -0,0 +1,52 @@
+import numpy as np
+
+from init_val_generator import clustering
+from init_val_generator.clustering import assign_clusters
+from init_val_generator.spatial_index import CentroidGrid, assign_clusters_with_grid
+
+
+def get_brute_force_labels(data, data_x, data_y, centroid_x, centroid_y):
+    min_num = clustering.SPATIAL_INDEX_MIN_NUM
+    clustering.SPATIAL_INDEX_MIN_NUM = len(centroid_x) + 1
+    try:
+        return assign_clusters(data, data_x, data_y, centroid_x, centroid_y)
+    finally:
+        clustering.SPATIAL_INDEX_MIN_NUM = min_num
+
+
+def test_assign_clusters_with_grid():
+    rng = np.random.default_rng(0)
+    data_x = np.tile(np.arange(120), 80)
+    data_y = np.repeat(np.arange(80), 120)
+    data = rng.normal(size=len(data_x))
+    data[:5] = 0
+    data[5] = np.nan
+    # integer centroids with duplicates produce exact ties
+    centroid_x = rng.integers(0, 120, 200).astype(np.float64)
+    centroid_y = rng.integers(0, 80, 200).astype(np.float64)
+
+    expected = get_brute_force_labels(data, data_x, data_y, centroid_x, centroid_y)
+    labels = assign_clusters_with_grid(
+        data, data_x, data_y, centroid_x, centroid_y, chunk_size=1000
+    )
+
+    np.testing.assert_array_equal(labels, expected)
+    np.testing.assert_array_equal(
+        assign_clusters(data, data_x, data_y, centroid_x, centroid_y), expected
+    )
+
+
+def test_centroid_grid_candidates():
+    rng = np.random.default_rng(1)
+    data_x = rng.uniform(0, 500, 1000)
+    data_y = rng.uniform(0, 500, 1000)
+    centroid_x = rng.uniform(0, 500, 400)
+    centroid_y = rng.uniform(0, 500, 400)
+
+    grid = CentroidGrid(data_x, data_y, centroid_x, centroid_y)
+
+    assert grid.candidates.shape[1] < len(centroid_x) // 4
+    for row in grid.candidates:
+        row = row[row >= 0]
+        assert len(row) > 0
+        assert np.all(np.diff(row) > 0)
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+import tracemalloc
+import pytest
+import numpy as np
+
+from init_val_generator import InitValGenerator
+from init_val_generator.cluster_validity import get_criterion_score
+from init_val_generator.clustering import assign_clusters, k_means, k_means_plus_plus
+from init_val_generator.tools.dataset_factory import generate_dataset
+from init_val_generator.workspace import Workspace
+
+WIDTH = 64
+HEIGHT = 48
+
+
+@pytest.mark.parametrize("n", [1, 3, None])
+def test_estimate_with_workspace(n):
+    dataset = generate_dataset(None, 3, WIDTH, HEIGHT, n=3, random_seed=0)
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    workspace = Workspace(WIDTH, HEIGHT)
+
+    for i in range(len(dataset)):
+        image = dataset.get_image(i)
+        expected = generator.estimate(image, WIDTH, HEIGHT, n)
+        estimates = generator.estimate(image, WIDTH, HEIGHT, n, workspace)
+        np.testing.assert_array_equal(estimates, expected)
+
+
+@pytest.mark.parametrize("criterion", ["silhouette", "calinski-harabasz", "bic"])
+@pytest.mark.parametrize("memory_budget", [None, 10**6])
+def test_estimate_with_workspace_criteria(criterion, memory_budget):
+    dataset = generate_dataset(None, 2, WIDTH, HEIGHT, n=2, random_seed=2)
+    generator = InitValGenerator(
+        "3-sigma", "3-sigma", criterion=criterion, memory_budget=memory_budget
+    )
+    workspace = Workspace(WIDTH, HEIGHT)
+
+    for i in range(len(dataset)):
+        image = dataset.get_image(i)
+        expected = generator.estimate(image, WIDTH, HEIGHT, None)
+        estimates = generator.estimate(image, WIDTH, HEIGHT, None, workspace)
+        np.testing.assert_array_equal(estimates, expected)
+
+
+def test_workspace_coordinates():
+    workspace = Workspace(WIDTH, HEIGHT)
+    data_x, data_y = workspace.get_coordinates(np.int32)
+
+    assert data_x.dtype == data_y.dtype == np.int32
+    assert workspace.get_coordinates(np.int32)[0] is data_x
+    assert workspace.get_coordinates(np.int64)[0] is workspace.data_x
+    np.testing.assert_array_equal(data_x, workspace.data_x)
+    np.testing.assert_array_equal(data_y, workspace.data_y)
+
+
+def test_workspace_per_thread():
+    dataset = generate_dataset(None, 8, WIDTH, HEIGHT, n=2, random_seed=1)
+    generator = InitValGenerator("3-sigma", "3-sigma")
+    expected = [
+        generator.estimate(dataset.get_image(i), WIDTH, HEIGHT, 2)
+        for i in range(len(dataset))
+    ]
+
+    def estimate_all(indices):
+        workspace = Workspace(WIDTH, HEIGHT)
+        return [
+            generator.estimate(dataset.get_image(i), WIDTH, HEIGHT, 2, workspace)
+            for i in indices
+        ]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(estimate_all, [range(0, 8, 2), range(1, 8, 2)]))
+
+    np.testing.assert_array_equal(results[0], expected[0::2])
+    np.testing.assert_array_equal(results[1], expected[1::2])
+    assert generator._contexts == {}
+
+
+def test_workspace_size_mismatch():
+    with pytest.raises(Exception):
+        InitValGenerator().estimate(
+            np.zeros(WIDTH * HEIGHT), WIDTH, HEIGHT, 1, Workspace(HEIGHT, WIDTH)
+        )
+
+
+def test_workspace_reduces_allocations():
+    rng = np.random.default_rng(0)
+    data = np.abs(rng.normal(0, 1, 256 * 256))
+    workspace = Workspace(256, 256)
+    data_x = workspace.data_x
+    data_y = workspace.data_y
+    centroid_x, centroid_y = k_means_plus_plus(data, data_x, data_y, 4)
+    k_means(data, data_x, data_y, centroid_x, centroid_y, workspace=workspace)
+
+    peaks = []
+    for buffers in [None, workspace]:
+        tracemalloc.start()
+        k_means(data, data_x, data_y, centroid_x, centroid_y, workspace=buffers)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    # only the fixed-size internal buffers of numpy casts remain with a workspace
+    assert peaks[1] < 0.25 * data.nbytes < data.nbytes < peaks[0]
+
+
+def test_workspace_reduces_scoring_allocations():
+    rng = np.random.default_rng(0)
+    data = np.abs(rng.normal(0, 1, 256 * 256))
+    workspace = Workspace(256, 256)
+    data_x = workspace.data_x
+    data_y = workspace.data_y
+    centroid_x, centroid_y = k_means_plus_plus(data, data_x, data_y, 4)
+    data_cluster_index = assign_clusters(data, data_x, data_y, centroid_x, centroid_y)
+    args = (data, data_x, data_y, centroid_x, centroid_y, data_cluster_index)
+    get_criterion_score("bic", *args, workspace=workspace)
+
+    peaks = []
+    scores = []
+    for buffers in [None, workspace]:
+        tracemalloc.start()
+        scores.append(get_criterion_score("bic", *args, workspace=buffers))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    assert scores[0] == scores[1]
+    assert peaks[1] < 0.25 * data.nbytes < data.nbytes < peaks[0]